@@ -274,8 +274,7 @@ class Core:
 
         # TODO: Move to accountmanager
         self.log.info(self._("Activating accounts..."))
-        self.acm.get_account_infos()
-        # self.scheduler.add_job(0, self.acm.get_account_infos)
+        self.acm.refresh_accounts()
 
         self.log.info(self._("Activating Plugins..."))
         self.adm.core_ready()
@@ -339,6 +338,8 @@ class Core:
             self.log.debug("*** pyLoad is up and running ***")
             # self.evm.fire('pyload:started')
 
+            self.scheduler.start()
+
             self.thm.pause = False  # NOTE: Recheck...
             while True:
                 self._running.wait()
@@ -347,8 +348,7 @@ class Core:
                     raise Restart
                 if self._do_exit:
                     raise Exit
-                self.scheduler.run()
-                time.sleep(1)
+                self.thread_manager.wait(1)
 
         except Restart:
             self.restart()
@@ -375,6 +375,8 @@ class Core:
 
     def terminate(self):
         self.stop()
+        self.scheduler.shutdown()
+        self.account_manager.shutdown()
         self.log.info(self._("Exiting core..."))
         # self.tsm.exit()
         # self.db.exit()  # NOTE: Why here?
@@ -397,6 +399,8 @@ class Core:
 
             self.addon_manager.core_exiting()
 
+            self.thread_manager.save_info_cache()
+
         finally:
             self.files.sync_save()
             self._running.clear()
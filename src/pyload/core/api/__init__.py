@@ -8,6 +8,7 @@
 #          \  /
 #           \/
 
+import logging
 import re
 
 import os
@@ -16,6 +17,7 @@ import time
 from functools import wraps
 
 from ..datatypes.pyfile import PyFile
+from ..network.connection_pool import POOL
 from ..network.request_factory import get_url
 from ..utils.old.packagetools import parse_names
 from ..utils import seconds, fs
@@ -26,6 +28,8 @@ from enum import IntFlag
 from ..datatypes.exceptions import *
 from ..datatypes.enums import *
 from ..datatypes.data import *
+from ..database.file_database import LINK_SORT_KEYS, PACKAGE_SORT_KEYS
+from ..managers.event_manager import ReloadAllEvent
 
 # contains function names mapped to their permissions
 # unlisted functions are for admins only
@@ -102,6 +106,11 @@ class Api:
     Admin user have all permissions, and are the only ones who can access the methods with no specific permission.
     """
 
+    #: largest page returned by the paged getters
+    MAX_PAGE_SIZE = 1000
+    #: longest wait of `get_events_since`
+    MAX_EVENT_WAIT = 60
+
     def __init__(self, core):
         self.pyload = core
         self._ = core._
@@ -122,6 +131,33 @@ class Api:
         )
         return f
 
+    def _convert_events(self, events):
+        new_events = []
+
+        def conv_dest(d):
+            return (Destination.QUEUE if d == "queue" else Destination.COLLECTOR).value
+
+        for e in events:
+            event = EventInfo()
+            event.eventname = e[0]
+            if e[0] in ("update", "remove", "insert"):
+                event.id = e[3]
+                event.type = (
+                    ElementType.PACKAGE if e[2] == "pack" else ElementType.FILE
+                ).value
+                event.destination = conv_dest(e[1])
+            elif e[0] == "order":
+                if e[1]:
+                    event.id = e[1]
+                    event.type = (
+                        ElementType.PACKAGE if e[2] == "pack" else ElementType.FILE
+                    )
+                    event.destination = conv_dest(e[3])
+            elif e[0] == "reload":
+                event.destination = conv_dest(e[1])
+            new_events.append(event)
+        return new_events
+
     def _convert_config_format(self, c):
         sections = {}
         for section_name, sub in c.items():
@@ -224,6 +260,81 @@ class Api:
         """
         return self.pyload.config.plugin
 
+    @legacy("getSpeedLimits")
+    @permission(Perms.SETTINGS)
+    def get_speed_limits(self):
+        """
+        Lists the speed limits and weights of download groups, the global limit
+        is part of the config.
+
+        :return: list of `SpeedLimitData`
+        """
+        limits = self.pyload.request_factory.bucket.get_limits()
+        return [
+            SpeedLimitData(kind, name, rate >> 10, weight)
+            for (kind, name), (rate, weight) in limits.items()
+        ]
+
+    @legacy("setSpeedLimit")
+    @permission(Perms.SETTINGS)
+    def set_speed_limit(self, kind, name, limit=0, weight=1):
+        """
+        Limits the speed of a group of downloads, applies to running downloads
+        too.
+
+        :param kind: 'priority', 'plugin', 'account' or 'package'
+        :param name: 'free' or 'premium' for priority, else plugin name,
+            account name or package id
+        :param limit: speed limit in KiB/s, 0 for none
+        :param weight: share of the group when it competes with the other groups
+            of the same kind, relative to their weight, 1 to `BucketTree.MAX_WEIGHT`
+        """
+        self.pyload.request_factory.bucket.set_limit(
+            kind, name, int(limit) << 10, int(weight)
+        )
+
+    @legacy("getConnectionStats")
+    @permission(Perms.STATUS)
+    def get_connection_stats(self):
+        """
+        Statistics of the curl handles and connections shared by all requests.
+
+        :return: `ConnectionStats`, hits and misses count reused and created
+            handles, reused and connects count transfers on an open connection
+            and connections opened
+        """
+        return ConnectionStats(**POOL.stats())
+
+    @legacy("getDatabaseStats")
+    @permission(Perms.STATUS)
+    def get_database_stats(self):
+        """
+        Statistics of the write-behind buffer of the database.
+
+        :return: `DatabaseStats`, flushes and rows count the buffered writes written,
+            batch and latency are the rows and seconds of the last and the largest
+            flush, pending the writes buffered now and readers the pooled read
+            connections
+        """
+        return DatabaseStats(**self.pyload.db.get_stats())
+
+    @legacy("getSchedulerStats")
+    @permission(Perms.STATUS)
+    def get_scheduler_stats(self):
+        """
+        Statistics of the jobs run by the scheduler.
+
+        :return: `SchedulerStats`, pending counts the jobs not run yet, jobs lists
+            `ScheduledJobStats` by job name with the number of runs and failed runs,
+            and the seconds of all, the longest and the last run
+        """
+        stats = self.pyload.scheduler.get_stats()
+        stats["jobs"] = [
+            ScheduledJobStats(name, **job)
+            for name, job in sorted(stats["jobs"].items())
+        ]
+        return SchedulerStats(**stats)
+
     @legacy("pauseServer")
     @permission(Perms.STATUS)
     def pause_server(self):
@@ -318,6 +429,12 @@ class Api:
         """
         self.pyload._do_restart = True
 
+    def vacuum_database(self):
+        """
+        Compact the database file, blocks database access while running.
+        """
+        self.pyload.db.vacuum()
+
     @legacy("getLog")
     @permission(Perms.LOGS)
     def get_log(self, offset=0):
@@ -327,17 +444,53 @@ class Api:
         :param offset: line offset
         :return: List of log entries
         """
-        filename = os.path.join(
-            self.pyload.config.get("log", "filelog_folder"), "log.txt"
-        )
-        try:
-            with open(filename) as fh:
-                lines = fh.readlines()
-            if offset >= len(lines):
-                return []
-            return lines[offset:]
-        except Exception:
+        reader = self.pyload.logfactory.get_reader(self.pyload.log.name)
+        if not os.path.isfile(reader.filename):
             return ["No log available"]
+        return [text for number, text in reader.lines(max(int(offset), 0))]
+
+    @legacy("getLogPage")
+    @permission(Perms.LOGS)
+    def get_log_page(self, offset=-50, limit=50, cursor=None, level=None, since=None):
+        """
+        Returns one page of log lines, only the requested lines are read from the
+        log file.
+
+        :param offset: number of the first line, negative to count from the end,
+            ignored if cursor is given
+        :param limit: page size, at most `MAX_PAGE_SIZE`
+        :param cursor: `PageData.cursor` of the previous page, continues after it
+        :param level: name of the lowest log level, e.g. "WARNING"
+        :param since: unix time, only lines logged from then on
+        :return: `PageData` of `LogEntryData`, total is the number of lines in the
+            log
+        """
+        if level and not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"Unknown log level {level}")
+        limit = max(1, min(int(limit), self.MAX_PAGE_SIZE))
+        since = float(since) if since else None
+        if cursor:
+            #: the number of the first line of the page
+            try:
+                start = json.loads(cursor)
+            except (TypeError, ValueError):
+                start = None
+            if not isinstance(start, int) or isinstance(start, bool) or start < 0:
+                raise ValueError(f"Invalid cursor {cursor}")
+        else:
+            start = int(offset)
+
+        reader = self.pyload.logfactory.get_reader(self.pyload.log.name)
+
+        items = [
+            LogEntryData(number, date, level, message)
+            for number, date, level, message in reader.read(
+                start, limit + 1, level, since
+            )
+        ]
+        following = items.pop().line if len(items) > limit else None
+        cursor = json.dumps(following) if following is not None else None
+        return PageData(items, reader.count, cursor)
 
     @legacy("isTimeDownload")
     @permission(Perms.STATUS)
@@ -412,17 +565,7 @@ class Api:
         :param dest: `Destination`
         :return: package id of the new package
         """
-        if self.pyload.config.get("general", "folder_per_package"):
-            folder = name
-        else:
-            folder = ""
-
-        folder = (
-            folder.replace("http://", "")
-            .replace(":", "")
-            .replace("/", "_")
-            .replace("\\", "_")
-        )
+        folder = self._package_folder(name)
 
         pid = self.pyload.files.add_package(name, folder, Destination(dest))
 
@@ -438,6 +581,55 @@ class Api:
 
         return pid
 
+    @legacy("addPackagesBulk")
+    @permission(Perms.ADD)
+    def add_packages_bulk(self, packages, dest=Destination.QUEUE.value):
+        """
+        Adds many packages at once, with one database transaction, one event and
+        one online check for all of them.
+
+        :param packages: list of dicts with the name and the list of urls as links of
+            each package, and optionally its folder and password
+        :param dest: `Destination`
+        :return: list of package ids of the new packages
+        """
+        data = [
+            (
+                p["name"],
+                p["folder"] if "folder" in p else self._package_folder(p["name"]),
+                p.get("password") or "",
+                p["links"],
+            )
+            for p in packages
+        ]
+        if not data:
+            return []
+
+        pids = self.pyload.files.add_packages(data, Destination(dest))
+
+        self.pyload.log.info(
+            self._("Added {count:d} packages containing {links:d} links").format(
+                count=len(pids), links=sum(len(x[3]) for x in data)
+            )
+        )
+
+        self.pyload.files.save()
+
+        return pids
+
+    def _package_folder(self, name):
+        if self.pyload.config.get("general", "folder_per_package"):
+            folder = name
+        else:
+            folder = ""
+
+        return (
+            folder.replace("http://", "")
+            .replace(":", "")
+            .replace("/", "_")
+            .replace("\\", "_")
+        )
+
     @legacy("parseURLs")
     @permission(Perms.ADD)
     def parse_urls(self, html=None, url=None):
@@ -493,10 +685,16 @@ class Api:
 
         rid = self.pyload.thread_manager.create_result_thread(data, False)
 
-        tmp = [
-            (url, (url, OnlineStatus(url, pluginname, "unknown", 3, 0)))
-            for url, pluginname in data
-        ]
+        tmp = []
+        for url, pluginname in data:
+            #: looked up by the online check already, so not counted again
+            info = self.pyload.thread_manager.info_cache.peek(url)
+            if info is None:
+                status = OnlineStatus(url, pluginname, "unknown", 3, 0)
+            else:
+                name, size, status = info[:3]
+                status = OnlineStatus(name, pluginname, "unknown", status, int(size))
+            tmp.append((status.name, (url, status)))
         data = parse_names(tmp)
         result = {}
 
@@ -545,6 +743,19 @@ class Api:
         else:
             return OnlineCheck(rid, result)
 
+    @legacy("getOnlineCheckStats")
+    @permission(Perms.STATUS)
+    def get_online_check_stats(self):
+        """
+        Statistics of the threads checking the online status of links.
+
+        :return: `OnlineCheckStats`, queued urls wait for a thread, running is the
+            number of batches being checked, waiting the urls not checked yet,
+            latency the average seconds from queueing an url to its info and
+            cached the number of urls whose info is reused
+        """
+        return OnlineCheckStats(**self.pyload.thread_manager.get_info_stats())
+
     @legacy("generatePackages")
     @permission(Perms.ADD)
     def generate_packages(self, links):
@@ -567,10 +778,13 @@ class Api:
         :param dest: `Destination`
         :return: list of package ids
         """
-        return [
-            self.add_package(name, urls, dest)
-            for name, urls in self.generate_packages(links).items()
-        ]
+        return self.add_packages_bulk(
+            [
+                {"name": name, "links": urls}
+                for name, urls in self.generate_packages(links).items()
+            ],
+            dest,
+        )
 
     @legacy("checkAndAddPackages")
     @permission(Perms.ADD)
@@ -785,10 +999,144 @@ class Api:
                 links=[self._convert_py_file(x) for x in pack["links"].values()],
             )
             for pack in self.pyload.files.get_complete_data(
-                Destination.COLLECTOR.value
+                Destination.COLLECTOR
             ).values()
         ]
 
+    def _page_args(self, limit, cursor, sort, sort_keys):
+        if sort not in sort_keys:
+            raise ValueError(f"Unknown sort key {sort}")
+        limit = max(1, min(int(limit), self.MAX_PAGE_SIZE))
+        if not cursor:
+            return limit, None
+
+        #: the sort key values of a row, with its id appended
+        try:
+            after = json.loads(cursor)
+        except ValueError:
+            after = None
+        if (
+            not isinstance(after, list)
+            or len(after) != len(sort_keys[sort]) + 1
+            or not all(
+                isinstance(x, (int, float, str)) and not isinstance(x, bool)
+                for x in after
+            )
+        ):
+            raise ValueError(f"Invalid cursor {cursor} for sort key {sort}")
+        return limit, after
+
+    def _packages_page(self, destination, offset, limit, cursor, sort, desc, name):
+        limit, after = self._page_args(limit, cursor, sort, PACKAGE_SORT_KEYS)
+        total, data, key = self.pyload.files.get_packages_page(
+            Destination(destination),
+            offset=int(offset),
+            limit=limit,
+            after=after,
+            sort=sort,
+            desc=desc,
+            name=name,
+        )
+        items = [
+            PackageData(
+                pack["id"],
+                pack["name"],
+                pack["folder"],
+                pack["site"],
+                pack["password"],
+                pack["queue"],
+                pack["order"],
+                pack["linksdone"],
+                pack["sizedone"],
+                pack["sizetotal"],
+                pack["linkstotal"],
+            )
+            for pack in data
+        ]
+        return PageData(items, total, json.dumps(key) if key else None)
+
+    @legacy("getQueuePage")
+    @permission(Perms.LIST)
+    def get_queue_page(
+        self, offset=0, limit=50, cursor=None, sort="order", desc=False, name=None
+    ):
+        """
+        Returns one page of packages in queue, without links. Unlike `get_queue` only
+        the requested page is loaded.
+
+        :param offset: number of packages to skip, ignored if cursor is given
+        :param limit: page size, at most `MAX_PAGE_SIZE`
+        :param cursor: `PageData.cursor` of the previous page, continues after it
+        :param sort: one of "order", "name", "size", "links"
+        :param desc: sort descending
+        :param name: only packages whose name contains this string
+        :return: `PageData` of `PackageData`
+        """
+        return self._packages_page(
+            Destination.QUEUE, offset, limit, cursor, sort, desc, name
+        )
+
+    @legacy("getCollectorPage")
+    @permission(Perms.LIST)
+    def get_collector_page(
+        self, offset=0, limit=50, cursor=None, sort="order", desc=False, name=None
+    ):
+        """
+        same as `get_queue_page` for collector.
+
+        :return: `PageData` of `PackageData`
+        """
+        return self._packages_page(
+            Destination.COLLECTOR, offset, limit, cursor, sort, desc, name
+        )
+
+    @legacy("getFilesPage")
+    @permission(Perms.LIST)
+    def get_files_page(
+        self,
+        destination=Destination.QUEUE,
+        offset=0,
+        limit=50,
+        cursor=None,
+        sort="order",
+        desc=False,
+        status=None,
+        plugin=None,
+        name=None,
+        pid=None,
+    ):
+        """
+        Returns one page of files in queue or collector, filtered and sorted on the
+        database.
+
+        :param destination: `Destination`
+        :param offset: number of files to skip, ignored if cursor is given
+        :param limit: page size, at most `MAX_PAGE_SIZE`
+        :param cursor: `PageData.cursor` of the previous page, continues after it
+        :param sort: one of "order", "name", "size", "status", "plugin"
+        :param desc: sort descending
+        :param status: list of `DownloadStatus`, only files with one of them
+        :param plugin: list of plugin names, only files handled by one of them
+        :param name: only files whose name contains this string
+        :param pid: only files of this package
+        :return: `PageData` of `FileData`
+        """
+        limit, after = self._page_args(limit, cursor, sort, LINK_SORT_KEYS)
+        total, data, key = self.pyload.files.get_links_page(
+            Destination(destination),
+            offset=int(offset),
+            limit=limit,
+            after=after,
+            sort=sort,
+            desc=desc,
+            status=[int(x) for x in status] if status else None,
+            plugin=list(plugin) if plugin else None,
+            name=name,
+            package=int(pid) if pid is not None else None,
+        )
+        items = [self._convert_py_file(x) for x in data]
+        return PageData(items, total, json.dumps(key) if key else None)
+
     @legacy("addFiles")
     @permission(Perms.ADD)
     def add_files(self, pid, links):
@@ -1109,32 +1457,32 @@ class Api:
         :param uuid:
         :return: list of `Events`
         """
-        events = self.pyload.event_manager.get_events(uuid)
-        new_events = []
-
-        def conv_dest(d):
-            return (Destination.QUEUE if d == "queue" else Destination.COLLECTOR).value
+        return self._convert_events(self.pyload.event_manager.get_events(uuid))
 
-        for e in events:
-            event = EventInfo()
-            event.eventname = e[0]
-            if e[0] in ("update", "remove", "insert"):
-                event.id = e[3]
-                event.type = (
-                    ElementType.PACKAGE if e[2] == "pack" else ElementType.FILE
-                ).value
-                event.destination = conv_dest(e[1])
-            elif e[0] == "order":
-                if e[1]:
-                    event.id = e[1]
-                    event.type = (
-                        ElementType.PACKAGE if e[2] == "pack" else ElementType.FILE
-                    )
-                    event.destination = conv_dest(e[3])
-            elif e[0] == "reload":
-                event.destination = conv_dest(e[1])
-            new_events.append(event)
-        return new_events
+    @legacy("getEventsSince")
+    @permission(Perms.STATUS)
+    def get_events_since(self, seq=None, timeout=0):
+        """
+        Lists events after sequence seq, waits up to timeout seconds for new ones.
+        Unlike `get_events` no client state is kept on the server.
+
+        :param seq: `EventBatch.seq` of the previous call, None to start at the
+            latest event
+        :param timeout: seconds to wait if there are no new events yet, at most
+            `MAX_EVENT_WAIT`
+        :return: `EventBatch`, with reload events for queue and collector if
+            seq is too old to resume from
+        """
+        timeout = max(0, min(timeout, self.MAX_EVENT_WAIT))
+        seq, events = self.pyload.event_manager.get_events_since(seq, timeout)
+        if events is None:
+            events = [
+                ReloadAllEvent("queue").to_list(),
+                ReloadAllEvent("collector").to_list(),
+            ]
+        else:
+            events = [e.to_list() for e in events]
+        return EventBatch(seq, self._convert_events(events))
 
     @legacy("getAccounts")
     @permission(Perms.ACCOUNTS)
@@ -1142,8 +1490,8 @@ class Api:
         """
         Get information about all entered accounts.
 
-        :param refresh: reload account info
-        :return: list of `AccountInfo`
+        :param refresh: reload account info, in the background
+        :return: list of `AccountInfo`, pending while logging in
         """
         accs = self.pyload.account_manager.get_account_infos(False, refresh)
         accounts = []
@@ -1159,6 +1507,7 @@ class Api:
                         acc["maxtraffic"],
                         acc["premium"],
                         acc["type"],
+                        acc.get("pending", False),
                     )
                     for acc in group
                 ]
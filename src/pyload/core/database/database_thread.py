@@ -5,14 +5,16 @@ import inspect
 import os
 import shutil
 import sqlite3
+import time
 from contextlib import closing
 from queue import Queue
-from threading import Event, Thread
+from threading import Condition, Event, Lock, Thread, Timer, current_thread
+from urllib.request import pathname2url
 
 from ... import exc_logger
 
 # DATABASE VERSION
-__version__ = 4
+__version__ = 6
 
 
 class style:
@@ -46,6 +48,14 @@ class style:
 
         return x
 
+    @classmethod
+    def read(cls, fn):
+        @staticmethod
+        def x(*args, **kwargs):
+            return cls.db.read(fn, *args, **kwargs)
+
+        return x
+
 
 class DatabaseJob:
     def __init__(self, f, *args, **kwargs):
@@ -91,6 +101,20 @@ class DatabaseJob:
         self.done.wait()
 
 
+class DatabaseReader:
+    """
+    read-only connection, used in place of the database thread for reads.
+    """
+
+    def __init__(self, db, conn):
+        self.db = db
+        self.conn = conn
+        self.c = conn.cursor()
+
+    def __getattr__(self, attr):
+        return getattr(self.db, attr)
+
+
 class DatabaseThread(Thread):
 
     subs = []
@@ -98,6 +122,8 @@ class DatabaseThread(Thread):
     DB_FILENAME = "pyload.db"
     VERSION_FILENAME = "db.version"
 
+    FLUSH_INTERVAL = 0.5  #: max seconds a deferred write stays buffered
+
     def __init__(self, core):
         super().__init__()
         self.daemon = True
@@ -111,6 +137,24 @@ class DatabaseThread(Thread):
         self.version_path = os.path.join(datadir, self.VERSION_FILENAME)
 
         self.jobs = Queue()
+        self.jobs_done = Condition()  #: notified when a job is processed
+        self.queued = 0  #: jobs put so far
+        self.processed = 0  #: jobs processed so far
+        self.readers = Queue()  #: pool of `DatabaseReader`
+        self.pool_size = 0  #: readers opened at setup
+
+        # write-behind buffer, see `defer`
+        self.pending = {}
+        self.pending_lock = Lock()
+        self.flush_timer = None
+        self.stats = {
+            "flushes": 0,
+            "rows": 0,
+            "last_batch": 0,
+            "max_batch": 0,
+            "last_latency": 0.0,
+            "max_latency": 0.0,
+        }
 
         self.setuplock = Event()
 
@@ -131,6 +175,10 @@ class DatabaseThread(Thread):
 
         self.c = self.conn.cursor()  #: compatibility
 
+        wal = self.pyload.config.get("database", "wal")
+        self.c.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self._set_pragmas(self.c)
+
         if convert is not None:
             self._convert_db(convert)
 
@@ -139,15 +187,44 @@ class DatabaseThread(Thread):
 
         self.conn.commit()
 
+        # readers would block on a rollback journal, so pool them in wal mode only
+        if wal:
+            for i in range(self.pyload.config.get("database", "readers")):
+                self.readers.put(self._open_reader())
+                self.pool_size += 1
+
         self.setuplock.set()
 
         while True:
             j = self.jobs.get()
             if j == "quit":
+                while not self.readers.empty():
+                    self.readers.get().conn.close()
                 self.c.close()
                 self.conn.close()
                 break
             j.process_job()
+            with self.jobs_done:
+                self.processed += 1
+                self.jobs_done.notify_all()
+
+    def _set_pragmas(self, c):
+        config = self.pyload.config
+        c.execute(f"PRAGMA synchronous={config.get('database', 'synchronous')}")
+        #: negative cache size is in KiB instead of pages
+        c.execute(f"PRAGMA cache_size={-config.get('database', 'cache_size')}")
+        c.execute(f"PRAGMA mmap_size={config.get('database', 'mmap_size') << 20}")
+
+    def _open_reader(self):
+        conn = sqlite3.connect(
+            f"file:{pathname2url(self.db_path)}?mode=ro",
+            uri=True,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        reader = DatabaseReader(self, conn)
+        self._set_pragmas(reader.c)
+        return reader
 
     @style.queue
     def shutdown(self):
@@ -197,6 +274,28 @@ class DatabaseThread(Thread):
             'CREATE TABLE IF NOT EXISTS "users" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "name" TEXT NOT NULL, "email" TEXT DEFAULT "" NOT NULL, "password" TEXT NOT NULL, "role" INTEGER DEFAULT 0 NOT NULL, "permission" INTEGER DEFAULT 0 NOT NULL, "template" TEXT DEFAULT "default" NOT NULL)'
         )
         self.pyload.log.info(self._("Database was converted from v3 to v4."))
+        self._convertV4()
+
+    def _convertV4(self):
+        # jobs are picked from the ready queue, not by query
+        self.c.execute('DROP INDEX IF EXISTS "l_job_index"')
+        self.pyload.log.info(self._("Database was converted from v4 to v5."))
+        self._convertV5()
+
+    def _convertV5(self):
+        for column in ("linkstotal", "linksdone", "sizetotal", "sizedone"):
+            self.c.execute(
+                f'ALTER TABLE "packages" ADD COLUMN "{column}" INTEGER DEFAULT 0 NOT NULL'
+            )
+        self.c.execute('DROP VIEW IF EXISTS "pstats"')
+        self.c.execute(
+            "UPDATE packages SET \
+            linkstotal=(SELECT COUNT(*) FROM links WHERE package=packages.id), \
+            sizetotal=(SELECT IFNULL(SUM(size), 0) FROM links WHERE package=packages.id), \
+            linksdone=(SELECT COUNT(*) FROM links WHERE package=packages.id AND status IN (0,4,13)), \
+            sizedone=(SELECT IFNULL(SUM(size), 0) FROM links WHERE package=packages.id AND status IN (0,4,13))"
+        )
+        self.pyload.log.info(self._("Database was converted from v5 to v6."))
 
     # --convert scripts end
 
@@ -205,12 +304,19 @@ class DatabaseThread(Thread):
         create tables for database.
         """
         self.c.execute(
-            'CREATE TABLE IF NOT EXISTS "packages" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "name" TEXT NOT NULL, "folder" TEXT, "password" TEXT DEFAULT "", "site" TEXT DEFAULT "", "queue" INTEGER DEFAULT 0 NOT NULL, "packageorder" INTEGER DEFAULT 0 NOT NULL)'
+            'CREATE TABLE IF NOT EXISTS "packages" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "name" TEXT NOT NULL, "folder" TEXT, "password" TEXT DEFAULT "", "site" TEXT DEFAULT "", "queue" INTEGER DEFAULT 0 NOT NULL, "packageorder" INTEGER DEFAULT 0 NOT NULL, "linkstotal" INTEGER DEFAULT 0 NOT NULL, "linksdone" INTEGER DEFAULT 0 NOT NULL, "sizetotal" INTEGER DEFAULT 0 NOT NULL, "sizedone" INTEGER DEFAULT 0 NOT NULL)'
         )
         self.c.execute(
             'CREATE TABLE IF NOT EXISTS "links" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "url" TEXT NOT NULL, "name" TEXT, "size" INTEGER DEFAULT 0 NOT NULL, "status" INTEGER DEFAULT 3 NOT NULL, "plugin" TEXT DEFAULT "DefaultPlugin" NOT NULL, "error" TEXT DEFAULT "", "linkorder" INTEGER DEFAULT 0 NOT NULL, "package" INTEGER DEFAULT 0 NOT NULL, FOREIGN KEY(package) REFERENCES packages(id))'
         )
-        self.c.execute('CREATE INDEX IF NOT EXISTS "p_id_index" ON links(package)')
+        # covers lookups by package as well as paging through it in link order
+        self.c.execute('DROP INDEX IF EXISTS "p_id_index"')
+        self.c.execute(
+            'CREATE INDEX IF NOT EXISTS "l_order_index" ON links(package, linkorder)'
+        )
+        self.c.execute(
+            'CREATE INDEX IF NOT EXISTS "p_queue_index" ON packages(queue, packageorder)'
+        )
         self.c.execute(
             'CREATE TABLE IF NOT EXISTS "storage" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "identifier" TEXT NOT NULL, "key" TEXT NOT NULL, "value" TEXT DEFAULT "")'
         )
@@ -218,13 +324,39 @@ class DatabaseThread(Thread):
             'CREATE TABLE IF NOT EXISTS "users" ("id" INTEGER PRIMARY KEY AUTOINCREMENT, "name" TEXT NOT NULL, "email" TEXT DEFAULT "" NOT NULL, "password" TEXT NOT NULL, "role" INTEGER DEFAULT 0 NOT NULL, "permission" INTEGER DEFAULT 0 NOT NULL, "template" TEXT DEFAULT "default" NOT NULL)'
         )
 
+        # package statistics, maintained on every change of links (finished,
+        # skipped and processing links count as done)
+        self.c.execute(
+            'CREATE TRIGGER IF NOT EXISTS "pstats_insert" AFTER INSERT ON "links" \
+        BEGIN \
+        UPDATE packages SET linkstotal=linkstotal+1, sizetotal=sizetotal+NEW.size, \
+        linksdone=linksdone+(NEW.status IN (0,4,13)), \
+        sizedone=sizedone+(CASE WHEN NEW.status IN (0,4,13) THEN NEW.size ELSE 0 END) \
+        WHERE id=NEW.package; \
+        END'
+        )
+        self.c.execute(
+            'CREATE TRIGGER IF NOT EXISTS "pstats_delete" AFTER DELETE ON "links" \
+        BEGIN \
+        UPDATE packages SET linkstotal=linkstotal-1, sizetotal=sizetotal-OLD.size, \
+        linksdone=linksdone-(OLD.status IN (0,4,13)), \
+        sizedone=sizedone-(CASE WHEN OLD.status IN (0,4,13) THEN OLD.size ELSE 0 END) \
+        WHERE id=OLD.package; \
+        END'
+        )
         self.c.execute(
-            'CREATE VIEW IF NOT EXISTS "pstats" AS \
-        SELECT p.id AS id, SUM(l.size) AS sizetotal, COUNT(l.id) AS linkstotal, linksdone, sizedone\
-        FROM packages p JOIN links l ON p.id = l.package LEFT OUTER JOIN\
-        (SELECT p.id AS id, COUNT(*) AS linksdone, SUM(l.size) AS sizedone \
-        FROM packages p JOIN links l ON p.id = l.package AND l.status in (0,4,13) GROUP BY p.id) s ON s.id = p.id \
-        GROUP BY p.id'
+            'CREATE TRIGGER IF NOT EXISTS "pstats_update" AFTER UPDATE OF size, status, package ON "links" \
+        WHEN OLD.size IS NOT NEW.size OR OLD.status IS NOT NEW.status OR OLD.package IS NOT NEW.package \
+        BEGIN \
+        UPDATE packages SET linkstotal=linkstotal-1, sizetotal=sizetotal-OLD.size, \
+        linksdone=linksdone-(OLD.status IN (0,4,13)), \
+        sizedone=sizedone-(CASE WHEN OLD.status IN (0,4,13) THEN OLD.size ELSE 0 END) \
+        WHERE id=OLD.package; \
+        UPDATE packages SET linkstotal=linkstotal+1, sizetotal=sizetotal+NEW.size, \
+        linksdone=linksdone+(NEW.status IN (0,4,13)), \
+        sizedone=sizedone+(CASE WHEN NEW.status IN (0,4,13) THEN NEW.size ELSE 0 END) \
+        WHERE id=NEW.package; \
+        END'
         )
 
         # try to lower ids
@@ -246,8 +378,6 @@ class DatabaseThread(Thread):
             "UPDATE SQLITE_SEQUENCE SET seq=? WHERE name=?", (pid, "packages")
         )
 
-        self.c.execute("VACUUM")
-
     def _migrate_user(self):
         if os.path.exists("pyload.db"):
             self.pyload.log.info(self._("Converting old Django DB"))
@@ -282,18 +412,149 @@ class DatabaseThread(Thread):
     def rollback(self):
         self.conn.rollback()
 
+    @style.queue
+    def vacuum(self):
+        """
+        rebuild the database file to reclaim free pages, blocks all other jobs
+        while running.
+        """
+        start = time.time()
+        self.c.execute("VACUUM")
+        self.pyload.log.info(
+            self._("Database vacuumed in {:.1f} seconds").format(time.time() - start)
+        )
+
+    def _put(self, job):
+        with self.jobs_done:
+            self.queued += 1
+            self.jobs.put(job)
+
     def async_(self, f, *args, **kwargs):
+        self.flush()
         args = (self,) + args
         job = DatabaseJob(f, *args, **kwargs)
-        self.jobs.put(job)
+        self._put(job)
 
     def queue(self, f, *args, **kwargs):
+        self.flush()
         args = (self,) + args
         job = DatabaseJob(f, *args, **kwargs)
-        self.jobs.put(job)
+        self._put(job)
         job.wait()
         return job.result
 
+    def read(self, f, *args, **kwargs):
+        """
+        run f on a pooled read-only connection in the calling thread, falls back
+        to the job queue if there is no pool.
+
+        The read sees the last committed snapshot and does not wait for queued or
+        buffered writes, call `sync` before if it has to see them.
+        """
+        if not self.pool_size:
+            return self.queue(f, *args, **kwargs)
+
+        if current_thread() is self:  #: called by a job
+            return f(self, *args, **kwargs)
+
+        reader = self.readers.get()
+        try:
+            return f(reader, *args, **kwargs)
+        except Exception:
+            msg = f"Database Error @ {f.__name__} {args} {kwargs}"
+            exc_logger.exception(msg)
+        finally:
+            self.readers.put(reader)
+
+    def sync(self):
+        """
+        wait until the buffered writes and the jobs queued so far are done, so
+        following reads see them.
+        """
+        if not self.pool_size or current_thread() is self:
+            return  #: reads go through the job queue, in order
+
+        self.flush()
+        with self.jobs_done:
+            queued = self.queued
+            self.jobs_done.wait_for(lambda: self.processed >= queued)
+
+    def defer(self, statement, key, params):
+        """
+        buffer a write statement, a later write with same statement and key
+        replaces it.
+
+        Buffered writes are executed together in one transaction, before any
+        other job is queued or at latest after `FLUSH_INTERVAL` seconds.
+        """
+        with self.pending_lock:
+            self.pending[(statement, key)] = params
+            if self.flush_timer is None:
+                self.flush_timer = Timer(self.FLUSH_INTERVAL, self.flush)
+                self.flush_timer.daemon = True
+                self.flush_timer.start()
+
+    def flush(self):
+        """
+        queue all buffered writes.
+        """
+        with self.pending_lock:
+            if self.flush_timer is not None:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+
+            if not self.pending:
+                return
+
+            pending = self.pending
+            self.pending = {}
+
+            # put while locked, so no other flush can overtake this one
+            self._put(DatabaseJob(self._flush_pending, pending))
+
+    def get_stats(self):
+        """
+        returns the flush statistics with the number of buffered writes and of
+        pooled readers.
+        """
+        with self.pending_lock:
+            stats = dict(self.stats, pending=len(self.pending))
+        stats["readers"] = self.pool_size
+        return stats
+
+    def _flush_pending(self, pending):
+        start = time.time()
+
+        batches = {}
+        for (statement, key), params in pending.items():
+            batches.setdefault(statement, []).append(params)
+
+        self.c.execute("BEGIN")
+        try:
+            for statement, params in batches.items():
+                self.c.executemany(statement, params)
+        except Exception:
+            self.c.execute("ROLLBACK")
+            raise
+        else:
+            self.c.execute("COMMIT")
+
+        latency = time.time() - start
+        size = len(pending)
+
+        with self.pending_lock:
+            self.stats["flushes"] += 1
+            self.stats["rows"] += size
+            self.stats["last_batch"] = size
+            self.stats["max_batch"] = max(size, self.stats["max_batch"])
+            self.stats["last_latency"] = latency
+            self.stats["max_latency"] = max(latency, self.stats["max_latency"])
+
+        if self.pyload.debug > 1:
+            self.pyload.log.debug(
+                f"Flushed {size} deferred writes in {latency * 1000:.1f} ms"
+            )
+
     @classmethod
     def register_sub(cls, klass):
         cls.subs.append(klass)
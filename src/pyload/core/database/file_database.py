@@ -6,9 +6,54 @@ from ..datatypes.pypackage import PyPackage
 from ..utils import format
 from .database_thread import DatabaseThread, style
 
+#: plugins which are processed in collector
+COLLECTOR_PLUGINS = ("DLC", "LinkList", "SerienjunkiesOrg", "CCF", "RSDF")
+
+#: sort keys of the paged queries, the row id is appended as tiebreaker, keys must
+#: not be NULL or the keyset comparison drops the row
+LINK_SORT_KEYS = {
+    "order": ("p.packageorder", "l.linkorder"),
+    "name": ("IFNULL(l.name, '')",),
+    "size": ("l.size",),
+    "status": ("l.status",),
+    "plugin": ("l.plugin",),
+}
+PACKAGE_SORT_KEYS = {
+    "order": ("packageorder",),
+    "name": ("name",),
+    "size": ("sizetotal",),
+    "links": ("linkstotal",),
+}
+
+
+def _like(value):
+    """
+    substring pattern for a LIKE ... ESCAPE '\\' clause.
+    """
+    value = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{value}%"
+
+
+def _page(keys, where, params, offset, limit, after, desc):
+    """
+    completes a filtered query to one page, either by offset or by keyset.
+
+    `after` are the sort key values of the last row of the previous page,
+    `limit + 1` rows are selected to tell if there is a next page.
+    """
+    op, direction = ("<", " DESC") if desc else (">", "")
+    if after:
+        where = where + [f"({', '.join(keys)}) {op} ({', '.join('?' * len(keys))})"]
+        params = params + list(after)
+        offset = 0
+
+    clause = " AND ".join(where)
+    order = ", ".join(f"{key}{direction}" for key in keys)
+    return clause, order, params + [limit + 1, offset]
+
 
 class FileDatabaseMethods:
-    @style.queue
+    @style.read
     def filecount(self, queue):
         """
         returns number of files in queue.
@@ -19,7 +64,7 @@ class FileDatabaseMethods:
         )
         return self.c.fetchone()[0]
 
-    @style.queue
+    @style.read
     def queuecount(self, queue):
         """
         number of files in queue not finished yet.
@@ -80,6 +125,11 @@ class FileDatabaseMethods:
             "INSERT INTO links(url, name, plugin, package, linkorder) VALUES(?,?,?,?,?)",
             links,
         )
+        self.c.execute(
+            "SELECT id, plugin, linkorder FROM links WHERE package=? AND linkorder>=? ORDER BY linkorder",
+            (package, order),
+        )
+        return self.c.fetchall()
 
     @style.queue
     def add_package(self, name, folder, queue):
@@ -90,6 +140,66 @@ class FileDatabaseMethods:
         )
         return self.c.lastrowid
 
+    @style.queue
+    def add_packages(self, packages, queue):
+        """
+        packages is a list of tupels (name, folder, password, links) with links a
+        list of tupels (url, plugin), all inserted in one transaction.
+
+        returns a list of tupels (id, order, links) with links a list of tupels
+        (id, plugin, order).
+        """
+        order = self._next_package_order(queue)
+        result = []
+
+        self.c.execute("BEGIN")
+        try:
+            for name, folder, password, links in packages:
+                self.c.execute(
+                    "INSERT INTO packages(name, folder, password, queue, packageorder) VALUES(?,?,?,?,?)",
+                    (name, folder, password, queue, order),
+                )
+                pid = self.c.lastrowid
+                result.append((pid, order, self._insert_links(links, pid)))
+                order += 1
+        except Exception:
+            self.c.execute("ROLLBACK")
+            raise
+        self.c.execute("COMMIT")
+
+        return result
+
+    @style.queue
+    def replace_links(self, links, package):
+        """
+        replaces all links of a package, links is a list of tupels (url, plugin).
+        """
+        self.c.execute("BEGIN")
+        try:
+            self.c.execute("DELETE FROM links WHERE package=?", (package,))
+            result = self._insert_links(links, package)
+        except Exception:
+            self.c.execute("ROLLBACK")
+            raise
+        self.c.execute("COMMIT")
+
+        return result
+
+    @style.inner
+    def _insert_links(self, links, package):
+        """
+        inserts the links of a package without any.
+        """
+        self.c.executemany(
+            "INSERT INTO links(url, name, plugin, package, linkorder) VALUES(?,?,?,?,?)",
+            [(url, url, plugin, package, i) for i, (url, plugin) in enumerate(links)],
+        )
+        self.c.execute(
+            "SELECT id, plugin, linkorder FROM links WHERE package=? ORDER BY linkorder",
+            (package,),
+        )
+        return self.c.fetchall()
+
     @style.queue
     def delete_package(self, p):
         self.c.execute("DELETE FROM links WHERE package=?", (str(p.id),))
@@ -107,7 +217,7 @@ class FileDatabaseMethods:
             (f.order, str(f.packageid)),
         )
 
-    @style.queue
+    @style.read
     def get_all_links(self, q):
         """
         return information about all links in queue q.
@@ -143,7 +253,7 @@ class FileDatabaseMethods:
 
         return data
 
-    @style.queue
+    @style.read
     def get_all_packages(self, q):
         """
         return information about packages in queue q (only useful in get all data)
@@ -158,10 +268,9 @@ class FileDatabaseMethods:
         }
         """
         self.c.execute(
-            "SELECT p.id, p.name, p.folder, p.site, p.password, p.queue, p.packageorder, s.sizetotal, s.sizedone, s.linksdone, s.linkstotal \
-            FROM packages p JOIN pstats s ON p.id = s.id \
-            WHERE p.queue=? ORDER BY p.packageorder",
-            str(q),
+            "SELECT id, name, folder, site, password, queue, packageorder, sizetotal, sizedone, linksdone, linkstotal \
+            FROM packages WHERE queue=? AND linkstotal > 0 ORDER BY packageorder",
+            (q,),
         )
 
         data = {}
@@ -174,16 +283,16 @@ class FileDatabaseMethods:
                 "password": r[4],
                 "queue": r[5],
                 "order": r[6],
-                "sizetotal": int(r[7]),
-                "sizedone": r[8] if r[8] else 0,  #: these can be None
-                "linksdone": r[9] if r[9] else 0,
+                "sizetotal": r[7],
+                "sizedone": r[8],
+                "linksdone": r[9],
                 "linkstotal": r[10],
                 "links": {},
             }
 
         return data
 
-    @style.queue
+    @style.read
     def get_link_data(self, id):
         """
         get link information as dict.
@@ -212,7 +321,7 @@ class FileDatabaseMethods:
 
         return data
 
-    @style.queue
+    @style.read
     def get_package_data(self, id):
         """
         get data about links for a package.
@@ -240,10 +349,148 @@ class FileDatabaseMethods:
 
         return data
 
-    @style.async_
-    def update_link(self, f):
+    @style.read
+    def get_links_page(
+        self,
+        q,
+        offset=0,
+        limit=50,
+        after=None,
+        sort="order",
+        desc=False,
+        status=None,
+        plugin=None,
+        name=None,
+        package=None,
+    ):
+        """
+        return one page of the links in queue q, filtered and sorted.
+
+        format:
+
+        (total, [{'name': name, ... 'package': id }, ...], key)
+
+        total counts all matching links, key holds the sort key values of
+        the last row if there is a next page, else None.
+        """
+        where, params = ["p.queue=?"], [q]
+        if status:
+            where.append(f"l.status IN ({','.join('?' * len(status))})")
+            params.extend(status)
+        if plugin:
+            where.append(f"l.plugin IN ({','.join('?' * len(plugin))})")
+            params.extend(plugin)
+        if name:
+            where.append("l.name LIKE ? ESCAPE '\\'")
+            params.append(_like(name))
+        if package is not None:
+            where.append("l.package=?")
+            params.append(package)
+
         self.c.execute(
+            f"SELECT COUNT(*) FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE {' AND '.join(where)}",
+            params,
+        )
+        total = self.c.fetchone()[0]
+
+        keys = LINK_SORT_KEYS[sort] + ("l.id",)
+        clause, order, params = _page(keys, where, params, offset, limit, after, desc)
+        self.c.execute(
+            f"SELECT l.id,l.url,l.name,l.size,l.status,l.error,l.plugin,l.package,l.linkorder,{','.join(keys)} \
+            FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE {clause} ORDER BY {order} LIMIT ? OFFSET ?",
+            params,
+        )
+
+        data = []
+        key = None
+        for r in self.c:
+            if len(data) == limit:
+                key = list(last[9:])
+                break
+            data.append(
+                {
+                    "id": r[0],
+                    "url": r[1],
+                    "name": r[2],
+                    "size": r[3],
+                    "format_size": format.size(r[3]),
+                    "status": r[4],
+                    "statusmsg": self.pyload.files.status_msg[r[4]],
+                    "error": r[5],
+                    "plugin": r[6],
+                    "package": r[7],
+                    "order": r[8],
+                }
+            )
+            last = r
+
+        return total, data, key
+
+    @style.read
+    def get_packages_page(
+        self, q, offset=0, limit=50, after=None, sort="order", desc=False, name=None
+    ):
+        """
+        return one page of the packages in queue q, filtered and sorted.
+
+        format:
+
+        (total, [{'name': name ... 'links': {} }, ...], key)
+
+        see `get_links_page`.
+        """
+        where, params = ["queue=?", "linkstotal > 0"], [q]
+        if name:
+            where.append("name LIKE ? ESCAPE '\\'")
+            params.append(_like(name))
+
+        self.c.execute(
+            f"SELECT COUNT(*) FROM packages WHERE {' AND '.join(where)}", params
+        )
+        total = self.c.fetchone()[0]
+
+        keys = PACKAGE_SORT_KEYS[sort] + ("id",)
+        clause, order, params = _page(keys, where, params, offset, limit, after, desc)
+        self.c.execute(
+            f"SELECT id, name, folder, site, password, queue, packageorder, sizetotal, sizedone, linksdone, linkstotal, {','.join(keys)} \
+            FROM packages WHERE {clause} ORDER BY {order} LIMIT ? OFFSET ?",
+            params,
+        )
+
+        data = []
+        key = None
+        for r in self.c:
+            if len(data) == limit:
+                key = list(last[11:])
+                break
+            data.append(
+                {
+                    "id": r[0],
+                    "name": r[1],
+                    "folder": r[2],
+                    "site": r[3],
+                    "password": r[4],
+                    "queue": r[5],
+                    "order": r[6],
+                    "sizetotal": r[7],
+                    "sizedone": r[8],
+                    "linksdone": r[9],
+                    "linkstotal": r[10],
+                    "links": {},
+                }
+            )
+            last = r
+
+        return total, data, key
+
+    @style.inner
+    def update_link(self, f):
+        """
+        deferred, status changes of the same link are coalesced.
+        """
+        self.defer(
             "UPDATE links SET url=?,name=?,size=?,status=?,error=?,package=? WHERE id=?",
+            f.id,
             (f.url, f.name, f.size, f.status, f.error, str(f.packageid), str(f.id)),
         )
 
@@ -257,18 +504,18 @@ class FileDatabaseMethods:
     @style.queue
     def update_link_info(self, data):
         """
-        data is list of tupels (name, size, status, url)
+        data is list of tupels (name, size, status, url), returns list of tupels
+        (id, plugin, package, order, status) of the affected links.
         """
         self.c.executemany(
             "UPDATE links SET name=?, size=?, status=? WHERE url=? AND status IN (1,2,3,14)",
             data,
         )
-        ids = []
         statuses = "','".join(x[3] for x in data)
-        self.c.execute(f"SELECT id FROM links WHERE url IN ('{statuses}')")
-        for r in self.c:
-            ids.append(int(r[0]))
-        return ids
+        self.c.execute(
+            f"SELECT id, plugin, package, linkorder, status FROM links WHERE url IN ('{statuses}')"
+        )
+        return self.c.fetchall()
 
     @style.queue
     def reorder_package(self, p, position, no_move=False):
@@ -354,38 +601,18 @@ class FileDatabaseMethods:
         return PyFile(self.pyload.files, id, *r)
 
     @style.queue
-    def get_job(self, occ):
-        """
-        return pyfile ids, which are suitable for download and dont use a occupied
-        plugin.
-        """
-        # TODO: improve this hardcoded method
-        # plugins which are processed in collector
-        pre = "('DLC', 'LinkList', 'SerienjunkiesOrg', 'CCF', 'RSDF')"
-
-        cmd = "("
-        for i, item in enumerate(occ):
-            if i:
-                cmd += ", "
-            cmd += f"'{item}'"
-
-        cmd += ")"
-        cmd = f"SELECT l.id FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE ((p.queue=1 AND l.plugin NOT IN {cmd}) OR l.plugin IN {pre}) AND l.status IN (2,3,14) ORDER BY p.packageorder ASC, l.linkorder ASC LIMIT 5"
-
-        self.c.execute(cmd)  #: very bad!
-
-        return [x[0] for x in self.c]
-
-    @style.queue
-    def get_plugin_job(self, plugins):
+    def get_job_data(self):
         """
-        returns pyfile ids with suited plugins.
+        return all packages as (id, queue, order) and all links suitable for
+        download as (id, plugin, package, order), used to fill the ready queue.
         """
-        cmd = f"SELECT l.id FROM links as l INNER JOIN packages as p ON l.package=p.id WHERE l.plugin IN {plugins} AND l.status IN (2,3,14) ORDER BY p.packageorder ASC, l.linkorder ASC LIMIT 5"
-
-        self.c.execute(cmd)  #: very bad!
-
-        return [x[0] for x in self.c]
+        self.c.execute("SELECT id, queue, packageorder FROM packages")
+        packages = self.c.fetchall()
+        self.c.execute(
+            "SELECT id, plugin, package, linkorder FROM links WHERE status IN (2,3,14)"
+        )
+        links = self.c.fetchall()
+        return packages, links
 
     @style.queue
     def get_unfinished(self, pid):
@@ -408,7 +635,15 @@ class FileDatabaseMethods:
 
     @style.queue
     def restart_failed(self):
+        """
+        returns list of tupels (id, plugin, package, order) of restarted links.
+        """
+        self.c.execute(
+            "SELECT id, plugin, package, linkorder FROM links WHERE status IN (6, 8, 9)"
+        )
+        links = self.c.fetchall()
         self.c.execute("UPDATE links SET status=3,error='' WHERE status IN (6, 8, 9)")
+        return links
 
     @style.queue
     def find_duplicates(self, id, folder, filename):
@@ -30,6 +30,7 @@ class AccountInfo(AbstractData):
         "maxtraffic",
         "premium",
         "type",
+        "pending",
     ]
 
     def __init__(
@@ -42,6 +43,7 @@ class AccountInfo(AbstractData):
         maxtraffic=None,
         premium=None,
         type=None,
+        pending=None,
     ):
         self.validuntil = validuntil
         self.login = login
@@ -51,6 +53,7 @@ class AccountInfo(AbstractData):
         self.maxtraffic = maxtraffic
         self.premium = premium
         self.type = type
+        self.pending = pending
 
 
 class CaptchaTask(AbstractData):
@@ -83,6 +86,50 @@ class ConfigSection(AbstractData):
         self.outline = outline
 
 
+class ConnectionStats(AbstractData):
+    __slots__ = ["idle", "hits", "misses", "reused", "connects"]
+
+    def __init__(self, idle=None, hits=None, misses=None, reused=None, connects=None):
+        self.idle = idle
+        self.hits = hits
+        self.misses = misses
+        self.reused = reused
+        self.connects = connects
+
+
+class DatabaseStats(AbstractData):
+    __slots__ = [
+        "flushes",
+        "rows",
+        "last_batch",
+        "max_batch",
+        "last_latency",
+        "max_latency",
+        "pending",
+        "readers",
+    ]
+
+    def __init__(
+        self,
+        flushes=None,
+        rows=None,
+        last_batch=None,
+        max_batch=None,
+        last_latency=None,
+        max_latency=None,
+        pending=None,
+        readers=None,
+    ):
+        self.flushes = flushes
+        self.rows = rows
+        self.last_batch = last_batch
+        self.max_batch = max_batch
+        self.last_latency = last_latency
+        self.max_latency = max_latency
+        self.pending = pending
+        self.readers = readers
+
+
 class DownloadInfo(AbstractData):
     __slots__ = [
         "fid",
@@ -153,6 +200,14 @@ class EventInfo(AbstractData):
         self.destination = destination
 
 
+class EventBatch(AbstractData):
+    __slots__ = ["seq", "events"]
+
+    def __init__(self, seq=None, events=None):
+        self.seq = seq
+        self.events = events
+
+
 class FileData(AbstractData):
     __slots__ = [
         "fid",
@@ -231,6 +286,16 @@ class InteractionTask(AbstractData):
         self.plugin = plugin
 
 
+class LogEntryData(AbstractData):
+    __slots__ = ["line", "date", "level", "message"]
+
+    def __init__(self, line=None, date=None, level=None, message=None):
+        self.line = line
+        self.date = date
+        self.level = level
+        self.message = message
+
+
 class OnlineCheck(AbstractData):
     __slots__ = ["rid", "data"]
 
@@ -239,6 +304,42 @@ class OnlineCheck(AbstractData):
         self.data = data
 
 
+class OnlineCheckStats(AbstractData):
+    __slots__ = [
+        "workers",
+        "queued",
+        "running",
+        "waiting",
+        "checked",
+        "latency",
+        "cached",
+        "cache_hits",
+        "cache_misses",
+    ]
+
+    def __init__(
+        self,
+        workers=None,
+        queued=None,
+        running=None,
+        waiting=None,
+        checked=None,
+        latency=None,
+        cached=None,
+        cache_hits=None,
+        cache_misses=None,
+    ):
+        self.workers = workers
+        self.queued = queued
+        self.running = running
+        self.waiting = waiting
+        self.checked = checked
+        self.latency = latency
+        self.cached = cached
+        self.cache_hits = cache_hits
+        self.cache_misses = cache_misses
+
+
 class OnlineStatus(AbstractData):
     __slots__ = ["name", "plugin", "packagename", "status", "size"]
 
@@ -300,6 +401,48 @@ class PackageData(AbstractData):
         self.fids = fids
 
 
+class PageData(AbstractData):
+    __slots__ = ["items", "total", "cursor"]
+
+    def __init__(self, items=None, total=None, cursor=None):
+        self.items = items
+        self.total = total
+        self.cursor = cursor
+
+
+class ScheduledJobStats(AbstractData):
+    __slots__ = ["name", "runs", "errors", "total", "longest", "last"]
+
+    def __init__(
+        self, name=None, runs=None, errors=None, total=None, longest=None, last=None
+    ):
+        self.name = name
+        self.runs = runs
+        self.errors = errors
+        self.total = total
+        self.longest = longest
+        self.last = last
+
+
+class SchedulerStats(AbstractData):
+    __slots__ = ["workers", "pending", "jobs"]
+
+    def __init__(self, workers=None, pending=None, jobs=None):
+        self.workers = workers
+        self.pending = pending
+        self.jobs = jobs
+
+
+class SpeedLimitData(AbstractData):
+    __slots__ = ["kind", "name", "limit", "weight"]
+
+    def __init__(self, kind=None, name=None, limit=None, weight=None):
+        self.kind = kind
+        self.name = name
+        self.limit = limit
+        self.weight = weight
+
+
 class ServerStatus(AbstractData):
     __slots__ = [
         "pause",
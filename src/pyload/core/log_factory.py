@@ -13,6 +13,8 @@ try:
 except ImportError:
     colorlog = None
 
+from .log_reader import LogReader
+
 
 class LogFactory:
 
@@ -46,6 +48,7 @@ class LogFactory:
         self.pyload = core
         self._ = core._
         self.loggers = {}
+        self.readers = {}
 
     def init_logger(self, name):
         logger = logging.getLogger(name)
@@ -145,22 +148,33 @@ class LogFactory:
         sysloghdlr.setFormatter(syslog_form)
         logger.addHandler(sysloghdlr)
 
-    def _init_filelog_handler(self, logger):
-        filename = logger.name + self.FILE_EXTENSION
-        dirname = None
-
+    def get_filelog_path(self, name):
         folder = self.pyload.config.get("log", "filelog_folder")
         if folder:
             dirname = folder
         else:
             dirname = os.path.join(self.pyload.userdir, "logs")
 
-        os.makedirs(dirname, exist_ok=True)
+        return os.path.join(dirname, name + self.FILE_EXTENSION)
+
+    def get_reader(self, name):
+        """
+        returns a `LogReader` for the log file of a logger, kept to reuse its index.
+        """
+        filename = self.get_filelog_path(name)
+        reader = self.readers.get(name)
+        if reader is None or reader.filename != filename:
+            encoding = locale.getpreferredencoding(do_setlocale=False)
+            reader = self.readers[name] = LogReader(filename, encoding)
+        return reader
+
+    def _init_filelog_handler(self, logger):
+        filelog_path = self.get_filelog_path(logger.name)
+        os.makedirs(os.path.dirname(filelog_path), exist_ok=True)
 
         filelog_form = logging.Formatter(
             self.LINEFORMAT, self.DATEFORMAT, self.LINESTYLE
         )
-        filelog_path = os.path.join(dirname, filename)
 
         encoding = locale.getpreferredencoding(do_setlocale=False)
         if self.pyload.config.get("log", "filelog_rotate"):
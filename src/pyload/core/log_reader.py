@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+from threading import Lock
+
+from .utils.old import lock
+
+
+class LogReader:
+    """
+    Reads lines of a log file by number or time without reading all of it.
+
+    A sparse index holds the number, byte offset and time of a line about every
+    BLOCK_SIZE bytes. It is extended with the lines appended since the last read
+    and rebuilt when the log was rotated, so only a block has to be skipped to
+    reach any line.
+    """
+
+    BLOCK_SIZE = 64 << 10
+
+    #: see `LogFactory.LINEFORMAT`
+    LINE_PATTERN = re.compile(
+        r"\[(?P<date>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\]\s+(?P<level>[A-Z]+)\s+"
+        r"(?P<message>.*)",
+        re.S,
+    )
+    DATEFORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, filename, encoding=None):
+        self.filename = filename
+        self.encoding = encoding or "utf-8"
+        self.lock = Lock()
+        self._reset()
+
+    def _reset(self, inode=None):
+        self.inode = inode
+        self.size = 0  #: bytes of complete lines indexed
+        self.count = 0  #: lines indexed
+        self.numbers = []  #: number of the first line of each block
+        self.offsets = []  #: byte offset of the first line of each block
+        self.times = []  #: time of the last logged line up to each block
+
+    def parse(self, line):
+        """
+        splits a line into date, level and message, date and level are None for
+        lines continuing an entry.
+        """
+        m = self.LINE_PATTERN.match(line)
+        if m is None:
+            return None, None, line.rstrip("\r\n")
+        return m.group("date"), m.group("level"), m.group("message").rstrip("\r\n")
+
+    @staticmethod
+    def _level(name):
+        level = logging.getLevelName(name)
+        return level if isinstance(level, int) else None
+
+    def _time(self, date):
+        try:
+            return time.mktime(time.strptime(date, self.DATEFORMAT))
+        except (TypeError, ValueError):
+            return None
+
+    @lock
+    def update(self):
+        """
+        indexes the lines logged since the last call.
+
+        :return: number of lines in the log
+        """
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            self._reset()
+            return 0
+
+        if st.st_ino != self.inode or st.st_size < self.size:  #: rotated
+            self._reset(st.st_ino)
+
+        if st.st_size == self.size:
+            return self.count
+
+        with open(self.filename, mode="rb") as fp:
+            fp.seek(self.size)
+            buf = b""
+            for data in iter(lambda: fp.read(self.BLOCK_SIZE), b""):
+                buf += data
+                end = buf.rfind(b"\n") + 1
+                if end:
+                    self._add_block(buf[:end])
+                    buf = buf[end:]
+
+        return self.count
+
+    def _add_block(self, block):
+        if not self.offsets or self.size - self.offsets[-1] >= self.BLOCK_SIZE:
+            last = self.times[-1] if self.times else 0
+            self.numbers.append(self.count)
+            self.offsets.append(self.size)
+            self.times.append(last)
+
+        #: time of the last line starting with a date
+        end = len(block) - 1
+        while end > 0:
+            pos = block.rfind(b"\n", 0, end) + 1
+            date = self.parse(block[pos : pos + 40].decode("ascii", "replace"))[0]
+            timestamp = self._time(date)
+            if timestamp is not None:
+                self.times[-1] = timestamp
+                break
+            end = pos - 1
+
+        self.count += block.count(b"\n")
+        self.size += len(block)
+
+    def _seek(self, line):
+        """
+        returns number and offset of an indexed line at or before line.
+        """
+        with self.lock:
+            i = bisect_right(self.numbers, line) - 1
+            if i < 0:
+                return 0, 0
+            return self.numbers[i], self.offsets[i]
+
+    def find(self, since):
+        """
+        returns the number of the first line logged at or after since.
+        """
+        self.update()
+        with self.lock:
+            #: first block whose last line was logged at or after since
+            i = bisect_left(self.times, since)
+            if i == len(self.numbers):
+                return self.count
+            start = self.numbers[i]
+
+        for number, text in self.lines(start):
+            timestamp = self._time(self.parse(text[:40])[0])
+            if timestamp is not None and timestamp >= since:
+                return number
+        return self.count
+
+    def _lines(self, start):
+        """
+        yields number and text of the complete lines from the indexed line before
+        start on.
+        """
+        total = self.update()
+        if not total:
+            return
+
+        number, offset = self._seek(start)
+        with open(self.filename, mode="rb") as fp:
+            fp.seek(offset)
+            for line in fp:
+                if not line.endswith(b"\n") or number >= total:
+                    break  #: still being written
+
+                yield number, line.decode(self.encoding, "replace")
+                number += 1
+
+    def lines(self, start=0):
+        """
+        yields number and text of the lines from line start, negative to count from
+        the end.
+        """
+        if start < 0:
+            start = max(self.update() + start, 0)
+
+        for number, text in self._lines(start):
+            if number >= start:
+                yield number, text
+
+    def read(self, start=0, count=0, level=None, since=None):
+        """
+        yields number, date, level and message of the lines from line start.
+
+        :param start: first line, negative to count from the end
+        :param count: maximum number of lines, 0 for all
+        :param level: name of the lowest level of the lines, continuing lines have
+            the level of their entry
+        :param since: unix time, skip lines logged earlier
+        """
+        min_level = self._level(level) if level else None
+        if level and min_level is None:
+            raise ValueError(f"Unknown log level: {level}")
+
+        if start < 0:
+            start = max(self.update() + start, 0)
+        if since:
+            start = max(start, self.find(since))
+
+        entry_level = None
+        for number, text in self._lines(start):
+            date, lvl, message = self.parse(text)
+            if lvl is not None:
+                entry_level = self._level(lvl)
+
+            if number < start or (
+                min_level is not None
+                and (entry_level is None or entry_level < min_level)
+            ):
+                continue
+
+            yield number, date, lvl, message
+            count -= 1
+            if not count:
+                break
@@ -3,6 +3,8 @@
 
 import os
 import shutil
+import time
+from concurrent import futures
 from threading import Lock
 
 from ..utils.old import lock
@@ -17,6 +19,9 @@ class AccountManager:
     manages all accounts.
     """
 
+    LOGIN_WORKERS = 4  #: account plugins logging in at once
+    READY_TIMEOUT = 60  #: seconds a plugin waits for the accounts it needs
+
     # ----------------------------------------------------------------------
     def __init__(self, core):
         """
@@ -26,6 +31,12 @@ class AccountManager:
         self._ = core._
         self.lock = Lock()
 
+        self.refresh_lock = Lock()
+        self.refreshing = {}  #: plugin -> future, accounts shown while pending
+        self.executor = futures.ThreadPoolExecutor(
+            self.LOGIN_WORKERS, thread_name_prefix="AccountManager"
+        )
+
         # TODO: Recheck
         configdir = os.path.join(core.userdir, "settings")
         os.makedirs(configdir, exist_ok=True)
@@ -182,26 +193,150 @@ class AccountManager:
 
             self.save_accounts()
 
-    @lock
     def get_account_infos(self, force=True, refresh=False):
-        data = {}
+        """
+        returns the accounts of each plugin, accounts logging in are marked pending.
 
+        :param force: log in all accounts again and wait for it
+        :param refresh: log in all accounts again in the background, return at once
+        """
         if refresh:
-            self.pyload.scheduler.add_job(
-                0, self.pyload.account_manager.get_account_infos
-            )
+            self.refresh_accounts()
             force = False
 
-        for p in self.accounts.keys():
-            if self.accounts[p]:
-                p = self.get_account_plugin(p)
-                data[p.__name__] = p.get_all_accounts(force)
-            else:
-                data[p] = []
+        with self.refresh_lock:
+            logging_in = set(self.refreshing)
+
+        if force and logging_in:
+            #: logins already running are waited for instead of starting others,
+            #: all with one deadline and without holding the lock
+            deadline = time.time() + self.READY_TIMEOUT
+            while True:
+                with self.refresh_lock:
+                    #: a login claimed by wait_account runs under a new future
+                    pending = [
+                        f
+                        for p, (f, accounts) in self.refreshing.items()
+                        if p in logging_in
+                    ]
+                timeout = deadline - time.time()
+                if not pending or timeout <= 0:
+                    break
+                futures.wait(pending, timeout)
+
+        data = {}
+        with self.lock:
+            for p in self.accounts.keys():
+                fresh = force and p in logging_in
+
+                with self.refresh_lock:
+                    pending = self.refreshing.get(p)
+
+                if pending is not None:
+                    data[p] = pending[1]
+                elif self.accounts[p]:
+                    p = self.get_account_plugin(p)
+                    data[p.__name__] = p.get_all_accounts(force and not fresh)
+                else:
+                    data[p] = []
         e = AccountUpdateEvent()
         self.pyload.event_manager.add_event(e)
         return data
 
+    def refresh_accounts(self):
+        """
+        logs in the accounts of all plugins on a few threads, without waiting.
+        """
+        with self.refresh_lock:
+            for name, accounts in self.accounts.items():
+                if not accounts or name in self.refreshing:
+                    continue
+
+                pending = [
+                    {
+                        "login": user,
+                        "maxtraffic": None,
+                        "options": info["options"],
+                        "pending": True,
+                        "premium": None,
+                        "trafficleft": None,
+                        "type": name,
+                        "valid": None,
+                        "validuntil": None,
+                    }
+                    for user, info in accounts.items()
+                ]
+                future = self.executor.submit(self._refresh, name)
+                self.refreshing[name] = (future, pending)
+
+    def _refresh(self, name):
+        start = time.time()
+        try:
+            self.get_account_plugin(name).init_accounts()
+
+        except Exception as exc:
+            self.pyload.log.error(
+                self._("Could not refresh {} accounts | {}").format(name, exc),
+                exc_info=self.pyload.debug > 1,
+                stack_info=self.pyload.debug > 2,
+            )
+
+        finally:
+            with self.refresh_lock:
+                self.refreshing.pop(name, None)
+
+            elapsed = time.time() - start
+            if elapsed > self.READY_TIMEOUT:
+                self.pyload.log.warning(
+                    self._("Refreshing {} accounts took {:.0f} seconds").format(
+                        name, elapsed
+                    )
+                )
+            self.send_change()
+
+    def wait_account(self, plugin, timeout=None):
+        """
+        waits until the accounts of plugin are logged in, they are logged in at once
+        if not started yet.
+
+        :return: False if still pending after timeout seconds
+        """
+        with self.refresh_lock:
+            pending = self.refreshing.get(plugin)
+            if pending is None:
+                return True
+
+            future, accounts = pending
+            claimed = future.cancel()  #: not started, do it here
+            if claimed:
+                #: other waiters wait for this thread instead
+                future = futures.Future()
+                future.set_running_or_notify_cancel()
+                self.refreshing[plugin] = (future, accounts)
+
+        if claimed:
+            try:
+                self._refresh(plugin)
+            finally:
+                future.set_result(None)
+            return True
+
+        try:
+            future.result(timeout)
+        except futures.TimeoutError:
+            return False
+        return True
+
+    def shutdown(self):
+        """
+        drops the logins not started yet, running ones are not waited for.
+        """
+        with self.refresh_lock:
+            for name, (future, accounts) in list(self.refreshing.items()):
+                if future.cancel():
+                    del self.refreshing[name]
+        self.executor.shutdown(wait=False)
+
     def send_change(self):
         e = AccountUpdateEvent()
         self.pyload.event_manager.add_event(e)
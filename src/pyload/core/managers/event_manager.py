@@ -2,63 +2,105 @@
 # AUTHOR: mkaay
 
 import time
+from collections import deque
+from itertools import islice
+from threading import Condition
 
 from ..utils.purge import uniquify
 
 
 class EventManager:
+    """
+    keeps the latest events in a ring buffer, numbered by a sequence.
+
+    Clients remember the sequence of the last event they saw and resume from
+    it, only clients which fell behind the buffer have to reload everything.
+    """
+
+    MAX_EVENTS = 1000  #: size of the ring buffer
+    CLIENT_TIMEOUT = 30  #: seconds until an idle polling client is forgotten
+
     def __init__(self, core):
         self.pyload = core
         self._ = core._
-        self.clients = []
+        self.clients = {}  #: uuid -> `Client`
+
+        self.events = deque(maxlen=self.MAX_EVENTS)  #: (seq, event)
+        #: sequence of the latest event, starting at a timestamp so sequences
+        #: from before a restart are not mistaken for current ones
+        self.seq = int(time.time() * 1000)
+        self.cond = Condition()
 
     def new_client(self, uuid):
-        self.clients.append(Client(uuid))
+        self.clients[uuid] = Client(uuid, self.seq)
 
     def clean(self):
-        for n, client in enumerate(self.clients):
-            if client.last_active + 30 < time.time():
-                del self.clients[n]
+        timeout = time.time() - self.CLIENT_TIMEOUT
+        for uuid, client in list(self.clients.items()):
+            if client.last_active < timeout:
+                del self.clients[uuid]
 
     def get_events(self, uuid):
-        events = []
-        valid_uuid = False
-        for client in self.clients:
-            if client.uuid == uuid:
+        """
+        events since the last call of the client with this uuid.
+        """
+        with self.cond:
+            self.clean()
+            client = self.clients.get(uuid)
+            if client is None:
+                self.new_client(uuid)
+                events = None
+            else:
                 client.last_active = time.time()
-                valid_uuid = True
-                while client.new_events():
-                    events.append(client.pop_event().to_list())
-                break
-        if not valid_uuid:
-            self.new_client(uuid)
-            events = [
-                ReloadAllEvent("queue").to_list(),
-                ReloadAllEvent("collector").to_list(),
-            ]
-        return uniquify(events)  # return uniquify(events, repr)
+                events = self._since(client.seq)
+                client.seq = self.seq
+
+        if events is None:
+            events = [ReloadAllEvent("queue"), ReloadAllEvent("collector")]
+        #: lists are unhashable, uniquify them as tuples
+        return [list(e) for e in uniquify([tuple(e.to_list()) for e in events])]
+
+    def get_events_since(self, seq=None, timeout=0):
+        """
+        events after sequence seq, waits up to timeout seconds for one.
+
+        :return: (sequence of the latest event, list of events), the events are
+            None if seq already left the buffer and everything has to be reloaded
+        """
+        with self.cond:
+            if seq is None:
+                return self.seq, []
+            if seq == self.seq and timeout:
+                self.cond.wait_for(lambda: self.seq != seq, timeout)
+            return self.seq, self._since(seq)
+
+    def _since(self, seq):
+        """
+        events after sequence seq or None if some of them already left the buffer.
+        """
+        #: a sequence ahead of ours is from before a restart
+        if not self.seq - len(self.events) <= seq <= self.seq:
+            return None
+        events = [e for _, e in islice(reversed(self.events), self.seq - seq)]
+        events.reverse()
+        return events
 
     def add_event(self, event):
-        for client in self.clients:
-            client.add_event(event)
+        with self.cond:
+            self.seq += 1
+            self.events.append((self.seq, event))
+            self.cond.notify_all()
 
 
 class Client:
-    def __init__(self, uuid):
+    """
+    a polling client, identified by uuid.
+    """
+
+    def __init__(self, uuid, seq):
         self.uuid = uuid
+        self.seq = seq  #: sequence of the last event the client got
         self.last_active = time.time()
-        self.events = []
-
-    def new_events(self):
-        return len(self.events) > 0
-
-    def pop_event(self):
-        if not len(self.events):
-            return None
-        return self.events.pop(0)
-
-    def add_event(self, event):
-        self.events.append(event)
 
 
 class UpdateEvent:
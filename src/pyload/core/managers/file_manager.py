@@ -1,13 +1,285 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: RaNaN, mkaay
 
+from heapq import heapify, heappop, heappush
 from threading import RLock
 
+from ..database.file_database import COLLECTOR_PLUGINS
 from ..datatypes.enums import Destination
 from ..utils.old import lock
 from .event_manager import InsertEvent, ReloadAllEvent, RemoveEvent, UpdateEvent
 
 
+class ReadyQueue:
+    """
+    Per plugin queues of links suitable for download, ordered by package order and
+    link order.
+
+    The queues are heaps with lazy deletion: outdated entries are recognized by
+    their generation and skipped on pop, so every update is O(log n).
+    """
+
+    STATUSES = (2, 3, 14)  #: online, queued, unknown
+
+    def __init__(self):
+        self.lock = RLock()
+        self.loaded = False
+
+        self.packages = {}  #: package id -> [queue, order]
+        self.children = {}  #: package id -> set of link ids
+        self.links = {}  #: link id -> [plugin, package id, order, generation]
+        self.heaps = {}  #: (queue, plugin) -> [(package order, order, id, generation)]
+        self.taken = set()  #: link ids handed out and not released yet
+
+        self.generation = 0
+        self.size = 0  #: number of heap entries, outdated ones included
+
+    @lock
+    def load(self, fetch):
+        """
+        fill the queues with the result of fetch, which returns packages as (id,
+        queue, order) and links as (id, plugin, package, order).
+        """
+        if self.loaded:
+            return
+
+        packages, links = fetch()
+
+        self.packages = {pid: [queue, order] for pid, queue, order in packages}
+        self.children = {pid: set() for pid in self.packages}
+        self.links = {}
+        for fid, plugin, pid, order in links:
+            if pid in self.packages:
+                self.links[fid] = [plugin, pid, order, 0]
+                self.children[pid].add(fid)
+
+        self._rebuild()
+        self.loaded = True
+
+    def _rebuild(self):
+        self.heaps = {}
+        for fid, (plugin, pid, order, generation) in self.links.items():
+            if fid in self.taken:
+                continue
+            queue, porder = self.packages[pid]
+            entry = (porder, order, fid, generation)
+            self.heaps.setdefault((queue, plugin), []).append(entry)
+
+        for heap in self.heaps.values():
+            heapify(heap)
+
+        self.size = sum(len(heap) for heap in self.heaps.values())
+
+    def _push(self, fid):
+        link = self.links[fid]
+        self.generation += 1
+        link[3] = self.generation
+
+        plugin, pid, order, generation = link
+        queue, porder = self.packages[pid]
+        heappush(self.heaps.setdefault((queue, plugin), []), (porder, order, fid, generation))
+        self.size += 1
+
+    def _repush(self, fids):
+        """
+        re-key links after their package or link order changed.
+        """
+        fids = [fid for fid in fids if fid in self.links and fid not in self.taken]
+
+        if len(fids) > len(self.links) // 2:
+            self._rebuild()
+            return
+
+        for fid in fids:
+            self._push(fid)
+
+        if self.size > 2 * len(self.links) + 1024:
+            self._rebuild()
+
+    def _valid(self, entry):
+        porder, order, fid, generation = entry
+        link = self.links.get(fid)
+        return link is not None and link[3] == generation and fid not in self.taken
+
+    def _discard(self, fid):
+        link = self.links.pop(fid, None)
+        if link is not None:
+            self.children[link[1]].discard(fid)
+
+    @lock
+    def pop(self, accept):
+        """
+        hand out the next link id for which accept(queue, plugin) is true, or None.
+        """
+        best = None
+        for key, heap in self.heaps.items():
+            if not accept(*key):
+                continue
+
+            while heap and not self._valid(heap[0]):
+                heappop(heap)
+                self.size -= 1
+
+            if heap and (best is None or heap[0] < best[0]):
+                best = heap
+
+        if best is None:
+            return None
+
+        fid = heappop(best)[2]
+        self.size -= 1
+        self.taken.add(fid)
+        return fid
+
+    @lock
+    def release(self, fid):
+        """
+        make a handed out link available again, if it is still suitable.
+        """
+        if fid not in self.taken:
+            return
+
+        self.taken.discard(fid)
+        if fid in self.links:
+            self._push(fid)
+
+    @lock
+    def update(self, fid, plugin, pid, order, status):
+        if not self.loaded:
+            return
+
+        link = self.links.get(fid)
+
+        if status not in self.STATUSES or pid not in self.packages:
+            self._discard(fid)
+            return
+
+        if link is not None:
+            if link[:3] == [plugin, pid, order]:
+                return
+            self._discard(fid)
+
+        self.links[fid] = [plugin, pid, order, 0]
+        self.children[pid].add(fid)
+        if fid not in self.taken:
+            self._push(fid)
+
+    @lock
+    def remove_link(self, fid, pid, order):
+        if not self.loaded:
+            return
+
+        self._discard(fid)
+        self.taken.discard(fid)
+
+        shifted = []
+        for child in self.children.get(pid, ()):
+            link = self.links[child]
+            if link[2] > order:
+                link[2] -= 1
+                shifted.append(child)
+
+        self._repush(shifted)
+
+    @lock
+    def move_link(self, fid, pid, order, position):
+        if not self.loaded:
+            return
+
+        shifted = []
+        for child in self.children.get(pid, ()):
+            link = self.links[child]
+            if child == fid:
+                link[2] = position
+            elif order > position and position <= link[2] < order:
+                link[2] += 1
+            elif order < position and order < link[2] <= position:
+                link[2] -= 1
+            else:
+                continue
+            shifted.append(child)
+
+        self._repush(shifted)
+
+    @lock
+    def add_package(self, pid, queue, order):
+        if not self.loaded:
+            return
+
+        self.packages[pid] = [queue, order]
+        self.children[pid] = set()
+
+    @lock
+    def remove_package(self, pid):
+        if not self.loaded or pid not in self.packages:
+            return
+
+        for fid in self.children.pop(pid):
+            del self.links[fid]
+            self.taken.discard(fid)
+
+        queue, order = self.packages.pop(pid)
+        self._shift_packages(queue, order + 1, None, -1)
+
+    @lock
+    def move_package(self, pid, position):
+        """
+        mirrors `FileDatabaseMethods.reorder_package`.
+        """
+        if not self.loaded or pid not in self.packages:
+            return
+
+        queue, order = self.packages[pid]
+        if position == -1:
+            position = self._next_package_order(queue)
+
+        if order > position:
+            shifted = self._shift_packages(queue, position, order, 1, pid, False)
+        elif order < position:
+            shifted = self._shift_packages(queue, order + 1, position + 1, -1, pid, False)
+        else:
+            shifted = []
+
+        self.packages[pid][1] = position
+        self._repush(shifted + list(self.children[pid]))
+
+    @lock
+    def relocate_package(self, pid, queue):
+        """
+        mirrors `FileManager.set_package_location`.
+        """
+        if not self.loaded or pid not in self.packages:
+            return
+
+        oldqueue, order = self.packages[pid]
+        shifted = self._shift_packages(oldqueue, order + 1, None, -1, pid, False)
+
+        self.packages[pid] = [queue, -1]
+        self.packages[pid][1] = self._next_package_order(queue)
+        self._repush(shifted + list(self.children[pid]))
+
+    def _next_package_order(self, queue):
+        orders = [order for q, order in self.packages.values() if q == queue]
+        return max(orders) + 1 if orders else 0
+
+    def _shift_packages(self, queue, start, stop, delta, skip=None, repush=True):
+        """
+        shift order of packages in queue with start <= order < stop by delta.
+        """
+        shifted = []
+        for pid, package in self.packages.items():
+            if pid == skip or package[0] != queue or package[1] < start:
+                continue
+            if stop is not None and package[1] >= stop:
+                continue
+            package[1] += delta
+            shifted.extend(self.children[pid])
+
+        if repush:
+            self._repush(shifted)
+        return shifted
+
+
 class FileManager:
     """
     Handles all request made to obtain information, modify status or other request for
@@ -44,7 +316,7 @@ class FileManager:
         self.cache = {}  #: holds instances for files
         self.package_cache = {}  #: same for packages
 
-        self.job_cache = {}
+        self.jobs = ReadyQueue()  #: links suitable for download
 
         self.lock = RLock()  # TODO: should be a Lock w/o R
         # self.lock._Verbose__verbose = True
@@ -58,8 +330,11 @@ class FileManager:
             args[0].unchanged = False
             args[0].filecount = -1
             args[0].queuecount = -1
-            args[0].job_cache = {}
-            return func(*args)
+            try:
+                return func(*args)
+            finally:
+                #: new or restarted links could be ready for download now
+                args[0].pyload.thread_manager.wake()
 
         return new
 
@@ -121,6 +396,31 @@ class FileManager:
 
         return packs
 
+    @lock
+    def get_links_page(self, queue=Destination.QUEUE, **kwargs):
+        """
+        gets one page of links, see `FileDatabaseMethods.get_links_page`.
+        """
+        total, data, key = self.pyload.db.get_links_page(queue.value, **kwargs)
+        for link in data:
+            if link["id"] in self.cache:
+                link.update(self.cache[link["id"]].to_db_dict()[link["id"]])
+
+        return total, data, key
+
+    @lock
+    def get_packages_page(self, queue=Destination.QUEUE, **kwargs):
+        """
+        gets one page of packages without links, see
+        `FileDatabaseMethods.get_packages_page`.
+        """
+        total, data, key = self.pyload.db.get_packages_page(queue.value, **kwargs)
+        for pack in data:
+            if pack["id"] in self.package_cache:
+                pack.update(self.package_cache[pack["id"]].to_dict()[pack["id"]])
+
+        return total, data, key
+
     @lock
     @change
     def add_links(self, urls, package):
@@ -131,7 +431,10 @@ class FileManager:
 
         data = self.pyload.plugin_manager.parse_urls(urls)
 
-        self.pyload.db.add_links(data, package)
+        links = self.pyload.db.add_links(data, package)
+        for fid, plugin, order in links:
+            self.jobs.update(fid, plugin, package, order, 3)
+
         self.pyload.thread_manager.create_info_thread(data, package)
 
         # TODO: change from reload_all event to package update event
@@ -146,6 +449,7 @@ class FileManager:
         """
         last_id = self.pyload.db.add_package(name, folder, queue.value)
         p = self.pyload.db.get_package(last_id)
+        self.jobs.add_package(last_id, p.queue, p.order)
         e = InsertEvent(
             "pack",
             last_id,
@@ -155,6 +459,48 @@ class FileManager:
         self.pyload.event_manager.add_event(e)
         return last_id
 
+    # ----------------------------------------------------------------------
+    @lock
+    @change
+    def add_packages(self, packages, queue=Destination.QUEUE):
+        """
+        adds packages of (name, folder, password, urls) with their links in one
+        transaction, followed by one event and one online check.
+
+        :return: list of package ids
+        """
+        packages = [
+            (name, folder, password, self.pyload.plugin_manager.parse_urls(urls))
+            for name, folder, password, urls in packages
+        ]
+        result = self.pyload.db.add_packages(packages, queue.value) or []
+
+        ids = []
+        data = []
+        for (pid, order, links), (name, folder, password, parsed) in zip(
+            result, packages
+        ):
+            urls = [url for url, plugin in parsed]
+            self.pyload.addon_manager.dispatch_event("links_added", urls, pid)
+            if urls != [url for url, plugin in parsed]:  #: changed by an addon
+                parsed = self.pyload.plugin_manager.parse_urls(urls)
+                links = self.pyload.db.replace_links(parsed, pid) or []
+
+            self.jobs.add_package(pid, queue.value, order)
+            for fid, plugin, order in links:
+                self.jobs.update(fid, plugin, pid, order, 3)
+
+            ids.append(pid)
+            data.extend(parsed)
+
+        if data:
+            self.pyload.thread_manager.create_info_thread(data, None)
+
+        self.pyload.event_manager.add_event(
+            ReloadAllEvent("collector" if queue is Destination.COLLECTOR else "queue")
+        )
+        return ids
+
     # ----------------------------------------------------------------------
     @lock
     @change
@@ -180,6 +526,7 @@ class FileManager:
                 pyfile.release()
 
         self.pyload.db.delete_package(p)
+        self.jobs.remove_package(id)
         self.pyload.event_manager.add_event(e)
         self.pyload.addon_manager.dispatch_event("package_deleted", id)
 
@@ -215,6 +562,7 @@ class FileManager:
             del self.cache[id]
 
         self.pyload.db.delete_link(f)
+        self.jobs.remove_link(id, pid, oldorder)
 
         self.pyload.event_manager.add_event(e)
 
@@ -236,6 +584,8 @@ class FileManager:
         if id in self.cache:
             del self.cache[id]
 
+        self.jobs.release(id)
+
     # ----------------------------------------------------------------------
     def release_package(self, id):
         """
@@ -250,6 +600,9 @@ class FileManager:
         updates link.
         """
         self.pyload.db.update_link(pyfile)
+        self.jobs.update(
+            pyfile.id, pyfile.pluginname, pyfile.packageid, pyfile.order, pyfile.status
+        )
 
         e = UpdateEvent(
             "file", pyfile.id, "collector" if not pyfile.package().queue else "queue"
@@ -323,74 +676,47 @@ class FileManager:
             return self.pyload.db.get_file(id)
 
     # ----------------------------------------------------------------------
+    def _load_jobs(self):
+        self.jobs.load(self.pyload.db.get_job_data)
+
     @lock
     def get_job(self, occ):
         """
-        get suitable job.
+        get suitable job, which does not use an occupied plugin.
         """
-        # TODO: clean mess
-        # TODO: improve selection of valid jobs
-
-        if occ in self.job_cache:
-            if self.job_cache[occ]:
-                id = self.job_cache[occ].pop()
-                if id == "empty":
-                    pyfile = None
-                    self.job_cache[occ].append("empty")
-                else:
-                    pyfile = self.get_file(id)
-            else:
-                jobs = self.pyload.db.get_job(occ)
-                jobs.reverse()
-                if not jobs:
-                    self.job_cache[occ].append("empty")
-                    pyfile = None
-                else:
-                    self.job_cache[occ].extend(jobs)
-                    pyfile = self.get_file(self.job_cache[occ].pop())
-
-        else:
-            self.job_cache = {}  #: better not caching to much
-            jobs = self.pyload.db.get_job(occ)
-            jobs.reverse()
-            self.job_cache[occ] = jobs
-
-            if not jobs:
-                self.job_cache[occ].append("empty")
-                pyfile = None
-            else:
-                pyfile = self.get_file(self.job_cache[occ].pop())
+        self._load_jobs()
 
-            # TODO: maybe the new job has to be approved...
+        def accept(queue, plugin):
+            return (queue == 1 and plugin not in occ) or plugin in COLLECTOR_PLUGINS
 
-        # pyfile = self.get_file(self.job_cache[occ].pop())
-        return pyfile
+        id = self.jobs.pop(accept)
+        return None if id is None else self.get_file(id)
 
     @lock
     def get_decrypt_job(self):
         """
         return job for decrypting.
         """
-        if "decrypt" in self.job_cache:
-            return None
+        self._load_jobs()
 
-        plugins = list(self.pyload.plugin_manager.crypter_plugins.keys()) + list(
-            self.pyload.plugin_manager.container_plugins.keys()
-        )
-        plugins = str(tuple(plugins))
+        plugins = set(self.pyload.plugin_manager.crypter_plugins.keys())
+        plugins.update(self.pyload.plugin_manager.container_plugins.keys())
 
-        jobs = self.pyload.db.get_plugin_job(plugins)
-        if jobs:
-            return self.get_file(jobs[0])
-        else:
-            self.job_cache["decrypt"] = "empty"
-            return None
+        id = self.jobs.pop(lambda queue, plugin: plugin in plugins)
+        return None if id is None else self.get_file(id)
+
+    def requeue_job(self, pyfile):
+        """
+        put a job back which could not be assigned.
+        """
+        self.jobs.release(pyfile.id)
 
     def get_file_count(self):
         """
         returns number of files.
         """
         if self.filecount == -1:
+            self.pyload.db.sync()
             self.filecount = self.pyload.db.filecount(1)
 
         return self.filecount
@@ -400,6 +726,7 @@ class FileManager:
         number of files that have to be processed.
         """
         if self.queuecount == -1 or force:
+            self.pyload.db.sync()
             self.queuecount = self.pyload.db.queuecount(1)
 
         return self.queuecount
@@ -446,6 +773,10 @@ class FileManager:
 
         self.pyload.db.restart_package(id)
 
+        self.pyload.db.sync()
+        for link in self.pyload.db.get_package_data(id).values():
+            self.jobs.update(link["id"], link["plugin"], id, link["order"], 3)
+
         if id in self.package_cache:
             self.package_cache[id].set_finished = False
 
@@ -468,10 +799,13 @@ class FileManager:
 
         self.pyload.db.restart_file(id)
 
+        f = self.get_file(id)
+        self.jobs.update(f.id, f.pluginname, f.packageid, f.order, 3)
+
         e = UpdateEvent(
             "file",
             id,
-            "collector" if not self.get_file(id).package().queue else "queue",
+            "collector" if not f.package().queue else "queue",
         )
         self.pyload.event_manager.add_event(e)
 
@@ -489,6 +823,7 @@ class FileManager:
         self.pyload.event_manager.add_event(e)
 
         self.pyload.db.clear_package_order(p)
+        self.jobs.relocate_package(id, queue)
 
         p = self.pyload.db.get_package(id)
 
@@ -518,6 +853,7 @@ class FileManager:
         e = RemoveEvent("pack", id, "collector" if not p.queue else "queue")
         self.pyload.event_manager.add_event(e)
         self.pyload.db.reorder_package(p, position)
+        self.jobs.move_package(id, position)
 
         packs = self.package_cache.values()
         for pack in packs:
@@ -552,6 +888,7 @@ class FileManager:
         self.pyload.event_manager.add_event(e)
 
         self.pyload.db.reorder_link(f, position)
+        self.jobs.move_link(id, f["package"], f["order"], position)
 
         pyfiles = self.cache.values()
         for pyfile in pyfiles:
@@ -580,15 +917,25 @@ class FileManager:
         self.pyload.event_manager.add_event(e)
 
     @change
-    def update_file_info(self, data, pid):
-        """
-        updates file info (name, size, status, url)
-        """
-        self.pyload.db.update_link_info(data)
-        e = UpdateEvent(
-            "pack", pid, "collector" if not self.get_package(pid).queue else "queue"
-        )
-        self.pyload.event_manager.add_event(e)
+    def update_file_info(self, data, pid=None):
+        """
+        updates file info (name, size, status, url), pid None for links of several
+        packages.
+        """
+        packages = set()
+        for fid, plugin, package, order, status in self.pyload.db.update_link_info(
+            data
+        ):
+            if fid not in self.cache:
+                self.jobs.update(fid, plugin, package, order, status)
+            packages.add(package)
+
+        for pid in [pid] if pid is not None else packages:
+            p = self.get_package(pid)
+            if p is None:
+                continue
+            e = UpdateEvent("pack", pid, "collector" if not p.queue else "queue")
+            self.pyload.event_manager.add_event(e)
 
     def check_package_finished(self, pyfile):
         """
@@ -607,6 +954,7 @@ class FileManager:
         """
         recheck links in package.
         """
+        self.pyload.db.sync()
         data = self.pyload.db.get_package_data(pid)
 
         urls = []
@@ -628,6 +976,7 @@ class FileManager:
 
         self.pyload.db.delete_finished()
 
+        self.pyload.db.sync()
         new_packs = self.pyload.db.get_all_packages(0)
         new_packs.update(self.pyload.db.get_all_packages(1))
         # get new packages only from db
@@ -646,4 +995,5 @@ class FileManager:
         """
         restart all failed links.
         """
-        self.pyload.db.restart_failed()
+        for fid, plugin, package, order in self.pyload.db.restart_failed():
+            self.jobs.update(fid, plugin, package, order, 3)
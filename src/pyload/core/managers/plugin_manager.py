@@ -1,17 +1,221 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: mkaay, RaNaN
 
+import heapq
 import importlib
+import json
 import os
 import re
 import sys
+import time
 from ast import literal_eval
-from itertools import chain
+from functools import lru_cache
+from itertools import chain, product
 
 import semver
 
 from pyload import APPID, PKGDIR
 
+try:
+    from re import _parser as sre_parse
+except ImportError:  #: python < 3.11
+    import sre_parse
+
+
+def _no_slash(op, av):
+    """
+    if a parsed regex item can never match a slash.
+    """
+    if op is sre_parse.LITERAL:
+        return av != ord("/")
+    if op is sre_parse.NOT_LITERAL:
+        return av == ord("/")
+    if op is sre_parse.IN:
+        if av and av[0][0] is sre_parse.NEGATE:
+            return (sre_parse.LITERAL, ord("/")) in av
+        for x, y in av:
+            if x is sre_parse.LITERAL and y != ord("/"):
+                continue
+            if x is sre_parse.RANGE and not y[0] <= ord("/") <= y[1]:
+                continue
+            if x is sre_parse.CATEGORY and y in (
+                sre_parse.CATEGORY_DIGIT,
+                sre_parse.CATEGORY_WORD,
+                sre_parse.CATEGORY_SPACE,
+            ):
+                continue
+            return False
+        return True
+    if op is sre_parse.SUBPATTERN:
+        return all(_no_slash(*x) for x in av[-1])
+    if op is sre_parse.BRANCH:
+        return all(_no_slash(*x) for seq in av[1] for x in seq)
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+        return all(_no_slash(*x) for x in av[2])
+    return op is sre_parse.AT
+
+
+def _concat(left, right):
+    """
+    concatenates two sets of (wild, string) pairs, wild means the string may
+    be preceded by anything but a slash.
+    """
+    return {
+        (True, s2) if w2 else (w1, s1 + s2) for w1, s1 in left for w2, s2 in right
+    }
+
+
+def _expand(items, limit=64):
+    """
+    set of (wild, string) pairs covering all strings a parsed regex sequence
+    can match, see `_concat`, None if they may contain a slash or are too many.
+    """
+    strings = {(False, "")}
+    for op, av in items:
+        options = None
+        if op is sre_parse.LITERAL:
+            options = {(False, chr(av))}
+        elif op is sre_parse.IN:
+            if all(x is sre_parse.LITERAL for x, _ in av):
+                options = {(False, chr(c)) for _, c in av}
+        elif op is sre_parse.SUBPATTERN:
+            options = _expand(av[-1], limit)
+        elif op is sre_parse.BRANCH:
+            options = set()
+            for seq in av[1]:
+                sub = _expand(seq, limit)
+                if sub is None:
+                    options = None
+                    break
+                options |= sub
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            lo, hi, seq = av
+            sub = _expand(seq, limit) if hi <= 2 else None
+            if sub is not None:
+                options = set()
+                for n in range(lo, hi + 1):
+                    repeated = {(False, "")}
+                    for i in range(n):
+                        repeated = _concat(repeated, sub)
+                    options |= repeated
+        elif op is sre_parse.AT:
+            #: zero-width, ignoring it only widens the set
+            continue
+
+        if options is None:
+            if not _no_slash(op, av):
+                return None
+            options = {(True, "")}
+
+        strings = _concat(strings, options)
+        if len(strings) > limit:
+            return None
+
+    return strings
+
+
+def _keys(pattern):
+    """
+    index keys covering all urls a plugin pattern can match, None if they
+    can't be told from the pattern.
+
+    Keys are pairs of kind and lowercased string, where kind is either "host",
+    "suffix" of the host or "prefix" of the url. Hosts are only told from
+    patterns of the form `scheme://host/...`, where scheme expands to a few
+    plain strings.
+    """
+    try:
+        items = list(sre_parse.parse(pattern))
+    except Exception:
+        return None
+
+    sep = [(sre_parse.LITERAL, ord(c)) for c in "://"]
+    slash = (sre_parse.LITERAL, ord("/"))
+    for i in range(len(items) - 2):
+        if items[i : i + 3] == sep:
+            break
+    else:
+        #: placeholder patterns like '^unmatchable$' only match a few prefixes
+        prefixes = _expand(items)
+        if prefixes is None or any(w or not x for w, x in prefixes):
+            return None
+        return {("prefix", x.lower()) for w, x in prefixes}
+
+    schemes = _expand(items[:i])
+    if schemes is None or any(w or ":" in x for w, x in schemes):
+        return None
+
+    try:
+        j = items.index(slash, i + 3)
+    except ValueError:
+        return None
+
+    hosts = _expand(items[i + 3 : j])
+    if hosts is None or any(w and not x or "/" in x for w, x in hosts):
+        return None
+
+    return {("suffix" if w else "host", x.lower()) for w, x in hosts}
+
+
+class UrlIndex:
+    """
+    routes urls to the plugins whose pattern can match them, by host.
+
+    Plugins without index keys are tried for every url, the candidates for a
+    host keep the plugin order so the first matching plugin still wins.
+    """
+
+    CACHE_SIZE = 1024  #: hosts with cached candidates
+
+    def __init__(self, plugins):
+        self.plugins = plugins  #: (name, re) in order of precedence
+        self.keys = {"host": {}, "suffix": {}, "prefix": {}}  #: key -> indices
+        self.generic = []  #: indices of plugins without keys
+
+        for n, (name, regex) in enumerate(plugins):
+            keys = _keys(regex.pattern)
+            if keys is None:
+                self.generic.append(n)
+                continue
+            for kind, key in keys:
+                indices = self.keys[kind].setdefault(key, [])
+                if not indices or indices[-1] != n:
+                    indices.append(n)
+
+        self.prefixes = tuple(self.keys["prefix"])
+        self.candidates = lru_cache(maxsize=self.CACHE_SIZE)(self._candidates)
+
+    def _candidates(self, host, prefixes):
+        groups = [self.generic]
+        if host is not None:
+            groups.append(self.keys["host"].get(host, ()))
+            suffixes = self.keys["suffix"]
+            groups.extend(suffixes.get(host[i:], ()) for i in range(len(host)))
+        groups.extend(self.keys["prefix"][x] for x in prefixes)
+        indices = sorted(set(heapq.merge(*groups)))
+        return tuple(self.plugins[n] for n in indices)
+
+    def match(self, url):
+        """
+        name of the first plugin matching url or None.
+        """
+        start = url.find("://")
+        if start < 0:
+            host = None
+        else:
+            start += 3
+            end = url.find("/", start)
+            host = (url[start:end] if end >= 0 else url[start:]).lower()
+
+        prefixes = ()
+        lower = url.lower()
+        if lower.startswith(self.prefixes):
+            prefixes = tuple(x for x in self.prefixes if lower.startswith(x))
+
+        for name, regex in self.candidates(host, prefixes):
+            if regex.match(url):
+                return name
+
 
 class PluginManager:
     ROOT = "pyload.plugins."
@@ -32,11 +236,18 @@ class PluginManager:
     _CONFIG = re.compile(r"\s*__config__\s*=\s*(\[[^\]]+\])", re.MULTILINE)
     _DESC = re.compile(r'\s*__description__\s*=\s*(?:"|"""|\')([^"\']+)', re.MULTILINE)
 
+    INDEX_CACHE_FILENAME = "plugins.json"
+    INDEX_CACHE_VERSION = 1
+
     def __init__(self, core):
         self.pyload = core
         self._ = core._
 
+        self.index_cache_path = os.path.join(
+            self.pyload.cachedir, self.INDEX_CACHE_FILENAME
+        )
         self.plugins = {}
+        self.url_index = None
         self.create_index()
 
         # register for import addon
@@ -62,6 +273,8 @@ class PluginManager:
                     dst[name] = src[name]
 
         self.pyload.log.debug("Indexing plugins...")
+        start = time.time()
+        self._load_index_cache()
 
         sys.path.append(os.path.join(self.pyload.userdir, "plugins"))
 
@@ -115,6 +328,96 @@ class PluginManager:
                     stack_info=self.pyload.debug > 2,
                 )
 
+        self._save_index_cache()
+        self.pyload.log.debug(
+            f"Indexed {len(self.index_seen)} plugins in {time.time() - start:.3f} seconds, "
+            f"{self.index_parsed} parsed"
+        )
+
+    def _load_index_cache(self):
+        try:
+            with open(self.index_cache_path) as fp:
+                cache = json.load(fp)
+        except (OSError, ValueError):
+            cache = {}
+
+        if cache.get("version") != self.INDEX_CACHE_VERSION:
+            cache = {"version": self.INDEX_CACHE_VERSION, "plugins": {}}
+
+        self.index_cache = cache
+        self.index_seen = set()
+        self.index_parsed = 0
+
+    def _save_index_cache(self):
+        plugins = self.index_cache["plugins"]
+        stale = set(plugins) - self.index_seen
+        if not self.index_parsed and not stale:
+            return
+
+        for path in stale:
+            del plugins[path]
+
+        tmp_path = f"{self.index_cache_path}.tmp"
+        try:
+            with open(tmp_path, mode="w") as fp:
+                json.dump(self.index_cache, fp)
+            os.replace(tmp_path, self.index_cache_path)
+        except (OSError, TypeError, ValueError) as exc:
+            self.pyload.log.warning(
+                self._("Could not save plugin index cache: {}").format(exc)
+            )
+
+    def _read_plugin(self, path):
+        """
+        returns the metadata found in the source of a plugin, cached by file
+        modification time and size.
+
+        {
+        pyload_version, version, pattern, desc, config
+        }
+
+        """
+        stat = os.stat(path)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+
+        self.index_seen.add(path)
+        info = self.index_cache["plugins"].get(path)
+        if info is not None and info["stamp"] == stamp:
+            return info
+
+        with open(path) as data:
+            content = data.read()
+
+        m_pyver = self._PYLOAD_VERSION.search(content)
+        m_ver = self._VERSION.search(content)
+        m_pat = self._PATTERN.search(content)
+        m_desc = self._DESC.search(content)
+
+        config = self._CONFIG.findall(content)
+        if config:
+            config = literal_eval(
+                config[0].strip().replace("\n", "").replace("\r", "")
+            )
+            if isinstance(config, list) and all(isinstance(c, tuple) for c in config):
+                config = {x[0]: x[1:] for x in config}
+            else:
+                #: kept for the error message only
+                config = repr(config)
+        else:
+            config = None
+
+        info = {
+            "stamp": stamp,
+            "pyload_version": None if m_pyver is None else m_pyver.group(1),
+            "version": None if m_ver is None else float(m_ver.group(1)),
+            "pattern": None if m_pat is None else m_pat.group(1),
+            "desc": "" if m_desc is None else m_desc.group(1),
+            "config": config,
+        }
+        self.index_cache["plugins"][path] = info
+        self.index_parsed += 1
+        return info
+
     def parse(self, folder, pattern=False, home={}):
         """
         returns dict with information
@@ -143,20 +446,18 @@ class PluginManager:
                 os.path.isfile(os.path.join(pfolder, entry)) and entry.endswith(".py")
             ) and not entry.startswith("_"):
 
-                with open(os.path.join(pfolder, entry)) as data:
-                    content = data.read()
+                info = self._read_plugin(os.path.join(pfolder, entry))
 
                 name = entry[:-3]
                 if name[-1] == ".":
                     name = name[:-4]
 
-                m_pyver = self._PYLOAD_VERSION.search(content)
-                if m_pyver is None:
+                pyload_version = info["pyload_version"]
+                if pyload_version is None:
                     self.pyload.log.debug(
                         f"__pyload_version__ not found in plugin {name}"
                     )
                 else:
-                    pyload_version = m_pyver.group(1)
 
                     requires_version = f"{pyload_version}.0"
                     requires_version_info = semver.parse_version_info(requires_version)
@@ -176,12 +477,10 @@ class PluginManager:
                         )
                         continue
 
-                m_ver = self._VERSION.search(content)
-                if m_ver is None:
+                version = info["version"]
+                if version is None:
                     self.pyload.log.debug(f"__version__ not found in plugin {name}")
                     version = 0
-                else:
-                    version = float(m_ver.group(1))
 
                 # home contains plugins from pyload root
                 if isinstance(home, dict) and name in home:
@@ -199,8 +498,7 @@ class PluginManager:
                 plugins[name]["folder"] = folder
 
                 if pattern:
-                    m_pat = self._PATTERN.search(content)
-                    pattern = r"^unmachtable$" if m_pat is None else m_pat.group(1)
+                    pattern = info["pattern"] or r"^unmachtable$"
 
                     plugins[name]["pattern"] = pattern
 
@@ -216,29 +514,22 @@ class PluginManager:
                     self.pyload.config.delete_config(name)
                     continue
 
-                m_desc = self._DESC.search(content)
-                desc = "" if m_desc is None else m_desc.group(1)
+                desc = info["desc"]
 
-                config = self._CONFIG.findall(content)
-                if not config:
+                config = info["config"]
+                if config is None:
                     new_config = {"enabled": ["bool", "Activated", False], "desc": desc}
                     configs[name] = new_config
                     continue
 
-                config = literal_eval(
-                    config[0].strip().replace("\n", "").replace("\r", "")
-                )
-
-                if isinstance(config, list) and all(
-                    isinstance(c, tuple) for c in config
-                ):
-                    config = {x[0]: x[1:] for x in config}
-                else:
+                if not isinstance(config, dict):
                     self.pyload.log.error(
                         self._("Invalid config in {}: {}").format(name, config)
                     )
                     continue
 
+                config = {key: list(value) for key, value in config.items()}
+
                 if folder == "addons" and "enabled" not in config:
                     config["enabled"] = ["bool", "Activated", False]
 
@@ -252,40 +543,40 @@ class PluginManager:
 
         return plugins, configs
 
+    def get_url_index(self):
+        """
+        returns the `UrlIndex` of the current plugin patterns, rebuilt whenever
+        plugins are reloaded or their pattern gets changed.
+        """
+        plugins = tuple(
+            (name, value["re"])
+            for name, value in chain(
+                self.crypter_plugins.items(),
+                self.hoster_plugins.items(),
+                self.container_plugins.items(),
+            )
+            if "re" in value
+        )
+        index = self.url_index
+        if index is None or index.plugins != plugins:
+            index = self.url_index = UrlIndex(plugins)
+            self.pyload.log.debug(
+                f"Url index: {len(index.keys['host'])} hosts, "
+                f"{len(index.generic)} plugins matched by pattern only"
+            )
+        return index
+
     def parse_urls(self, urls):
         """
         parse plugins for given list of urls.
         """
-        last = None
+        index = self.get_url_index()
         res = []  #: tupels of (url, plugin)
 
         for url in urls:
-            if type(url) not in (
-                str,
-                bytes,
-                memoryview,
-            ):  #: check memoryview (as py2 byffer)
+            if not isinstance(url, str):
                 continue
-            found = False
-
-            # NOTE: E1136: Value 'last' is unsubscriptable (unsubscriptable-object)
-            if last and last[1]["re"].match(url):
-                res.append((url, last[0]))
-                continue
-
-            for name, value in chain(
-                self.crypter_plugins.items(),
-                self.hoster_plugins.items(),
-                self.container_plugins.items(),
-            ):
-                if value["re"].match(url):
-                    res.append((url, name))
-                    last = (name, value)
-                    found = True
-                    break
-
-            if not found:
-                res.append((url, "DefaultPlugin"))
+            res.append((url, index.match(url) or "DefaultPlugin"))
 
         return res
 
@@ -454,6 +745,7 @@ class PluginManager:
                         importlib.reload(self.plugins[type][plugin][APPID])
 
         # index creation
+        self._load_index_cache()
         self.crypter_plugins, config = self.parse("decrypters", pattern=True)
         self.plugins["decrypter"] = self.crypter_plugins
         default_config = config
@@ -474,6 +766,10 @@ class PluginManager:
         self.plugins["account"] = self.account_plugins
         merge(default_config, config)
 
+        #: only some folders were indexed, so don't prune the others
+        self.index_seen.update(self.index_cache["plugins"])
+        self._save_index_cache()
+
         for name, config in default_config.items():
             desc = config.pop("desc", "")
             config = [[k] + list(v) for k, v in config.items()]
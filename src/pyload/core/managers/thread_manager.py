@@ -15,7 +15,13 @@ from ..datatypes.pyfile import PyFile
 from ..network.request_factory import get_url
 from ..threads.decrypter_thread import DecrypterThread
 from ..threads.download_thread import DownloadThread
-from ..threads.info_thread import InfoThread
+from ..threads.info_thread import (
+    DatabaseJob,
+    InfoCache,
+    InfoPool,
+    PackageJob,
+    ResultJob,
+)
 from ..utils import fs
 from ..utils.old import lock
 
@@ -25,6 +31,8 @@ class ThreadManager:
     manages the download threads, assign jobs, reconnect etc.
     """
 
+    PURGE_INTERVAL = timedelta(minutes=5).seconds  #: seconds between cache purges
+
     def __init__(self, core):
         """
         Constructor.
@@ -35,7 +43,8 @@ class ThreadManager:
         self.threads = []  #: thread list
         self.local_threads = []  #: addon+decrypter threads
 
-        self.pause = True
+        self.wakeup = Event()  #: set when there could be work for the core loop
+        self._pause = True
 
         self.reconnecting = Event()
         self.reconnecting.clear()
@@ -44,8 +53,12 @@ class ThreadManager:
         self.lock = Lock()
 
         # some operations require to fetch url info from hoster, so we caching them so it wont be done twice
-        # contains a timestamp and will be purged after timeout
-        self.info_cache = {}
+        # infos expire depending on their status and are purged every few minutes
+        self.info_cache = InfoCache()
+        self.purge_time = time.time() + self.PURGE_INTERVAL
+        if self.pyload.config.get("download", "save_info_cache"):
+            cached = self.info_cache.load(self.pyload.db)
+            self.pyload.log.debug(f"Loaded {cached} online check infos")
 
         # pool of ids for online check
         self.result_ids = 0
@@ -55,11 +68,36 @@ class ThreadManager:
         # timeout for cache purge
         self.timestamp = 0
 
+        # threads which check the online status of links
+        self.info_pool = InfoPool(self)
+
         # pycurl.global_init(pycurl.GLOBAL_DEFAULT)
 
         for i in range(self.pyload.config.get("download", "max_downloads")):
             self.create_thread()
 
+    @property
+    def pause(self):
+        return self._pause
+
+    @pause.setter
+    def pause(self, value):
+        self._pause = value
+        self.wake()
+
+    def wake(self):
+        """
+        wake up the core loop, so free slots are filled without waiting for the
+        next tick.
+        """
+        self.wakeup.set()
+
+    def wait(self, timeout=None):
+        """
+        block until woken up since the last `run` or timeout expired.
+        """
+        self.wakeup.wait(timeout)
+
     def create_thread(self):
         """
         create a download thread.
@@ -69,24 +107,31 @@ class ThreadManager:
 
     def create_info_thread(self, data, pid):
         """
-        start a thread whichs fetches online status and other infos
+        queues an online check which writes status and other infos to the links of a
+        package, or of any package if pid is None
         data = [ .. () .. ]
         """
         self.timestamp = time.time() + timedelta(minutes=5).seconds
 
-        InfoThread(self, data, pid)
+        self.info_pool.add_job(DatabaseJob(self, data, pid))
 
-    @lock
     def create_result_thread(self, data, add=False):
         """
-        creates a thread to fetch online status, returns result id.
+        queues an online check, returns result id.
         """
         self.timestamp = time.time() + timedelta(minutes=5).seconds
 
-        rid = self.result_ids
-        self.result_ids += 1
+        with self.lock:
+            rid = self.result_ids
+            self.result_ids += 1
+            if not add:
+                self.info_results[rid] = {}
 
-        InfoThread(self, data, rid=rid, add=add)
+        #: cached infos are passed at once, so not holding the lock
+        if add:
+            self.info_pool.add_job(PackageJob(self, data))
+        else:
+            self.info_pool.add_job(ResultJob(self, data, rid), decrypt=True)
 
         return rid
 
@@ -106,7 +151,15 @@ class ThreadManager:
 
     @lock
     def set_info_results(self, rid, result):
-        self.info_results[rid].update(result)
+        self.info_results.setdefault(rid, {}).update(result)
+
+    def get_info_stats(self):
+        """
+        returns queue depth and check latency of the online checks.
+        """
+        stats = self.info_pool.stats()
+        stats.update(self.info_cache.stats())
+        return stats
 
     def get_active_files(self):
         active = [
@@ -128,6 +181,9 @@ class ThreadManager:
         """
         run all task which have to be done (this is for repetivive call by core)
         """
+        #: cleared before the work, so a wake during it is not lost
+        self.wakeup.clear()
+
         try:
             self.try_reconnect()
         except Exception as exc:
@@ -140,7 +196,8 @@ class ThreadManager:
         self.check_thread_count()
 
         try:
-            self.assign_job()
+            while self.assign_job():
+                pass
         except Exception as exc:
             self.pyload.log.warning(
                 "Assign job error",
@@ -150,14 +207,28 @@ class ThreadManager:
             )
 
             time.sleep(0.5)
-            self.assign_job()
+            while self.assign_job():
+                pass
             # it may be failed non critical so we try it again
 
-        if (self.info_cache or self.info_results) and self.timestamp < time.time():
-            self.info_cache.clear()
+        if self.info_results and self.timestamp < time.time():
             self.info_results.clear()
             self.pyload.log.debug("Cleared Result cache")
 
+        if self.purge_time < time.time():
+            self.purge_time = time.time() + self.PURGE_INTERVAL
+            purged = self.info_cache.purge()
+            if purged:
+                self.pyload.log.debug(f"Purged {purged} expired online check infos")
+            self.save_info_cache()
+
+    def save_info_cache(self):
+        """
+        saves the cached online check infos, if enabled.
+        """
+        if self.pyload.config.get("download", "save_info_cache"):
+            self.info_cache.save(self.pyload.db)
+
     # ----------------------------------------------------------------------
     def try_reconnect(self):
         """
@@ -218,6 +289,7 @@ class ThreadManager:
         self.pyload.log.info(self._("Reconnected, new IP: {}").format(ip))
 
         self.reconnecting.clear()
+        self.wake()
 
     def get_ip(self):
         """
@@ -270,10 +342,10 @@ class ThreadManager:
     # ----------------------------------------------------------------------
     def assign_job(self):
         """
-        assing a job to a thread if possible.
+        assing a job to a thread if possible, returns True if a job was assigned.
         """
         if self.pause or not self.pyload.api.is_time_download():
-            return
+            return False
 
         # if self.downloaded > 20:
         #    if not self.clean_py_curl(): return
@@ -324,7 +396,7 @@ class ThreadManager:
                 job.set_status("failed")
                 job.error = str(exc)
                 job.release()
-                return
+                return True
 
             if job.plugin.__type__ == "downloader":
                 space_left = (
@@ -339,21 +411,25 @@ class ThreadManager:
                     thread = free[0]
                     # self.downloaded += 1
 
+                    thread.active = job  #: busy until the thread picks it up
                     thread.put(job)
+                    return True
                 else:
                     # put job back
-                    if occ not in self.pyload.files.job_cache:
-                        self.pyload.files.job_cache[occ] = []
-                    self.pyload.files.job_cache[occ].append(job.id)
+                    self.pyload.files.requeue_job(job)
 
                     # check for decrypt jobs
                     job = self.pyload.files.get_decrypt_job()
                     if job:
                         job.init_plugin()
                         thread = DecrypterThread(self, job)
+                        return True
 
             else:
                 thread = DecrypterThread(self, job)
+                return True
+
+        return False
 
     def get_limit(self, thread):
         limit = thread.active.plugin.account.get_account_data(
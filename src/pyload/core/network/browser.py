@@ -94,6 +94,7 @@ class Browser:
         resume=False,
         progress_notify=None,
         disposition=False,
+        transform=None,
     ):
         """
         this can also download ftp.
@@ -110,6 +111,7 @@ class Browser:
             self.options,
             progress_notify,
             disposition,
+            transform,
         )
         name = self.dl.download(chunks, resume)
         self._size = self.dl.size
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: RaNaN
 
+import math
 import time
 from threading import Lock
 
@@ -11,15 +12,25 @@ class Bucket:
 
     MIN_RATE = 10 << 10  # 10kb minimum rate
 
-    def __init__(self):
+    def __init__(self, tree=None):
         self._rate = 0
         self.token = 0
         self.timestamp = time.time()
         self.lock = Lock()
 
+        self.tree = tree  #: BucketTree which sets the rate of this bucket
+        self.groups = {}  #: group kind -> name, see BucketTree.GROUPS
+        self.received = 0  #: bytes consumed since the tree last set the rate
+        self.seen = 0  #: last time a transfer asked whether it is throttled
+
     def __bool__(self):
+        if self.tree is not None:
+            self.tree.refresh(self)
         return self._rate >= self.MIN_RATE
 
+    def set_group(self, kind, name):
+        self.groups[kind] = name
+
     @lock
     def set_rate(self, rate):
         self._rate = int(rate)
@@ -42,9 +53,195 @@ class Bucket:
         """
         Return time the process have to sleep, after consumed specified amount.
         """
+        self.received += amount
         if self.rate < self.MIN_RATE:
             return 0  # NOTE: May become unresponsive otherwise
         self._calc_token()
         self.token -= amount
-        consumed = -self.token // self._rate if self.token < 0 else 0
+        consumed = -self.token / self._rate if self.token < 0 else 0
         return consumed
+
+    @lock
+    def delay(self):
+        """
+        Return time until tokens are available again, transfers should not
+        receive data meanwhile.
+        """
+        if self.rate < self.MIN_RATE:
+            return 0
+        self._calc_token()
+        return -self.token / self._rate if self.token < 0 else 0
+
+
+class BucketTree(Bucket):
+    """
+    Splits its rate between the buckets of the running transfers.
+
+    Transfers are grouped by priority class ('free' or 'premium'), plugin,
+    account and package. Every group can have its own limit and a weight for
+    its share of the group above, rate a group does not use goes to the others.
+    Each transfer only locks its own bucket, the rates are split every
+    REFRESH seconds.
+    """
+
+    GROUPS = ("priority", "plugin", "account", "package")
+
+    REFRESH = 0.5  #: seconds between splitting the rate
+    IDLE = 10  #: seconds after a transfer is not considered running anymore
+    HEADROOM = 1.25  #: share of a transfer above its current speed
+    MAX_WEIGHT = 1000
+
+    def __init__(self):
+        super().__init__()
+        #: (kind, name) -> (rate, weight), premium downloads get a larger share
+        self.limits = {("priority", "premium"): (0, 4)}
+        self.buckets = set()
+        self.demands = {}  #: bucket -> rate it could use
+        self.split_time = time.time()
+        self.changed = False
+
+    def get_bucket(self, plugin=None, account=None):
+        """
+        returns a new bucket for a transfer, its rate is set by the tree.
+        """
+        bucket = Bucket(self)
+        bucket.set_group("priority", "free")
+        bucket.set_group("plugin", plugin)
+        bucket.set_group("account", account)
+        return bucket
+
+    def set_rate(self, rate):
+        super().set_rate(rate)
+        self.changed = True
+
+    def get_limits(self):
+        return dict(self.limits)
+
+    @lock
+    def set_limit(self, kind, name, rate=0, weight=1):
+        """
+        limits the rate of a group of transfers, rate 0 means no limit.
+        """
+        if kind not in self.GROUPS:
+            raise ValueError(f"Unknown group kind: {kind}")
+        weight = int(weight)
+        if not 1 <= weight <= self.MAX_WEIGHT:
+            raise ValueError(f"Weight must be between 1 and {self.MAX_WEIGHT}")
+
+        key = (kind, str(name))
+        rate = max(int(rate), 0)
+        if not rate and weight == 1:
+            self.limits.pop(key, None)
+        else:
+            self.limits[key] = (rate, weight)
+        self.changed = True
+
+    def refresh(self, bucket):
+        now = time.time()
+        bucket.seen = now
+        if (
+            self.changed
+            or bucket not in self.buckets
+            or now - self.split_time > self.REFRESH
+        ):
+            self.split(bucket)
+
+    @lock
+    def split(self, bucket=None):
+        """
+        sets the rates of the buckets of the running transfers.
+        """
+        now = time.time()
+        elapsed = now - self.split_time
+        if bucket is not None:
+            if (
+                not self.changed
+                and bucket in self.buckets
+                and elapsed <= self.REFRESH
+            ):
+                return  #: another transfer split already
+            self.buckets.add(bucket)
+
+        self.buckets = {b for b in self.buckets if now - b.seen < self.IDLE}
+        self.changed = False
+
+        # speeds are only measured over whole periods, transfers which just
+        # started or changed limits keep their last demand meanwhile
+        if elapsed > self.REFRESH:
+            self.split_time = now
+            for b in self.buckets:
+                with b.lock:
+                    received, b.received = b.received, 0
+
+                # a transfer using its whole rate could go faster
+                if b.rate < self.MIN_RATE or received >= 0.9 * b.rate * elapsed:
+                    self.demands[b] = math.inf
+                else:
+                    self.demands[b] = self.HEADROOM * received / elapsed
+
+        self.demands = {b: self.demands.get(b, math.inf) for b in self.buckets}
+
+        rate = self._rate if self._rate >= self.MIN_RATE else math.inf
+        self._split(rate, list(self.buckets), 0, self.demands)
+
+    def _split(self, rate, buckets, depth, demands):
+        """
+        splits rate between the groups of the buckets at depth, down to the
+        buckets themselves.
+        """
+        if depth < len(self.GROUPS):
+            kind = self.GROUPS[depth]
+            groups = {}
+            for b in buckets:
+                groups.setdefault((kind, str(b.groups.get(kind))), []).append(b)
+        else:
+            groups = {b: [b] for b in buckets}
+
+        nodes = []
+        for key, members in groups.items():
+            limit, weight = self.limits.get(key, (0, 1))
+            cap = limit if limit >= self.MIN_RATE else math.inf
+            demand = min(cap, sum(demands[b] for b in members))
+            nodes.append((members, weight, cap, demand))
+
+        if rate == math.inf:
+            shares = [cap for members, weight, cap, demand in nodes]
+        else:
+            shares = self._fill(rate, nodes)
+
+        for (members, weight, cap, demand), share in zip(nodes, shares):
+            if depth < len(self.GROUPS):
+                self._split(share, members, depth + 1, demands)
+            elif share == math.inf:
+                members[0].set_rate(-1)
+            else:
+                members[0].set_rate(max(share, self.MIN_RATE))
+
+    def _fill(self, rate, nodes):
+        """
+        splits a finite rate between nodes by weight, what a node does not
+        need goes to the others.
+        """
+        shares = [0] * len(nodes)
+        pending = list(range(len(nodes)))
+        while pending:
+            total = sum(nodes[i][1] for i in pending)
+            satisfied = [
+                i for i in pending if nodes[i][3] <= rate * nodes[i][1] / total
+            ]
+            if not satisfied:
+                for i in pending:
+                    shares[i] = rate * nodes[i][1] / total
+                return shares
+
+            for i in satisfied:
+                shares[i] = nodes[i][3]
+                rate -= nodes[i][3]
+                pending.remove(i)
+
+        # everyone got what it needs, the rest lets them speed up
+        growing = [i for i in range(len(nodes)) if shares[i] < nodes[i][2]]
+        total = sum(nodes[i][1] for i in growing)
+        for i in growing:
+            shares[i] = min(shares[i] + rate * nodes[i][1] / total, nodes[i][2])
+        return shares
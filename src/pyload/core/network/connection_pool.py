@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlsplit
+
+import pycurl
+
+from ..utils.old import lock
+
+
+class ConnectionPool:
+    """
+    Curl handles shared by all requests.
+
+    A curl share handle caches dns lookups and ssl sessions across all handles.
+    Open connections stay with the easy handle, which libcurl can't share between
+    threads, so idle handles are kept per host for reuse.
+    """
+
+    MAX_IDLE = 32  #: idle handles kept at most
+    MAX_IDLE_PER_HOST = 4
+
+    def __init__(self):
+        self.lock = Lock()
+
+        self.share = pycurl.CurlShare()
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+
+        self.idle = OrderedDict()  #: (host, handle) -> None, oldest first
+
+        self.hits = 0  #: handles reused
+        self.misses = 0  #: handles created
+        self.reused = 0  #: transfers on an open connection
+        self.connects = 0  #: connections opened
+
+    @staticmethod
+    def _host(url):
+        try:
+            return urlsplit(url).hostname if url else None
+        except (TypeError, ValueError):
+            return None
+
+    @lock
+    def get(self, url=None):
+        """
+        returns an easy handle, preferably one which last talked to the host of url.
+        """
+        host = self._host(url)
+        for key in reversed(self.idle):
+            if host is None or key[0] == host:
+                del self.idle[key]
+                self.hits += 1
+                c = key[1]
+                break
+        else:
+            self.misses += 1
+            c = pycurl.Curl()
+            c.setopt(pycurl.SHARE, self.share)  #: kept by reset
+
+        c.host = host
+        return c
+
+    def put(self, c):
+        """
+        takes back a handle which is not used anymore.
+        """
+        try:
+            c.setopt(pycurl.COOKIELIST, "ALL")  #: don't pass cookies to other plugins
+            c.reset()
+        except pycurl.error:
+            c.close()
+            return
+
+        with self.lock:
+            host = getattr(c, "host", None)
+            same = [key for key in self.idle if key[0] == host]
+            if len(same) >= self.MAX_IDLE_PER_HOST:
+                del self.idle[same[0]]
+                same[0][1].close()
+            elif len(self.idle) >= self.MAX_IDLE:
+                key, _ = self.idle.popitem(last=False)
+                key[1].close()
+            self.idle[(host, c)] = None
+
+    def count(self, c):
+        """
+        counts whether the last transfer of the handle needed a new connection.
+        """
+        try:
+            connects = c.getinfo(pycurl.NUM_CONNECTS)
+        except pycurl.error:
+            return
+
+        with self.lock:
+            if connects:
+                self.connects += connects
+            else:
+                self.reused += 1
+
+    def stats(self):
+        return {
+            "idle": len(self.idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused": self.reused,
+            "connects": self.connects,
+        }
+
+
+POOL = ConnectionPool()
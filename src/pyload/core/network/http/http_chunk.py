@@ -3,10 +3,10 @@
 
 import os
 import re
-import time
 
 import pycurl
 
+from ..connection_pool import POOL
 from .http_request import HTTPRequest
 
 
@@ -15,11 +15,24 @@ class WrongFormat(Exception):
 
 
 class ChunkInfo:
-    def __init__(self, name):
+    """
+    chunk layout of a download, saved next to it to resume.
+
+    Version 1 info files describe one file per chunk, which are merged when the
+    download finished. Version 2 info files describe chunks which all write to
+    their own range of one shared file and track how much of it arrived.
+    Version 3 chunks may have been split, so they are no longer in file order.
+    """
+
+    VERSION = 3
+
+    def __init__(self, name, shared=True):
         self.name = os.fsdecode(name)
         self.size = 0
         self.resume = False
+        self.shared = shared  #: all chunks write to one file, at their offset
         self.chunks = []
+        self.arrived = []  #: bytes arrived per chunk, only tracked if shared
 
     def __repr__(self):
         ret = f"ChunkInfo: {self.name}, {self.size}\n"
@@ -31,11 +44,13 @@ class ChunkInfo:
     def set_size(self, size):
         self.size = int(size)
 
-    def add_chunk(self, name, range):
+    def add_chunk(self, name, range, arrived=0):
         self.chunks.append((name, range))
+        self.arrived.append(arrived)
 
     def clear(self):
         self.chunks = []
+        self.arrived = []
 
     def create_chunks(self, chunks):
         self.clear()
@@ -44,18 +59,22 @@ class ChunkInfo:
         current = 0
         for i in range(chunks):
             end = self.size - 1 if (i == chunks - 1) else current + chunk_size
-            self.add_chunk(f"{self.name}.chunk{i}", (current, end))
+            self.add_chunk(self.get_file_name(i), (current, end))
             current += chunk_size + 1
 
     def save(self):
         fs_name = f"{self.name}.chunks"
         with open(fs_name, mode="w", encoding="utf-8") as fh:
+            if self.shared:
+                fh.write(f"version:{self.VERSION}\n")
             fh.write(f"name:{self.name}\n")
             fh.write(f"size:{self.size}\n")
             for i, c in enumerate(self.chunks):
                 fh.write(f"#{i}:\n")
                 fh.write(f"\tname:{c[0]}\n")
                 fh.write(f"\trange:{c[1][0]}-{c[1][1]}\n")
+                if self.shared:
+                    fh.write(f"\tarrived:{self.arrived[i]}\n")
 
     @staticmethod
     def load(name):
@@ -63,7 +82,14 @@ class ChunkInfo:
         if not os.path.exists(fs_name):
             raise IOError
         with open(fs_name, encoding="utf-8") as fh:
+            version = 1
             name = fh.readline()[:-1]
+            if name.startswith("version:"):
+                version = int(name[8:])
+                name = fh.readline()[:-1]
+            if version > ChunkInfo.VERSION:
+                raise WrongFormat
+
             size = fh.readline()[:-1]
             if name.startswith("name:") and size.startswith("size:"):
                 name = name[5:]
@@ -71,7 +97,7 @@ class ChunkInfo:
             else:
                 fh.close()
                 raise WrongFormat
-            ci = ChunkInfo(name)
+            ci = ChunkInfo(name, shared=version > 1)
             ci.loaded = True
             ci.set_size(size)
             while True:
@@ -85,7 +111,14 @@ class ChunkInfo:
                 else:
                     raise WrongFormat
 
-                ci.add_chunk(name, (int(range[0]), int(range[1])))
+                arrived = 0
+                if ci.shared:
+                    arrived = fh.readline()[1:-1]
+                    if not arrived.startswith("arrived:"):
+                        raise WrongFormat
+                    arrived = int(arrived[8:])
+
+                ci.add_chunk(name, (int(range[0]), int(range[1])), arrived)
 
         return ci
 
@@ -97,12 +130,27 @@ class ChunkInfo:
     def get_count(self):
         return len(self.chunks)
 
+    def get_file_name(self, index):
+        """
+        name of the file a new chunk writes to.
+        """
+        return f"{self.name}.chunk{0 if self.shared else index}"
+
     def get_chunk_name(self, index):
         return self.chunks[index][0]
 
     def get_chunk_range(self, index):
         return self.chunks[index][1]
 
+    def set_chunk_range(self, index, range):
+        self.chunks[index] = (self.chunks[index][0], range)
+
+    def get_chunk_arrived(self, index):
+        return self.arrived[index]
+
+    def set_chunk_arrived(self, index, arrived):
+        self.arrived[index] = arrived
+
 
 class HTTPChunk(HTTPRequest):
     def __init__(self, id, parent, range=None, resume=False):
@@ -116,7 +164,7 @@ class HTTPChunk(HTTPRequest):
         self.arrived = 0
         self.last_url = self.p.referer
 
-        self.c = pycurl.Curl()
+        self.c = POOL.get(self.p.url)
 
         self.header = bytes()
         self.header_parsed = False  #: indicates if the header has been processed
@@ -127,11 +175,11 @@ class HTTPChunk(HTTPRequest):
         self.set_interface(self.p.options)
 
         self.BOMChecked = False  #: check and remove byte order mark
+        self.transform = None  #: see HTTPDownload.transform
 
         self.rep = None
 
-        self.sleep = 0.000
-        self.last_size = 0
+        self.paused = False  #: receiving paused by the bucket
 
     def __repr__(self):
         return f"<HTTPChunk id={self.id}, size={self.size}, arrived={self.arrived}>"
@@ -154,11 +202,18 @@ class HTTPChunk(HTTPRequest):
         # arihmetic unit
 
         fs_name = self.p.info.get_chunk_name(self.id)
+        shared = self.p.info.shared
         if self.resume:
-            self.fp = open(fs_name, mode="ab")
-            self.arrived = self.fp.tell()
-            if not self.arrived:
-                self.arrived = os.stat(fs_name).st_size
+            if shared:
+                #: unbuffered, so the saved progress never runs ahead of the file
+                self.fp = open(fs_name, mode="rb+", buffering=0)
+                self.arrived = self.p.info.get_chunk_arrived(self.id)
+                self.fp.seek((self.range[0] if self.range else 0) + self.arrived)
+            else:
+                self.fp = open(fs_name, mode="ab")
+                self.arrived = self.fp.tell()
+                if not self.arrived:
+                    self.arrived = os.stat(fs_name).st_size
 
             if self.range:
                 # do nothing if chunk already finished
@@ -166,9 +221,8 @@ class HTTPChunk(HTTPRequest):
                     return None
 
                 start = self.arrived + self.range[0]
-                if (
-                    self.id == len(self.p.info.chunks) - 1
-                ):  #: as last chunk dont set end range, so we get everything
+                if self.is_last():
+                    #: as last chunk dont set end range, so we get everything
                     end = ""
                 else:
                     end = min(self.range[1] + 1, self.p.size - 1)
@@ -184,7 +238,7 @@ class HTTPChunk(HTTPRequest):
         else:
             if self.range:
                 start = self.range[0]
-                if self.id == len(self.p.info.chunks) - 1:  #: see above
+                if self.is_last():  #: see above
                     end = ""
                 else:
                     end = min(self.range[1] + 1, self.p.size - 1)
@@ -194,10 +248,26 @@ class HTTPChunk(HTTPRequest):
                 self.log.debug(f"Chunked with range {range}")
                 self.c.setopt(pycurl.RANGE, range)
 
-            self.fp = open(fs_name, mode="wb")
+            if shared and self.range:
+                #: the initial chunk created and allocated the file already
+                self.fp = open(fs_name, mode="rb+", buffering=0)
+                self.fp.seek(self.range[0])
+            else:
+                self.fp = open(fs_name, mode="wb", buffering=0 if shared else -1)
+
+        if self.p.transform:
+            self.transform = self.p.transform(
+                (self.range[0] if self.range else 0) + self.arrived
+            )
 
         return self.c
 
+    def is_last(self):
+        """
+        if the chunk loads the end of the file.
+        """
+        return self.range[1] >= self.p.size - 1
+
     def write_header(self, buf):
         self.header += buf
         # TODO: forward headers?, this is possibly unneeeded, when we just parse valid 200 headers
@@ -214,9 +284,18 @@ class HTTPChunk(HTTPRequest):
         self.header_parsed = True
 
     def write_body(self, buf):
+        if self.p.bucket and self.p.bucket.delay():
+            #: curl keeps the data and passes it again once the download unpauses us
+            self.paused = True
+            return pycurl.WRITEFUNC_PAUSE
+
+        if self.transform:
+            #: hashed or not the data the server sent, so leave a BOM alone
+            buf = self.transform(buf)
+
         # ignore BOM, it confuses unrar
-        if not self.BOMChecked:
-            if [ord(b) for b in buf[:3]] == [239, 187, 191]:
+        elif not self.BOMChecked:
+            if buf[:3] == b"\xef\xbb\xbf":
                 buf = buf[3:]
             self.BOMChecked = True
 
@@ -227,20 +306,7 @@ class HTTPChunk(HTTPRequest):
         self.fp.write(buf)
 
         if self.p.bucket:
-            time.sleep(self.p.bucket.consumed(size))
-        else:
-            # Avoid small buffers, increasing sleep time slowly if buffer size gets smaller
-            # otherwise reduce sleep time percentual (values are based on tests)
-            # So in general cpu time is saved without reducing bandwith too much
-
-            if size < self.last_size:
-                self.sleep += 0.002
-            else:
-                self.sleep *= 0.7
-
-            self.last_size = size
-
-            time.sleep(self.sleep)
+            self.p.bucket.consumed(size)
 
         if self.range and self.arrived > self.size:
             return 0  #: close if we have enough data
@@ -282,10 +348,19 @@ class HTTPChunk(HTTPRequest):
         self.range = range
         self.size = range[1] - range[0]
 
+    def unpause(self):
+        self.paused = False
+        try:
+            self.c.pause(pycurl.PAUSE_CONT)
+        except pycurl.error:
+            pass  #: write_body aborted while being passed the kept data, the multi reports it
+
     def flush_file(self):
         """
         flush and close file.
         """
+        if self.fp.closed:
+            return
         self.fp.flush()
         os.fsync(self.fp.fileno())  #: make sure everything was written to disk
         self.fp.close()  #: needs to be closed, or merging chunks will fail
@@ -296,6 +371,8 @@ class HTTPChunk(HTTPRequest):
         """
         if self.fp:
             self.fp.close()
-        self.c.close()
+        if self.header:
+            POOL.count(self.c)
+        POOL.put(self.c)
         if hasattr(self, "p"):
             del self.p
@@ -19,6 +19,8 @@ class HTTPDownload:
     loads a url http + ftp.
     """
 
+    MIN_SPLIT = 1 << 20  #: smallest range a finished chunk takes over
+
     def __init__(
         self,
         url,
@@ -31,6 +33,7 @@ class HTTPDownload:
         options={},
         progress_notify=None,
         disposition=False,
+        transform=None,
     ):
         self.url = url
         self.filename = filename  #: complete file destination, not only name
@@ -41,6 +44,9 @@ class HTTPDownload:
         self.bucket = bucket
         self.options = options
         self.disposition = disposition
+        #: called with the file offset a chunk starts at, returns a function which
+        #: gets the received data and returns the data of same length to write
+        self.transform = transform
         # all arguments
 
         self.abort = False
@@ -53,6 +59,8 @@ class HTTPDownload:
 
         try:
             self.info = ChunkInfo.load(filename)
+            if self.info.shared and not os.path.exists(self.info.get_chunk_name(0)):
+                raise IOError
             self.info.resume = True  #: resume is only possible with valid info file
             self.size = self.info.size
             self.info_saved = True
@@ -84,10 +92,88 @@ class HTTPDownload:
             return 0
         return (self.arrived * 100) // self.size
 
+    def _allocate(self):
+        """
+        reserves the whole size for the file shared by all chunks, so they
+        can write at their offsets.
+        """
+        with open(self.info.get_chunk_name(0), mode="rb+") as fp:
+            if os.fstat(fp.fileno()).st_size >= self.size:
+                return
+            try:
+                os.posix_fallocate(fp.fileno(), 0, self.size)
+            except (AttributeError, OSError):  #: not available on every os and fs
+                fp.truncate(self.size)
+
+    def _split(self, chunk, chunks_done):
+        """
+        lets a finished chunk take over the tail of the chunk which needs the
+        longest to finish, so no connection idles while others are slow.
+        """
+        #: chunks without a measured speed yet are assumed to be average
+        average = sum(self.speeds) / len(self.speeds) if self.speeds else 0
+        speeds = dict(zip(self.chunks, self.speeds))
+
+        victim = None
+        eta = 0
+        for c in self.chunks:
+            if c.c in chunks_done or not c.range:
+                continue
+            remaining = c.range[1] - c.range[0] + 1 - c.arrived
+            if remaining < 2 * self.MIN_SPLIT:
+                continue
+            if remaining / max(speeds.get(c, average), 1) > eta:
+                victim = c
+                eta = remaining / max(speeds.get(c, average), 1)
+
+        chunk.flush_file()  #: release the file, its range is complete
+        if victim is None:
+            return
+
+        # split where both are expected to finish at the same time
+        remaining = victim.range[1] - victim.range[0] + 1 - victim.arrived
+        victim_speed = speeds.get(victim, 0)
+        thief_speed = speeds.get(chunk, 0)
+        if victim_speed and thief_speed:
+            keep = int(remaining * victim_speed / (victim_speed + thief_speed))
+        else:
+            keep = remaining // 2
+        keep = min(max(keep, self.MIN_SPLIT), remaining - self.MIN_SPLIT)
+
+        start = victim.range[0] + victim.arrived + keep
+        end = victim.range[1]
+        victim.set_range((victim.range[0], start - 1))
+        self.info.set_chunk_range(victim.id, victim.range)
+        self.info.add_chunk(self.info.get_chunk_name(0), (start, end))
+
+        c = HTTPChunk(self.info.get_count() - 1, self, (start, end))
+        self.chunks.append(c)
+        self.m.add_handle(c.get_handle())
+        self._save_progress()
+
+        self.log.debug(
+            f"Chunk {c.id + 1} took over range {start}-{end} from chunk {victim.id + 1}"
+        )
+
+    def _save_progress(self):
+        for chunk in self.chunks:
+            self.info.set_chunk_arrived(chunk.id, chunk.arrived)
+        self.info.save()
+
     def _copy_chunks(self):
         init = self.info.get_chunk_name(0)  #: initial chunk name
 
-        if self.info.get_count() > 1:
+        if self.info.shared:
+            #: chunks wrote to their range of the file already, check they are complete
+            for chunk in self.chunks:
+                if chunk.range and chunk.arrived < chunk.size:
+                    os.remove(init)
+                    self.info.remove()  #: there are probably invalid chunks
+                    raise Exception(
+                        "Downloaded content was smaller than expected. Try to reduce download connections."
+                    )
+
+        elif self.info.get_count() > 1:
             with open(init, mode="rb+") as fo:  #: first chunkfile
                 for i in range(1, self.info.get_count()):
                     # input file
@@ -151,6 +237,7 @@ class HTTPDownload:
     def _download(self, chunks, resume):
         if not resume:
             self.info.clear()
+            self.info.shared = True
             self.info.add_chunk(
                 f"{self.filename}.chunk0", (0, 0)
             )  #: create an initial entry)
@@ -183,6 +270,8 @@ class HTTPDownload:
                     self.info.set_size(self.size)
                     self.info.create_chunks(chunks)
                     self.info.save()
+                    if self.info.shared:
+                        self._allocate()
 
                 chunks = self.info.get_count()
 
@@ -209,6 +298,8 @@ class HTTPDownload:
 
             t = time.time()
 
+            finished = []  #: chunks which completed their range
+
             # reduce these calls
             while last_finish_check + 0.5 < t:
                 # list of failed curl handles
@@ -226,12 +317,15 @@ class HTTPDownload:
                         ex = exc
                     else:
                         chunks_done.add(c)
+                        finished.append(chunk)
 
                 for c in err_list:
                     curl, errno, msg = c
                     chunk = self.find_chunk(curl)
-                    # test if chunk was finished
-                    if errno != 23 or "0 !=" not in msg:
+                    # test if chunk was finished, write_body aborts it once its range arrived
+                    # (newer libcurl versions changed the message, so don't rely on it)
+                    complete = chunk.range and chunk.arrived > chunk.size
+                    if errno != 23 or not (complete or "0 !=" in msg):
                         failed.append(chunk)
                         ex = pycurl.error(errno, msg)
                         self.log.debug(f"Chunk {chunk.id + 1} failed: {ex}")
@@ -245,6 +339,7 @@ class HTTPDownload:
                         ex = exc
                     else:
                         chunks_done.add(curl)
+                        finished.append(chunk)
                 if not num_q:  #: no more infos to get
 
                     # check if init is not finished so we reset download connections
@@ -259,15 +354,21 @@ class HTTPDownload:
                         for chunk in to_clean:
                             self.close_chunk(chunk)
                             self.chunks.remove(chunk)
-                            os.remove(self.info.get_chunk_name(chunk.id))
+                            if not self.info.shared:
+                                os.remove(self.info.get_chunk_name(chunk.id))
 
                         # let first chunk load the rest and update the info file
                         init.reset_range()
                         self.info.clear()
-                        self.info.add_chunk(f"{self.filename}.chunk0", (0, self.size))
+                        self.info.add_chunk(
+                            f"{self.filename}.chunk0", (0, self.size), init.arrived
+                        )
                         self.info.save()
                     elif failed:
                         raise ex or Exception
+                    elif self.info.shared and chunks_created:
+                        for chunk in finished:
+                            self._split(chunk, chunks_done)
 
                     last_finish_check = t
 
@@ -298,12 +399,24 @@ class HTTPDownload:
                 last_time_check = t
                 self.update_progress()
 
+                if self.info.shared and chunks_created:
+                    self._save_progress()
+
             if self.abort:
                 raise Abort
 
-            # time.sleep(0.003) #supress busy waiting - limits dl speed to  (1 / x) *
-            # buffersize
-            self.m.select(1)
+            timeout = 1
+            if any(c.paused for c in self.chunks):
+                delay = self.bucket.delay()
+                if delay:
+                    timeout = min(delay, timeout)
+                else:
+                    for chunk in self.chunks:
+                        if chunk.paused:
+                            chunk.unpause()
+                    timeout = 0  #: let curl continue the transfers right away
+
+            self.m.select(timeout)
 
         for chunk in self.chunks:
             chunk.flush_file()  #: make sure downloads are written to disk
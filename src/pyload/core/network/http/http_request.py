@@ -11,6 +11,7 @@ from urllib.parse import quote, urlencode
 import pycurl
 from pyload import APPID
 
+from ..connection_pool import POOL
 from ..exceptions import Abort
 from .exceptions import BadHeader
 
@@ -44,7 +45,7 @@ BAD_STATUS_CODES = tuple(
 
 class HTTPRequest:
     def __init__(self, cookies=None, options=None):
-        self.c = pycurl.Curl()
+        self.c = POOL.get()
         self.rep = None
 
         self.cj = cookies  #: cookiejar
@@ -244,6 +245,7 @@ class HTTPRequest:
             self.c.setopt(pycurl.NOBODY, 1)
 
         self.c.perform()
+        POOL.count(self.c)
         rep = self.header if just_header else self.get_response()
 
         if not follow_location:
@@ -302,7 +304,7 @@ class HTTPRequest:
         """
         decode with correct encoding, relies on header.
         """
-        header = self.header.splitlines()
+        header = self.header.decode("iso-8859-1").splitlines()
         encoding = "utf-8"  #: default encoding
 
         for line in header:
@@ -376,5 +378,5 @@ class HTTPRequest:
             del self.cj
 
         if hasattr(self, "c"):
-            self.c.close()
+            POOL.put(self.c)
             del self.c
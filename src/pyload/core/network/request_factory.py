@@ -5,7 +5,7 @@ from threading import Lock
 
 from ..utils.old import lock
 from .browser import Browser
-from .bucket import Bucket
+from .bucket import BucketTree
 from .cookie_jar import CookieJar
 from .http.http_request import HTTPRequest
 from .xdcc.request import XDCCRequest
@@ -18,7 +18,7 @@ class RequestFactory:
         self.lock = Lock()
         self.pyload = core
         self._ = core._
-        self.bucket = Bucket()
+        self.bucket = BucketTree()
         self.update_bucket()
         self.cookiejars = {}
 
@@ -35,11 +35,13 @@ class RequestFactory:
         options = self.get_options()
         options.update(kwargs)  #: submit kwargs as additional options
 
+        bucket = self.bucket.get_bucket(plugin_name, account)
+
         if type == "XDCC":
-            req = XDCCRequest(self.bucket, options)
+            req = XDCCRequest(bucket, options)
 
         else:
-            req = Browser(self.bucket, options)
+            req = Browser(bucket, options)
 
             if account:
                 cj = self.get_cookie_jar(plugin_name, account)
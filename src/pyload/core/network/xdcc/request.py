@@ -23,8 +23,6 @@ class XDCCRequest:
         self.received = 0
         self.speeds = [0.0, 0.0, 0.0]
 
-        self.sleep = 0.000
-        self.last_recv_size = 0
         self.send_64bits_ack = False
 
         self.abort = False
@@ -61,21 +59,7 @@ class XDCCRequest:
         self.fh.write(buf)
 
         if self.bucket:
-            time.sleep(self.bucket.consumed(size))
-
-        else:
-            # Avoid small buffers, increasing sleep time slowly if buffer size gets smaller
-            # otherwise reduce sleep time percentequal (values are based on tests)
-            # So in general cpu time is saved without reducing bandwidth too much
-
-            if size < self.last_recv_size:
-                self.sleep += 0.002
-            else:
-                self.sleep *= 0.7
-
-            self.last_recv_size = size
-
-            time.sleep(self.sleep)
+            self.bucket.consumed(size)
 
     def _send_ack(self):
         # acknowledge data by sending number of recceived bytes
@@ -122,6 +106,13 @@ class XDCCRequest:
                 self.fh.close()
                 raise Abort
 
+            if self.bucket:
+                delay = self.bucket.delay()
+                if delay:
+                    #: stop reading, so tcp makes the sender wait
+                    time.sleep(min(delay, 0.1))
+                    continue
+
             fdset = select.select(recv_list, [], [], 0.1)
             if self.dccsock in fdset[0]:
                 try:
@@ -2,12 +2,10 @@
 # AUTHOR: mkaay
 
 import time
-from heapq import heappop, heappush
-from threading import Lock
-
-from _thread import start_new_thread
-
-from .utils.old import lock
+from concurrent.futures import ThreadPoolExecutor
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition, Thread, current_thread
 
 
 class AlreadyCalled(Exception):
@@ -29,20 +27,56 @@ class Deferred:
         for f, cargs, ckwargs in self.call:
             args += tuple(cargs)
             kwargs.update(ckwargs)
-            f(*args ** kwargs)
+            f(*args, **kwargs)
 
 
 class Scheduler:
+    """
+    runs jobs at their time on a thread of its own.
+
+    Threaded jobs are passed to a pool of WORKERS threads, the others are run on
+    the scheduler thread. Jobs are kept in a heap, removed jobs are only marked and
+    skipped when due, so adding and removing are O(log n).
+    """
+
+    WORKERS = 8
+
     def __init__(self, core):
         self.pyload = core
         self._ = core._
-        self.queue = PriorityQueue()
+        self.cond = Condition()
+
+        self.queue = []  #: heap of (time, sequence, job)
+        self.jobs = {}  #: deferred -> job, of the jobs not run yet
+        self.removed = 0  #: entries of removed jobs left in the queue
+        self.sequence = count()
+
+        #: name -> runs, errors, seconds in total, longest and last run
+        self.stats = {}
+
+        self.thread = None
+        self.running = False
+        self.executor = ThreadPoolExecutor(
+            self.WORKERS, thread_name_prefix="Scheduler"
+        )
+
+    def add_job(self, t, call, args=[], kwargs={}, threaded=True, name=None):
+        """
+        runs call after t seconds.
 
-    def add_job(self, t, call, args=[], kwargs={}, threaded=True):
+        :param name: job name in the stats, defaults to the name of call
+        :return: `Deferred` called with the result of call
+        """
         d = Deferred()
         t += time.time()
-        j = Job(t, call, args, kwargs, d, threaded)
-        self.queue.put((t, j))
+        j = Job(t, call, args, kwargs, d, threaded, name)
+
+        with self.cond:
+            self.jobs[d] = j
+            heappush(self.queue, (t, next(self.sequence), j))
+            if self.queue[0][2] is j:  #: wake up earlier
+                self.cond.notify()
+
         return d
 
     def remove_job(self, d):
@@ -50,39 +84,148 @@ class Scheduler:
         :param d: defered object
         :return: if job was deleted
         """
-        index = -1
+        with self.cond:
+            j = self.jobs.pop(d, None)
+            if j is None:
+                return False
+
+            j.removed = True
+            self.removed += 1
+            if self.removed > len(self.queue) // 2:
+                self.queue = [x for x in self.queue if not x[2].removed]
+                heapify(self.queue)
+                self.removed = 0
+
+        return True
+
+    def start(self):
+        """
+        starts the scheduler thread, if not running.
+        """
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
 
-        for i, j in enumerate(self.queue):
-            if j[1].deferred == d:
-                index = i
+        self.thread = Thread(target=self.run, name="Scheduler", daemon=True)
+        self.thread.start()
 
-        if index >= 0:
-            del self.queue[index]
-            return True
+    def stop(self):
+        """
+        stops the scheduler thread, jobs not run yet are kept.
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify()
 
-        return False
+    def shutdown(self):
+        self.stop()
+        self.executor.shutdown(wait=False)
 
     def run(self):
+        """
+        waits for the next job and runs it, until stopped.
+        """
         while True:
-            t, j = self.queue.get()
-            if not j:
-                break
+            with self.cond:
+                j = self._next()
+                if j is None:
+                    return
+
+            if j.threaded:
+                self.executor.submit(self._run, j)
             else:
-                if t <= time.time():
-                    j.start()
-                else:
-                    self.queue.put((t, j))
-                    break
+                self._run(j)
+
+    def _next(self):
+        """
+        returns the next job once it is due, None if stopped.
+        """
+        while self.running and self.thread is current_thread():
+            if not self.queue:
+                self.cond.wait()
+                continue
+
+            t, i, j = self.queue[0]
+            if j.removed:
+                heappop(self.queue)
+                self.removed -= 1
+                continue
+
+            timeout = t - time.time()
+            if timeout > 0:
+                self.cond.wait(timeout)
+                continue
+
+            heappop(self.queue)
+            del self.jobs[j.deferred]
+            return j
+
+    def _run(self, j):
+        start = time.time()
+        failed = False
+        try:
+            j.run()
+        except Exception as exc:
+            failed = True
+            self.pyload.log.error(
+                self._("Scheduled job {name} failed | {err}").format(
+                    name=j.name, err=exc
+                ),
+                exc_info=self.pyload.debug > 1,
+                stack_info=self.pyload.debug > 2,
+            )
+        finally:
+            elapsed = time.time() - start
+            with self.cond:
+                stats = self.stats.setdefault(j.name, [0, 0, 0.0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += failed
+                stats[2] += elapsed
+                stats[3] = max(stats[3], elapsed)
+                stats[4] = elapsed
+
+    def get_stats(self):
+        """
+        returns the number of workers and pending jobs, and the runs of the jobs by
+        name.
+        """
+        with self.cond:
+            return {
+                "workers": self.WORKERS,
+                "pending": len(self.jobs),
+                "jobs": {
+                    name: {
+                        "runs": runs,
+                        "errors": errors,
+                        "total": total,
+                        "longest": longest,
+                        "last": last,
+                    }
+                    for name, (runs, errors, total, longest, last) in self.stats.items()
+                },
+            }
 
 
 class Job:
-    def __init__(self, time, call, args=[], kwargs={}, deferred=None, threaded=True):
+    def __init__(
+        self,
+        time,
+        call,
+        args=[],
+        kwargs={},
+        deferred=None,
+        threaded=True,
+        name=None,
+    ):
         self.time = float(time)
         self.call = call
         self.args = args
         self.kwargs = kwargs
         self.deferred = deferred
         self.threaded = threaded
+        self.name = name or getattr(call, "__qualname__", None) or repr(call)
+        self.removed = False
 
     def run(self):
         ret = self.call(*self.args, **self.kwargs)
@@ -90,40 +233,3 @@ class Job:
             return
         else:
             self.deferred.callback(ret)
-
-    def start(self):
-        if self.threaded:
-            start_new_thread(self.run, ())
-        else:
-            self.run()
-
-
-class PriorityQueue:
-    """
-    a non blocking priority queue.
-    """
-
-    def __init__(self):
-        self.queue = []
-        self.lock = Lock()
-
-    def __iter__(self):
-        return iter(self.queue)
-
-    def __delitem__(self, key):
-        del self.queue[key]
-
-    @lock
-    def put(self, element):
-        heappush(self.queue, element)
-
-    @lock
-    def get(self):
-        """
-        return element or None.
-        """
-        try:
-            el = heappop(self.queue)
-            return el
-        except IndexError:
-            return None, None
@@ -98,6 +98,7 @@ class DecrypterThread(PluginThread):
                 self.active = False
                 self.pyload.files.save()
                 self.m.local_threads.remove(self)
+                self.m.wake()
                 # exc_clear()
 
         # self.pyload.addon_manager.download_finished(pyfile)
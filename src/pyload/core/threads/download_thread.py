@@ -182,7 +182,6 @@ class DownloadThread(PluginThread):
 
                 self.pyload.files.check_package_finished(pyfile)
 
-                self.active = False
                 self.pyload.files.save()
 
                 continue
@@ -215,6 +214,7 @@ class DownloadThread(PluginThread):
             self.active = False
             pyfile.finish_if_done()
             self.pyload.files.save()
+            self.m.wake()
 
     def put(self, job):
         """
@@ -1,177 +1,397 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: RaNaN, vuolter
 
+import json
 import time
+from collections import OrderedDict, deque
 from datetime import timedelta
+from functools import partial
+from threading import Condition, Lock
 
 from ..api import OnlineStatus
+from ..datatypes.enums import DownloadStatus
 from ..datatypes.pyfile import PyFile
 from ..utils.old.packagetools import parse_names
 from .plugin_thread import PluginThread
 
 
-class InfoThread(PluginThread):
-    def __init__(self, manager, data, pid=-1, rid=-1, add=False):
+class InfoCache:
+    """
+    infos of checked urls, kept for a time depending on their status.
+
+    Holds at most MAX_SIZE urls, the least recently used are dropped first. Infos
+    can be saved to the storage of the database to be reused after a restart.
+    """
+
+    MAX_SIZE = 10000
+
+    #: seconds an info is kept by its status
+    TTL = {
+        DownloadStatus.ONLINE: timedelta(hours=6).total_seconds(),
+        DownloadStatus.OFFLINE: timedelta(days=1).total_seconds(),
+        DownloadStatus.TEMPOFFLINE: timedelta(minutes=10).total_seconds(),
+    }
+    DEFAULT_TTL = timedelta(minutes=5).total_seconds()
+
+    STORAGE = "InfoCache"  #: identifier in the storage of the database
+
+    def __init__(self, size=None):
+        self.size = size or self.MAX_SIZE
+        self.lock = Lock()
+        self.entries = OrderedDict()  #: url -> expire time, info, least recent first
+        self.dirty = False  #: changed since saved
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __setitem__(self, url, info):
         """
-        Constructor.
+        caches info = (name, size, status, url) of url.
         """
-        super().__init__(manager)
+        try:
+            ttl = self.TTL.get(int(info[2]), self.DEFAULT_TTL)
+        except (TypeError, ValueError):
+            ttl = self.DEFAULT_TTL
 
-        self.data = data
-        self.pid = pid  #: package id
-        # [ .. (name, plugin) .. ]
+        with self.lock:
+            self._put(url, time.time() + ttl, tuple(info))
 
-        self.rid = rid  #: result id
-        self.add = add  #: add packages instead of return result
+    def _put(self, url, expires, info):
+        self.entries.pop(url, None)
+        self.entries[url] = (expires, info)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        self.dirty = True
 
-        self.cache = []  #: accumulated data
+    def get(self, url):
+        """
+        returns the info of url, None if not cached or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None and entry[0] < time.time():
+                del self.entries[url]
+                self.dirty = True
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(url)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, url):
+        """
+        returns the info of url like `get`, without counting or refreshing it.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is None or entry[0] < time.time():
+            return None
+        return entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.dirty = True
+
+    def purge(self):
+        """
+        drops expired infos, returns their number.
+        """
+        now = time.time()
+        with self.lock:
+            expired = [url for url, (t, info) in self.entries.items() if t < now]
+            for url in expired:
+                del self.entries[url]
+            if expired:
+                self.dirty = True
+        return len(expired)
+
+    def load(self, db):
+        """
+        adds the infos saved in the storage, returns their number.
+        """
+        try:
+            entries = json.loads(db.get_storage(self.STORAGE, "entries") or "[]")
+        except ValueError:
+            return 0
+
+        now = time.time()
+        with self.lock:
+            for url, expires, info in entries:
+                if expires >= now and url not in self.entries:
+                    self._put(url, expires, tuple(info))
+            self.dirty = False
+        return len(self.entries)
+
+    def save(self, db):
+        """
+        writes the infos to the storage, if changed since saved.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = [[url, t, info] for url, (t, info) in self.entries.items()]
+            self.dirty = False
 
-        self.start()
+        db.set_storage(self.STORAGE, "entries", json.dumps(entries))
 
-    def run(self):
+    def stats(self):
+        return {
+            "cached": len(self.entries),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
+
+
+class InfoJob:
+    """
+    an online check, its urls are checked by the `InfoPool`.
+    """
+
+    #: report unknown status for urls which could not be checked
+    defaults = True
+
+    def __init__(self, manager, data):
+        self.m = manager
+        self.pyload = manager.pyload
+        self.lock = Lock()
+
+        self.urls = OrderedDict()  #: plugin -> urls
+        for url, plugin in data:
+            self.urls.setdefault(plugin, OrderedDict())[url] = None
+        self.pending = sum(len(urls) for urls in self.urls.values())
+
+    def add(self, plugin, result, checked):
         """
-        run method.
+        passes result to the job, checked is the number of its urls done.
         """
-        plugins = {}
-        container = []
+        with self.lock:
+            if result:
+                self.update(plugin, result)
 
-        for url, plugin in self.data:
-            if plugin in plugins:
-                plugins[plugin].append(url)
-            else:
-                plugins[plugin] = [url]
+            self.pending -= checked
+            if not self.pending:
+                self.finish()
+                self.m.timestamp = time.time() + timedelta(minutes=5).seconds
 
-        # filter out container plugins
-        for name in self.pyload.plugin_manager.container_plugins:
-            if name in plugins:
-                container.extend((name, url) for url in plugins[name])
-
-                del plugins[name]
-
-        # directly write to database
-        if self.pid > -1:
-            for pluginname, urls in plugins.items():
-                plugin = self.pyload.plugin_manager.get_plugin(pluginname, True)
-                if hasattr(plugin, "get_info"):
-                    self.fetch_for_plugin(pluginname, plugin, urls, self.update_db)
-                    self.pyload.files.save()
-
-        elif self.add:
-            for pluginname, urls in plugins.items():
-                plugin = self.pyload.plugin_manager.get_plugin(pluginname, True)
-                if hasattr(plugin, "get_info"):
-                    self.fetch_for_plugin(
-                        pluginname, plugin, urls, self.update_cache, True
-                    )
+    def update(self, plugin, result):
+        raise NotImplementedError
 
-                else:
-                    # generate default result
-                    result = [(url, 0, 3, url) for url in urls]
+    def finish(self):
+        pass
 
-                    self.update_cache(pluginname, result)
 
-            packs = parse_names((name, url) for name, x, y, url in self.cache)
+class DatabaseJob(InfoJob):
+    """
+    writes the infos to the links of a package, or of all packages if pid is None.
+    """
 
-            self.pyload.log.debug(f"Fetched and generated {len(packs)} packages")
+    defaults = False
 
-            for k, v in packs:
-                self.pyload.api.add_package(k, v)
+    def __init__(self, manager, data, pid):
+        super().__init__(manager, data)
+        self.pid = pid  #: package id
 
-            # empty cache
-            del self.cache[:]
+    def update(self, plugin, result):
+        self.pyload.files.update_file_info(result, self.pid)
 
-        else:  #: post the results
+    def finish(self):
+        self.pyload.files.save()
 
-            for name, url in container:
-                # attach container content
-                try:
-                    data = self.decrypt_container(name, url)
-                except Exception:
-                    self.pyload.log.warning(
-                        "Could not decrypt container.",
-                        exc_info=self.pyload.debug > 1,
-                        stack_info=self.pyload.debug > 2,
-                    )
-                    data = []
 
-                for url, plugin in data:
-                    if plugin in plugins:
-                        plugins[plugin].append(url)
-                    else:
-                        plugins[plugin] = [url]
+class PackageJob(InfoJob):
+    """
+    adds packages named after the infos.
+    """
 
-            self.m.info_results[self.rid] = {}
+    def __init__(self, manager, data):
+        super().__init__(manager, data)
+        self.cache = []  #: accumulated data
 
-            for pluginname, urls in plugins.items():
-                plugin = self.pyload.plugin_manager.get_plugin(pluginname, True)
-                if hasattr(plugin, "get_info"):
-                    self.fetch_for_plugin(
-                        pluginname, plugin, urls, self.update_result, True
-                    )
+    def update(self, plugin, result):
+        self.cache.extend(result)
 
-                    # force to process cache
-                    if self.cache:
-                        self.update_result(pluginname, [], True)
+    def finish(self):
+        packs = parse_names((name, url) for name, x, y, url in self.cache)
 
-                else:
-                    # generate default result
-                    result = [(url, 0, 3, url) for url in urls]
+        self.pyload.log.debug(f"Fetched and generated {len(packs)} packages")
 
-                    self.update_result(pluginname, result, True)
+        self.pyload.api.add_packages_bulk(
+            [{"name": k, "links": v} for k, v in packs.items()]
+        )
 
-            self.m.info_results[self.rid]["ALL_INFO_FETCHED"] = {}
+        # empty cache
+        del self.cache[:]
 
-        self.m.timestamp = time.time() + timedelta(minutes=5).seconds
 
-    def update_db(self, plugin, result):
-        self.pyload.files.update_file_info(result, self.pid)
+class ResultJob(InfoJob):
+    """
+    posts the infos as results of `ThreadManager.get_info_result`.
+    """
+
+    def __init__(self, manager, data, rid):
+        super().__init__(manager, data)
+        self.rid = rid  #: result id
+        self.cache = []  #: accumulated data
 
-    def update_result(self, plugin, result, force=False):
+    def update(self, plugin, result):
         # parse package name and generate result
         # accumulate results
+        self.cache.extend((plugin, res) for res in result)
 
-        self.cache.extend(result)
+        if len(self.cache) >= 20:
+            self.flush()
 
-        if len(self.cache) >= 20 or force:
-            # used for package generating
-            tmp = [
-                (name, (url, OnlineStatus(name, plugin, "unknown", status, int(size))))
-                for name, size, status, url in self.cache
-            ]
+    def flush(self):
+        # used for package generating
+        tmp = [
+            (name, (url, OnlineStatus(name, plugin, "unknown", status, int(size))))
+            for plugin, (name, size, status, url) in self.cache
+        ]
 
-            data = parse_names(tmp)
-            result = {}
-            for k, v in data.items():
-                for url, status in v:
-                    status.packagename = k
-                    result[url] = status
+        data = parse_names(tmp)
+        result = {}
+        for k, v in data.items():
+            for url, status in v:
+                status.packagename = k
+                result[url] = status
 
-            self.m.set_info_results(self.rid, result)
+        self.m.set_info_results(self.rid, result)
 
-            self.cache = []
+        self.cache = []
 
-    def update_cache(self, plugin, result):
-        self.cache.extend(result)
+    def finish(self):
+        # force to process cache
+        if self.cache:
+            self.flush()
 
-    def fetch_for_plugin(self, pluginname, plugin, urls, cb, err=None):
-        try:
-            result = []  #: result loaded from cache
-            process = []  #: urls to process
-            for url in urls:
-                if url in self.m.info_cache:
-                    result.append(self.m.info_cache[url])
+        self.m.set_info_results(self.rid, {"ALL_INFO_FETCHED": {}})
+
+
+class InfoPool:
+    """
+    checks the online status of links on a fixed number of threads.
+
+    Urls of all jobs are queued per plugin and checked in batches, at most
+    PLUGIN_LIMIT batches of a plugin at once so hosters are not flooded. A url
+    queued or being checked for several jobs is checked only once.
+    """
+
+    WORKERS = 5
+    PLUGIN_LIMIT = 2  #: batches of a plugin checked at once
+    BATCH_SIZE = 50  #: urls passed to `get_info` at once
+
+    def __init__(self, manager):
+        self.m = manager
+        self.pyload = manager.pyload
+        self._ = manager._
+        self.cond = Condition()
+
+        self.queue = OrderedDict()  #: plugin -> url -> time queued, oldest first
+        self.waiting = {}  #: (plugin, url) -> jobs waiting for its info
+        self.running = {}  #: plugin -> batches being checked
+        self.tasks = deque()  #: other work, like decrypting containers
+
+        self.checked = 0  #: urls checked
+        self.latency = 0.0  #: average seconds from queueing to info
+
+        self.threads = [InfoThread(manager, self) for _ in range(self.WORKERS)]
+
+    def add_job(self, job, decrypt=False):
+        """
+        queues the urls of a job, urls in the info cache are passed at once.
+
+        :param decrypt: check the links of containers instead of skipping them
+        """
+        # filter out container plugins
+        containers = []
+        for name in self.pyload.plugin_manager.container_plugins:
+            containers.extend((name, url) for url in job.urls.pop(name, ()))
+        job.pending -= len(containers)
+
+        if decrypt and containers:
+            self.add_task(partial(self.decrypt_containers, job, containers))
+        else:
+            self._queue(job)
+
+    def _queue(self, job):
+        now = time.time()
+        cached = []
+        with self.cond:
+            for plugin, urls in job.urls.items():
+                for url in urls:
+                    info = self.m.info_cache.get(url)
+                    if info is not None:
+                        cached.append((plugin, info))
+                        continue
+
+                    key = (plugin, url)
+                    if key in self.waiting:  #: already queued or being checked
+                        self.waiting[key].append(job)
+                    else:
+                        self.waiting[key] = [job]
+                        self.queue.setdefault(plugin, OrderedDict())[url] = now
+            self.cond.notify_all()
+
+        if cached:
+            self.pyload.log.debug(f"Fetched {len(cached)} values from cache")
+            for plugin, res in cached:
+                job.add(plugin, [res], 1)
+
+        elif not job.pending:
+            job.add(None, [], 0)
+
+    def add_task(self, func):
+        with self.cond:
+            self.tasks.append(func)
+            self.cond.notify()
+
+    def get_task(self):
+        """
+        returns the next work for a thread, blocks until there is some.
+        """
+        with self.cond:
+            while True:
+                if self.tasks:
+                    return self.tasks.popleft()
+
+                for plugin, urls in self.queue.items():
+                    if self.running.get(plugin, 0) < self.PLUGIN_LIMIT:
+                        break
                 else:
-                    process.append(url)
+                    self.cond.wait()
+                    continue
 
-            if result:
-                self.pyload.log.debug(
-                    f"Fetched {len(result)} values from cache for {pluginname}"
-                )
-                cb(pluginname, result)
+                batch = OrderedDict()
+                while urls and len(batch) < self.BATCH_SIZE:
+                    url, queued = urls.popitem(last=False)
+                    batch[url] = queued
+
+                #: other plugins go first next time
+                del self.queue[plugin]
+                if urls:
+                    self.queue[plugin] = urls
+
+                self.running[plugin] = self.running.get(plugin, 0) + 1
+                return partial(self.check, plugin, batch)
 
-            if process:
+    def check(self, pluginname, batch):
+        """
+        fetches the infos of a batch of urls of a plugin.
+        """
+        failed = True
+        try:
+            plugin = self.pyload.plugin_manager.get_plugin(pluginname, True)
+            if hasattr(plugin, "get_info"):
                 self.pyload.log.debug(f"Run Info Fetching for {pluginname}")
-                for result in plugin.get_info(process):
+                for result in plugin.get_info(list(batch)):
                     # result = [ .. (name, size, status, url) .. ]
                     if not isinstance(result, list):
                         result = [result]
@@ -179,9 +399,11 @@ class InfoThread(PluginThread):
                     for res in result:
                         self.m.info_cache[res[3]] = res
 
-                    cb(pluginname, result)
+                    self._deliver(pluginname, batch, result)
+
+                self.pyload.log.debug(f"Finished Info Fetching for {pluginname}")
+                failed = False
 
-            self.pyload.log.debug(f"Finished Info Fetching for {pluginname}")
         except Exception as exc:
             self.pyload.log.warning(
                 self._("Info Fetching for {name} failed | {err}").format(
@@ -191,10 +413,85 @@ class InfoThread(PluginThread):
                 stack_info=self.pyload.debug > 2,
             )
 
-            # generate default results
-            if err:
-                result = [(url, 0, 3, url) for url in urls]
-                cb(pluginname, result)
+        finally:
+            with self.cond:
+                self.running[pluginname] -= 1
+                if not self.running[pluginname]:
+                    del self.running[pluginname]
+                self.cond.notify()
+
+            self._release(pluginname, batch, failed)
+
+    def _deliver(self, plugin, batch, result):
+        now = time.time()
+        jobs = OrderedDict()  #: job -> result, urls checked
+        with self.cond:
+            for res in result:
+                url = res[3]
+                waiting = self.waiting.pop((plugin, url), None)
+                if waiting is not None:
+                    checked = 1
+                    self.checked += 1
+                    self.latency += (now - batch.get(url, now) - self.latency) / 10
+
+                elif url in batch:
+                    continue  #: got its info before
+
+                else:
+                    # info for an url the plugin changed, goes to all jobs of the batch
+                    waiting = OrderedDict.fromkeys(
+                        job for u in batch for job in self.waiting.get((plugin, u), [])
+                    )
+                    checked = 0
+
+                for job in waiting:
+                    entry = jobs.setdefault(job, [[], 0])
+                    entry[0].append(res)
+                    entry[1] += checked
+
+        for job, (res, checked) in jobs.items():
+            job.add(plugin, res, checked)
+
+    def _release(self, plugin, batch, failed):
+        """
+        finishes the urls of a batch left without info, with unknown status if the
+        check failed.
+        """
+        jobs = OrderedDict()  #: job -> result, urls checked
+        with self.cond:
+            for url in batch:
+                for job in self.waiting.pop((plugin, url), []):
+                    entry = jobs.setdefault(job, [[], 0])
+                    if failed and job.defaults:
+                        entry[0].append((url, 0, 3, url))
+                    entry[1] += 1
+
+        for job, (res, checked) in jobs.items():
+            job.add(plugin, res, checked)
+
+    def decrypt_containers(self, job, containers):
+        """
+        adds the urls of containers to a job and queues it.
+        """
+        for name, url in containers:
+            # attach container content
+            try:
+                data = self.decrypt_container(name, url)
+            except Exception:
+                self.pyload.log.warning(
+                    "Could not decrypt container.",
+                    exc_info=self.pyload.debug > 1,
+                    stack_info=self.pyload.debug > 2,
+                )
+                data = []
+
+            for url, plugin in data:
+                urls = job.urls.setdefault(plugin, OrderedDict())
+                if url not in urls:
+                    urls[url] = None
+                    job.pending += 1
+
+        self._queue(job)
 
     def decrypt_container(self, plugin, url):
         data = []
@@ -230,3 +527,45 @@ class InfoThread(PluginThread):
             pyfile.release()
 
         return data
+
+    def stats(self):
+        with self.cond:
+            return {
+                "workers": len(self.threads),
+                "queued": sum(len(urls) for urls in self.queue.values()),
+                "running": sum(self.running.values()),
+                "waiting": len(self.waiting),
+                "checked": self.checked,
+                "latency": self.latency,
+            }
+
+
+class InfoThread(PluginThread):
+    """
+    thread of the `InfoPool`.
+    """
+
+    def __init__(self, manager, pool):
+        """
+        Constructor.
+        """
+        super().__init__(manager)
+
+        self.pool = pool
+
+        self.start()
+
+    def run(self):
+        """
+        run method.
+        """
+        while True:
+            task = self.pool.get_task()
+            try:
+                task()
+            except Exception as exc:
+                self.pyload.log.error(
+                    self._("Info thread error | {}").format(exc),
+                    exc_info=self.pyload.debug > 1,
+                    stack_info=self.pyload.debug > 2,
+                )
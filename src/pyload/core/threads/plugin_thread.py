@@ -132,3 +132,4 @@ class PluginThread(Thread):
         """
         self.active = False
         pyfile.release()
+        self.m.wake()
@@ -4,13 +4,17 @@ import os
 import re
 import time
 import zlib
-from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
 
 from pyload.core.utils import format
 
 from ..base.addon import BaseAddon, threaded
 
 
+BUFFER_SIZE = 1 << 20  #: large reads, hashlib and zlib release the gil meanwhile
+
+
 def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
     file_size = os.stat(local_file).st_size
     processed = 0
@@ -24,50 +28,82 @@ def compute_checksum(local_file, algorithm, progress_notify=None, abort=None):
             ("md5", "sha1", "sha224", "sha256", "sha384", "sha512"),
         ):
             h = getattr(hashlib, algorithm)()
-
-            with open(local_file, mode="rb") as fp:
-                for chunk in iter(lambda: fp.read(128 * h.block_size), ""):
-                    if abort and abort():
-                        return False
-
-                    h.update(chunk)
-                    processed += len(chunk)
-
-                    if progress_notify:
-                        progress_notify(processed * 100 // file_size)
-
-            return h.hexdigest()
+            update = h.update
 
         elif algorithm in ("adler32", "crc32"):
             hf = getattr(zlib, algorithm)
-            last = 0
+            h = None
+            last = hf(b"")
+
+            def update(chunk):
+                nonlocal last
+                last = hf(chunk, last)
 
-            with open(local_file, mode="rb") as fp:
-                for chunk in iter(lambda: fp.read(8192), ""):
-                    if abort and abort():
-                        return False
+        else:
+            return None
 
-                    last = hf(chunk, last)
-                    processed += len(chunk)
+        buf = bytearray(BUFFER_SIZE)
+        view = memoryview(buf)
+        with open(local_file, mode="rb") as fp:
+            for size in iter(lambda: fp.readinto(buf), 0):
+                if abort and abort():
+                    return False
 
-                    if progress_notify:
-                        progress_notify(processed * 100 // file_size)
+                update(view[:size])
+                processed += size
 
-            #: zlib sometimes return negative value
-            return "{:x}".format((2 ** 32 + last) & 0xFFFFFFFF)
+                if progress_notify:
+                    progress_notify(processed * 100 // file_size)
 
-        else:
-            return None
+        if h is not None:
+            return h.hexdigest()
+
+        #: zlib sometimes return negative value, sfv files keep leading zeros
+        return "{:08x}".format((2 ** 32 + last) & 0xFFFFFFFF)
 
     finally:
         if progress_notify:
             progress_notify(100)
 
 
+class PackageProgress:
+    """
+    sums up the progress of files hashed in parallel.
+    """
+
+    def __init__(self, notify):
+        self.notify = notify
+        self.lock = Lock()
+        self.sizes = {}  #: file -> size
+        self.done = {}  #: file -> bytes hashed
+
+    def add(self, local_file, notify=None):
+        """
+        returns the progress_notify function for a file, which also calls notify
+        with the progress of the file itself.
+        """
+        try:
+            self.sizes[local_file] = os.path.getsize(local_file)
+        except OSError:
+            self.sizes[local_file] = 0
+
+        def progress_notify(percent):
+            if notify:
+                notify(percent)
+
+            with self.lock:
+                self.done[local_file] = self.sizes[local_file] * percent // 100
+                total = sum(self.sizes.values())
+                percent = sum(self.done.values()) * 100 // total if total else 100
+            self.notify(percent)
+
+        return progress_notify
+
+
 class Checksum(BaseAddon):
     __name__ = "Checksum"
     __type__ = "addon"
-    __version__ = "0.34"
+    __version__ = "0.36"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -110,6 +146,16 @@ class Checksum(BaseAddon):
                 self._("Checksum validation is disabled in plugin configuration")
             )
 
+        #: files of a package are hashed in parallel, one per core
+        self.pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1, thread_name_prefix="Checksum"
+        )
+
+    def deactivate(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
     def init(self):
         self.algorithms = sorted(
             getattr(
@@ -126,6 +172,8 @@ class Checksum(BaseAddon):
 
         self.retries = {}
 
+        self.pool = None
+
     def download_finished(self, pyfile):
         """
         Compute checksum for the downloaded file and compare it with the hash provided
@@ -194,14 +242,20 @@ class Checksum(BaseAddon):
             if len(data["hash"]) > 0:
                 for key in self.algorithms:
                     if key in data["hash"]:
+                        algorithm = key.replace("-", "").lower()
+                        hasher = getattr(pyfile.plugin, "hasher", None)
                         pyfile.set_custom_status(self._("checksum verifying"))
                         try:
-                            checksum = compute_checksum(
-                                local_file,
-                                key.replace("-", "").lower(),
-                                progress_notify=pyfile.set_progress,
-                                abort=lambda: pyfile.abort,
-                            )
+                            if hasher is not None and algorithm in hasher:
+                                #: hashed while downloading
+                                checksum = hasher.hexdigest(algorithm, local_file)
+                            else:
+                                checksum = compute_checksum(
+                                    local_file,
+                                    algorithm,
+                                    progress_notify=pyfile.set_progress,
+                                    abort=lambda: pyfile.abort,
+                                )
                         finally:
                             pyfile.set_status("processing")
 
@@ -280,7 +334,9 @@ class Checksum(BaseAddon):
 
             pdata = list(pypack.get_children().items())
             files_ids = {fdata["name"]: fdata["id"] for fid, fdata in pdata}
-            failed_queue = []
+
+            #: hash all files first, then check them in order of the hash files
+            checks = []
             for fid, fdata in pdata:
                 file_type = os.path.splitext(fdata["name"])[1][1:].lower()
 
@@ -295,7 +351,13 @@ class Checksum(BaseAddon):
                 with open(hash_file) as fp:
                     text = fp.read()
 
-                failed = []
+                #: the hash file shows the progress of all files it lists
+                hash_pyfile = self.pyload.files.get_file(fid)
+                hash_pyfile.set_custom_status(self._("checksum verifying"))
+                thread.add_active(hash_pyfile)
+                progress = PackageProgress(hash_pyfile.set_progress)
+
+                results = []
                 for m in re.finditer(
                     self._regexmap.get(file_type, self._regexmap["default"]), text, re.M
                 ):
@@ -306,23 +368,38 @@ class Checksum(BaseAddon):
                     algorithm = self._methodmap.get(file_type, file_type)
 
                     pyfile = None
-                    fid = files_ids.get(data["NAME"], None)
-                    if fid is not None:
-                        pyfile = self.pyload.files.get_file(fid)
+                    abort = None
+                    file_id = files_ids.get(data["NAME"], None)
+                    if file_id is not None:
+                        pyfile = self.pyload.files.get_file(file_id)
                         pyfile.set_custom_status(self._("checksum verifying"))
                         thread.add_active(pyfile)
-                        try:
-                            checksum = compute_checksum(
-                                local_file,
-                                algorithm,
-                                progress_notify=pyfile.set_progress,
-                                abort=lambda: pyfile.abort,
-                            )
-                        finally:
-                            thread.finish_file(pyfile)
+                        abort = lambda pyfile=pyfile: pyfile.abort
+
+                    future = self.pool.submit(
+                        compute_checksum,
+                        local_file,
+                        algorithm,
+                        progress_notify=progress.add(
+                            local_file, pyfile and pyfile.set_progress
+                        ),
+                        abort=abort,
+                    )
+                    results.append(
+                        (data, file_id, pyfile, local_file, algorithm, future)
+                    )
 
-                    else:
-                        checksum = compute_checksum(local_file, algorithm)
+                checks.append((fdata["name"], hash_pyfile, results))
+
+            failed_queue = []
+            for name, hash_pyfile, results in checks:
+                failed = []
+                for data, fid, pyfile, local_file, algorithm, future in results:
+                    try:
+                        checksum = future.result()
+                    finally:
+                        if pyfile is not None:
+                            thread.finish_file(pyfile)
 
                     if checksum is False:
                         continue
@@ -360,6 +437,8 @@ class Checksum(BaseAddon):
                             self._("Unsupported hashing algorithm"), algorithm.upper()
                         )
 
+                thread.finish_file(hash_pyfile)
+
                 if failed:
                     failed_queue.extend(failed)
 
@@ -367,7 +446,7 @@ class Checksum(BaseAddon):
                     self.log_info(
                         self._(
                             'All files specified by "{}" verified successfully'
-                        ).format(fdata["name"])
+                        ).format(name)
                     )
 
             if failed_queue:
@@ -10,7 +10,7 @@ from .hoster import BaseHoster
 class BaseDecrypter(BaseHoster):
     __name__ = "BaseDecrypter"
     __type__ = "decrypter"
-    __version__ = "0.20"
+    __version__ = "0.21"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -89,6 +89,7 @@ class BaseDecrypter(BaseHoster):
         else:
             folder_per_package = folder_per_package == "Yes"
 
+        packages = []
         for name, links, folder in self.packages:
             self.log_info(
                 self._("Create package: {}").format(name),
@@ -98,17 +99,6 @@ class BaseDecrypter(BaseHoster):
             links = [self.fixurl(url) for url in links]
             self.log_debug("LINKS for package " + name, links)
 
-            pid = self.pyload.api.add_package(name, links, pack_queue)
-
-            if pack_password:
-                self.pyload.api.set_package_data(pid, {"password": pack_password})
-
-            #: Workaround to do not break API add_package method
-            def set_folder(x):
-                return self.pyload.api.set_package_data(
-                    pid, {"folder": safename(x or "")}
-                )
-
             if not folder_per_package:
                 folder = pack_folder
 
@@ -121,4 +111,13 @@ class BaseDecrypter(BaseHoster):
                 )
             )
 
-            set_folder(folder)
+            packages.append(
+                {
+                    "name": name,
+                    "links": links,
+                    "folder": safename(folder or ""),
+                    "password": pack_password,
+                }
+            )
+
+        self.pyload.api.add_packages_bulk(packages, pack_queue)
@@ -9,14 +9,14 @@ from pyload.core.network.http.exceptions import BadHeader
 from pyload.core.utils import parse
 from pyload.core.utils.old import safejoin
 
-from ..helpers import exists
+from ..helpers import StreamHasher, exists
 from .hoster import BaseHoster
 
 
 class BaseDownloader(BaseHoster):
     __name__ = "BaseDownloader"
     __type__ = "downloader"
-    __version__ = "0.74"
+    __version__ = "0.76"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -57,6 +57,9 @@ class BaseDownloader(BaseHoster):
         #: Re match of the last call to `check_download`
         self.last_check = None
 
+        #: StreamHasher of the last call to `download`, if it hashed while downloading
+        self.hasher = None
+
         #: Restart flag
         self.restart_free = False  # TODO: Recheck in 0.6.x
 
@@ -214,7 +217,17 @@ class BaseDownloader(BaseHoster):
             return resource
 
     def _download(
-        self, url, filename, get, post, ref, cookies, disposition, resume, chunks
+        self,
+        url,
+        filename,
+        get,
+        post,
+        ref,
+        cookies,
+        disposition,
+        resume,
+        chunks,
+        transform=None,
     ):
         # TODO: Safe-filename check in HTTPDownload in 0.6.x
         filename = os.fsdecode(filename)
@@ -240,6 +253,7 @@ class BaseDownloader(BaseHoster):
                 resume,
                 self.pyfile.set_progress,
                 disposition,
+                transform,
             )
 
         except IOError as exc:
@@ -275,6 +289,7 @@ class BaseDownloader(BaseHoster):
         resume=None,
         chunks=None,
         fixurl=True,
+        transform=None,
     ):
         """
         Downloads the content at url to download folder.
@@ -286,6 +301,7 @@ class BaseDownloader(BaseHoster):
         :param cookies:
         :param disposition: if True and server provides content-disposition header\
         the filename will be changed if needed
+        :param transform: see `HTTPDownload.transform`, to decrypt while downloading
         :return: The location where the file was saved
         """
         self.check_status()
@@ -321,8 +337,30 @@ class BaseDownloader(BaseHoster):
         )
         self.check_status()
 
+        #: hash while downloading, so the checksum addon does not read the file again
+        self.hasher = None
+        if (
+            transform is None
+            and self.config.get("enabled", plugin="Checksum")
+            and self.config.get("check_checksum", plugin="Checksum")
+        ):
+            hashes = self.info.get("hash") or {}
+            algorithms = [key.replace("-", "").lower() for key in hashes]
+            if algorithms:
+                self.hasher = StreamHasher(algorithms)
+                transform = self.hasher.stream
+
         newname = self._download(
-            dl_url, dl_filename, get, post, ref, cookies, disposition, resume, chunks
+            dl_url,
+            dl_filename,
+            get,
+            post,
+            ref,
+            cookies,
+            disposition,
+            resume,
+            chunks,
+            transform,
         )
 
         # TODO: Recheck in 0.6.x
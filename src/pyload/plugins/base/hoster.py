@@ -28,7 +28,7 @@ def parse_file_info(klass, url="", html=""):
 class BaseHoster(BasePlugin):
     __name__ = "BaseHoster"
     __type__ = "base"
-    __version__ = "0.34"
+    __version__ = "0.36"
     __status__ = "stable"
 
     __pyload_version__ = "0.5"
@@ -171,6 +171,9 @@ class BaseHoster(BasePlugin):
             self.req = self.pyload.request_factory.get_request(self.classname)
             self.premium = False
 
+        self.req.bucket.set_group("priority", "premium" if self.premium else "free")
+        self.req.bucket.set_group("package", self.pyfile.packageid)
+
         self.req.set_option("timeout", 60)  # TODO: Remove in 0.6.x
 
         self.setup_base()
@@ -188,6 +191,13 @@ class BaseHoster(BasePlugin):
             self.account = False
             self.user = None  # TODO: Remove in 0.6.x
 
+        elif not self.pyload.account_manager.wait_account(
+            self.account.classname, self.pyload.account_manager.READY_TIMEOUT
+        ):
+            self.log_warning(self._("Account is still logging in, not using it"))
+            self.account = False
+            self.user = None  # TODO: Remove in 0.6.x
+
         else:
             self.account.choose()
             self.user = self.account.user  # TODO: Remove in 0.6.x
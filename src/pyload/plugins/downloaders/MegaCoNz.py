@@ -64,7 +64,7 @@ class MegaCrypto:
     @staticmethod
     def str_to_a32(s):
         # Add padding, we need a string with a length multiple of 4
-        s += "\0" * (-len(s) % 4)
+        s += b"\0" * (-len(s) % 4)
         #: big-endian, unsigned int
         return struct.unpack(">{}I".format(len(s) // 4), s)
 
@@ -162,50 +162,131 @@ class MegaCrypto:
         if chunk_start < size:
             yield (chunk_start, size - chunk_start)
 
-    class Checksum:
+    @staticmethod
+    def get_chunk(offset):
+        """
+        Return start and size of the chunk (see get_chunks) containing offset, in
+        a file large enough.
+        """
+        chunk_start = 0
+        chunk_size = 0x20000
+
+        while chunk_start + chunk_size <= offset:
+            chunk_start += chunk_size
+            if chunk_size < 0x100000:
+                chunk_size += 0x20000
+
+        return chunk_start, chunk_size
+
+    class Decrypter:
         """
-        interface for checking CBC-MAC checksum.
+        Decrypts a file while it is downloaded, by any number of streams starting
+        at any offset, and computes its CBC-MAC checksum.
         """
 
-        def __init__(self, key):
+        def __init__(self, key, checksum=True):
             k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
-            self.hash = "\0" * 16
             self.key = MegaCrypto.a32_to_str(k)
+            self.nonce = MegaCrypto.a32_to_str(iv[0:2])
             self.iv = MegaCrypto.a32_to_str(iv[0:2] * 2)
-            self.AES = Cryptodome.Cipher.AES.new(
-                self.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=self.hash
-            )
+            self.meta_mac = tuple(meta_mac)
+
+            self.checksum = checksum
+            self.macs = {}  #: chunk start -> CBC-MAC of the chunk
 
-        def update(self, chunk):
+        def stream(self, offset):
+            """
+            Return a function decrypting the data of the file from offset on.
+            """
+            return MegaCrypto.Stream(self, offset)
+
+        def chunk_mac(self, data):
             cbc = Cryptodome.Cipher.AES.new(
                 self.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=self.iv
             )
-            for j in range(0, len(chunk), 16):
-                block = chunk[j : j + 16].ljust(16, "\0")
-                hash = cbc.encrypt(block)
+            data += b"\0" * (-len(data) % 16)
+            return cbc.encrypt(data)[-16:]
 
-            self.hash = self.AES.encrypt(hash)
-
-        def digest(self):
+        def digest(self, filename):
             """
-            Return the **binary** (non-printable) CBC-MAC of the message that has been
-            authenticated so far.
+            Return the CBC-MAC of the decrypted file, chunks no stream saw as a
+            whole are read from the file.
             """
-            d = MegaCrypto.str_to_a32(self.hash)
+            mac = Cryptodome.Cipher.AES.new(
+                self.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=b"\0" * 16
+            )
+            file_mac = b"\0" * 16  #: an empty file has no chunks
+            with open(filename, mode="rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                for chunk_start, chunk_size in MegaCrypto.get_chunks(size):
+                    chunk_mac = self.macs.get(chunk_start)
+                    if chunk_mac is None:
+                        f.seek(chunk_start)
+                        chunk_mac = self.chunk_mac(f.read(chunk_size))
+                    file_mac = mac.encrypt(chunk_mac)
+
+            d = MegaCrypto.str_to_a32(file_mac)
             return (d[0] ^ d[1], d[2] ^ d[3])
 
-        def hexdigest(self):
-            """
-            Return the **printable** CBC-MAC of the message that has been authenticated
-            so far.
-            """
-            return "".join(
-                "{:2x}".format(ord(x)) for x in MegaCrypto.a32_to_str(self.digest())
+    class Stream:
+        """
+        AES-CTR decryption of the file from an offset on, keeping the CBC-MAC of
+        every chunk which is passed as a whole.
+        """
+
+        def __init__(self, decrypter, offset):
+            self.d = decrypter
+            self.offset = offset
+
+            self.cipher = Cryptodome.Cipher.AES.new(
+                decrypter.key,
+                Cryptodome.Cipher.AES.MODE_CTR,
+                nonce=decrypter.nonce,
+                initial_value=offset // 16,
             )
+            self.cipher.decrypt(b"\0" * (offset % 16))  #: skip into the block
+
+            #: a chunk started before offset can't be checked here
+            self.chunk = MegaCrypto.get_chunk(offset)
+            self.cbc = None
+            self.pending = b""  #: data not filling a whole block yet
+
+        def __call__(self, buf):
+            data = self.cipher.decrypt(buf)
+            if self.d.checksum:
+                self.update(data)
+            self.offset += len(data)
+            return data
+
+        def update(self, data):
+            pos = self.offset
+            end = pos + len(data)
+            while pos < end:
+                chunk_start, chunk_size = self.chunk
+                chunk_end = chunk_start + chunk_size
+                size = min(chunk_end, end) - pos
+
+                if pos == chunk_start:
+                    self.cbc = Cryptodome.Cipher.AES.new(
+                        self.d.key, mode=Cryptodome.Cipher.AES.MODE_CBC, IV=self.d.iv
+                    )
+                    self.pending = b""
+
+                if self.cbc is not None:
+                    block = self.pending + data[:size]
+                    n = len(block) - len(block) % 16
+                    if n:
+                        self.last = self.cbc.encrypt(block[:n])[-16:]
+                    self.pending = block[n:]
+
+                data = data[size:]
+                pos += size
 
-        @staticmethod
-        def new(key):
-            return MegaCrypto.Checksum(key)
+                if pos == chunk_end:
+                    if self.cbc is not None:  #: block size divides chunk size
+                        self.d.macs[chunk_start] = self.last
+                    self.cbc = None
+                    self.chunk = MegaCrypto.get_chunk(pos)
 
 
 class MegaClient:
@@ -285,7 +366,7 @@ class MegaClient:
 class MegaCoNz(BaseDownloader):
     __name__ = "MegaCoNz"
     __type__ = "downloader"
-    __version__ = "0.52"
+    __version__ = "0.54"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -303,69 +384,34 @@ class MegaCoNz(BaseDownloader):
 
     FILE_SUFFIX = ".crypted"
 
-    def decrypt_file(self, key):
-        """
-        Decrypts and verifies checksum to the file at 'last_download'.
-        """
-        k, iv, meta_mac = MegaCrypto.get_cipher_key(key)
-        ctr = Cryptodome.Util.Counter.new(
-            128, initial_value=((iv[0] << 32) + iv[1]) << 64
-        )
-        cipher = Cryptodome.Cipher.AES.new(
-            MegaCrypto.a32_to_str(k), Cryptodome.Cipher.AES.MODE_CTR, counter=ctr
-        )
-
-        self.pyfile.set_status("decrypting")
-        self.pyfile.set_progress(0)
-
-        file_crypted = os.fsdecode(self.last_download)
-        file_decrypted = file_crypted.rsplit(self.FILE_SUFFIX)[0]
-
-        try:
-            f = open(file_crypted, mode="rb")
-            df = open(file_decrypted, mode="wb")
-
-        except IOError as exc:
-            self.fail(exc)
-
-        encrypted_size = os.path.getsize(file_crypted)
-
+    def get_decrypter(self, key):
         checksum_activated = self.config.get(
             "enabled", default=False, plugin="Checksum"
         )
         check_checksum = self.config.get(
             "check_checksum", default=True, plugin="Checksum"
         )
+        return MegaCrypto.Decrypter(key, checksum_activated and check_checksum)
 
-        cbc_mac = (
-            MegaCrypto.Checksum(key) if checksum_activated and check_checksum else None
-        )
-
-        progress = 0
-        for chunk_start, chunk_size in MegaCrypto.get_chunks(encrypted_size):
-            buf = f.read(chunk_size)
-            if not buf:
-                break
-
-            chunk = cipher.decrypt(buf)
-            df.write(chunk)
-
-            progress += chunk_size
-            self.pyfile.set_progress((100 // encrypted_size) * progress)
-
-            if checksum_activated and check_checksum:
-                cbc_mac.update(chunk)
+    def verify_file(self, decrypter):
+        """
+        Verifies checksum of the decrypted file at 'last_download' and removes the
+        temporary suffix.
+        """
+        file_crypted = os.fsdecode(self.last_download)
+        file_decrypted = file_crypted.rsplit(self.FILE_SUFFIX)[0]
 
-        self.pyfile.set_progress(100)
+        try:
+            os.replace(file_crypted, file_decrypted)
 
-        f.close()
-        df.close()
+        except OSError as exc:
+            self.fail(exc)
 
         self.log_info(self._("File decrypted"))
-        os.remove(file_crypted)
 
-        if checksum_activated and check_checksum:
-            file_mac = cbc_mac.digest()
+        if decrypter.checksum:
+            file_mac = decrypter.digest(file_decrypted)
+            meta_mac = decrypter.meta_mac
             if file_mac == meta_mac:
                 self.log_info(
                     self._(
@@ -411,7 +457,7 @@ class MegaCoNz(BaseDownloader):
 
     def check_exists(self, name):
         """
-        Because of Mega downloads a temporary encrypted file with the extension of
+        Because of Mega downloads to a temporary file with the extension of
         '.crypted', pyLoad cannot correctly detect if the file exists before
         downloading. This function corrects this.
 
@@ -489,8 +535,10 @@ class MegaCoNz(BaseDownloader):
 
         # self.req.http.c.setopt(pycurl.SSL_CIPHER_LIST, "RC4-MD5:DEFAULT")
 
+        decrypter = self.get_decrypter(key)
+
         try:
-            self.download(res["g"])
+            self.download(res["g"], transform=decrypter.stream)
 
         except BadHeader as exc:
             if exc.code == 509:
@@ -499,7 +547,7 @@ class MegaCoNz(BaseDownloader):
             else:
                 raise
 
-        self.decrypt_file(key)
+        self.verify_file(decrypter)
 
         #: Everything is finished and final name can be set
         pyfile.name = name
@@ -9,7 +9,7 @@ from .MegaCoNz import MegaCoNz, MegaCrypto
 class MegacrypterCom(MegaCoNz):
     __name__ = "MegacrypterCom"
     __type__ = "downloader"
-    __version__ = "0.28"
+    __version__ = "0.29"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -51,9 +51,11 @@ class MegacrypterCom(MegaCoNz):
 
         pyfile.name = info["name"] + self.FILE_SUFFIX
 
-        self.download(dl["url"])
+        decrypter = self.get_decrypter(key)
 
-        self.decrypt_file(key)
+        self.download(dl["url"], transform=decrypter.stream)
+
+        self.verify_file(decrypter)
 
         #: Everything is finished and final name can be set
         pyfile.name = info["name"]
@@ -534,7 +534,7 @@ class IRC:
 class XDCC(BaseDownloader):
     __name__ = "XDCC"
     __type__ = "downloader"
-    __version__ = "0.48"
+    __version__ = "0.49"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -622,6 +622,7 @@ class XDCC(BaseDownloader):
         #: Change request type
         self.req.close()
         self.req = self.pyload.request_factory.get_request(self.classname, type="XDCC")
+        self.req.bucket.set_group("package", self.pyfile.packageid)
 
         self.pyfile.set_custom_status("connect irc")
 
@@ -7,8 +7,10 @@ import re
 import subprocess
 import time
 import urllib.parse
+from collections import OrderedDict
 from datetime import timedelta
 from functools import reduce
+from threading import Lock
 from xml.dom.minidom import parseString as parse_xml
 
 from pyload import PKGDIR
@@ -238,7 +240,7 @@ class Ffmpeg:
 class YoutubeCom(BaseDownloader):
     __name__ = "YoutubeCom"
     __type__ = "downloader"
-    __version__ = "0.69"
+    __version__ = "0.71"
     __status__ = "testing"
 
     __pyload_version__ = "0.5"
@@ -293,6 +295,12 @@ class YoutubeCom(BaseDownloader):
 
     URL_REPLACEMENTS = [(r"youtu\.be/", "youtube.com/watch?v=")]
 
+    #: decrypt maps of the recently used players, shared by all downloads
+    players = OrderedDict()
+    players_lock = Lock()
+    PLAYER_CACHE_SIZE = 16  #: players kept in memory and in the database
+    PLAYER_CACHE_TTL = 24 * 60 * 60
+
     #: Invalid characters that must be removed from the file name
     invalid_chars = '\u2605:?><"|\\'
 
@@ -573,90 +581,127 @@ class YoutubeCom(BaseDownloader):
         if not player_url.endswith(".js"):
             self.fail(self._("Unsupported player type {}").format(player_url))
 
-        cache_info = self.db.retrieve("cache")
-        cache_dirty = False
-
-        if (
-            cache_info is None
-            or "version" not in cache_info
-            or cache_info["version"] != self.__version__
-        ):
-            cache_info = {"version": self.__version__, "cache": {}}
-            cache_dirty = True
-
-        if (
-            player_url in cache_info["cache"]
-            and time.time()
-            < cache_info["cache"][player_url]["time"] + timedelta(hours=24).seconds
-        ):
-            self.log_debug("Using cached decode function to decrypt the URL")
-
-            def decrypt_func(s):
-                return "".join(
-                    s[i] for i in cache_info["cache"][player_url]["decrypt_map"]
-                )
-
-            decrypted_sig = decrypt_func(encrypted_sig)
+        decrypt_map = self._get_decrypt_map(player_url, len(encrypted_sig))
+        return "".join(encrypted_sig[i] for i in decrypt_map)
 
-        else:
-            player_data = self.load(self.fixurl(player_url))
+    def _get_decrypt_map(self, player_url, length):
+        """
+        Returns the positions of the signature characters in the decrypted
+        signature, the player is parsed only once for all downloads.
+        """
+        m = re.search(r"/player/([\w\-]+)/", player_url)
+        player_id = m.group(1) if m else player_url
+        now = time.time()
+
+        with self.players_lock:
+            entry = self.players.get(player_id)
+            if entry is None or now >= entry["time"] + self.PLAYER_CACHE_TTL:
+                entry = {
+                    "time": now,
+                    "maps": None,  #: loaded from the database on first use
+                    "decrypt_func": None,
+                    "lock": Lock(),
+                }
+                self.players[player_id] = entry
+                while len(self.players) > self.PLAYER_CACHE_SIZE:
+                    self.players.popitem(last=False)
+
+            self.players.move_to_end(player_id)
+
+        #: other downloads of the same player wait for the one parsing it
+        with entry["lock"]:
+            if entry["maps"] is None:
+                cache_info = self.db.retrieve("cache") or {}
+                if cache_info.get("version") == self.__version__:
+                    stored = cache_info["cache"].get(player_id)
+                else:
+                    stored = None
 
-            m = (
-                re.search(r"\.sig\|\|(?P<sig>[a-zA-Z0-9$]+)\(", player_data)
-                or re.search(
-                    r"\bc\s*&&\s*d\.set\([^,]+\s*,\s*\([^)]*\)\s*\(\s*(?P<sig>[a-zA-Z0-9$]+)\(",
-                    player_data,
-                )
-                or re.search(
-                    r'(["\'])signature\1\s*,\s*(?P<sig>[a-zA-Z0-9$]+)\(', player_data
-                )
-            )
+                if stored is not None and now < stored["time"] + self.PLAYER_CACHE_TTL:
+                    entry["time"] = stored["time"]
+                    entry["maps"] = stored["maps"]
+                else:
+                    entry["maps"] = {}
 
-            try:
-                function_name = m.group("sig")
+            #: json stores the lengths as strings
+            decrypt_map = entry["maps"].get(str(length))
+            if decrypt_map is not None:
+                self.log_debug("Using cached decode function to decrypt the URL")
+                return decrypt_map
 
-            except (AttributeError, IndexError):
-                self.fail(self._("Signature decode function name not found"))
+            if entry["decrypt_func"] is None:
+                entry["decrypt_func"] = self._extract_decrypt_func(player_url)
 
+            #: Since Youtube just scrambles the order of the characters in the signature
+            #: and does not change any byte value, we can store just a transformation map
             try:
-                jsi = JSInterpreter(player_data)
-
-                def decrypt_func(s):
-                    return jsi.extract_function(function_name)([s])
-
-                #: Since Youtube just scrambles the order of the characters in the signature
-                #: and does not change any byte value, we can store just a transformation map as a cached function
                 decrypt_map = [
                     ord(c)
-                    for c in decrypt_func(
-                        "".join(chr(x) for x in range(len(encrypted_sig)))
+                    for c in entry["decrypt_func"](
+                        "".join(chr(x) for x in range(length))
                     )
                 ]
-                cache_info["cache"][player_url] = {
-                    "decrypt_map": decrypt_map,
-                    "time": time.time(),
-                }
-                cache_dirty = True
-
-                decrypted_sig = decrypt_func(encrypted_sig)
 
             except (JSInterpreterError, AssertionError) as exc:
                 self.log_error(self._("Signature decode failed"), exc)
                 self.fail(exc)
 
-        #: Remove old records from cache
-        for k in cache_info["cache"].keys():
-            if (
-                time.time()
-                >= cache_info["cache"][k]["time"] + timedelta(hours=24).seconds
-            ):
-                cache_info["cache"].pop(k, None)
-                cache_dirty = True
+            entry["maps"][str(length)] = decrypt_map
+
+        #: the database record is shared by all players
+        with self.players_lock:
+            self._store_decrypt_maps(player_id, entry)
+
+        return decrypt_map
+
+    def _extract_decrypt_func(self, player_url):
+        player_data = self.load(self.fixurl(player_url))
+
+        m = (
+            re.search(r"\.sig\|\|(?P<sig>[a-zA-Z0-9$]+)\(", player_data)
+            or re.search(
+                r"\bc\s*&&\s*d\.set\([^,]+\s*,\s*\([^)]*\)\s*\(\s*(?P<sig>[a-zA-Z0-9$]+)\(",
+                player_data,
+            )
+            or re.search(
+                r'(["\'])signature\1\s*,\s*(?P<sig>[a-zA-Z0-9$]+)\(', player_data
+            )
+        )
 
-        if cache_dirty:
-            self.db.store("cache", cache_info)
+        try:
+            function_name = m.group("sig")
+
+        except (AttributeError, IndexError):
+            self.fail(self._("Signature decode function name not found"))
+
+        try:
+            jsi = JSInterpreter(player_data)
+            func = jsi.extract_function(function_name)
+
+        except (JSInterpreterError, AssertionError) as exc:
+            self.log_error(self._("Signature decode failed"), exc)
+            self.fail(exc)
+
+        return lambda s: func([s])
+
+    def _store_decrypt_maps(self, player_id, entry):
+        cache_info = self.db.retrieve("cache") or {}
+        if cache_info.get("version") != self.__version__:
+            cache_info = {"version": self.__version__, "cache": {}}
+
+        cache = cache_info["cache"]
+        cache[player_id] = {"time": entry["time"], "maps": entry["maps"]}
+
+        #: Remove old records from cache
+        now = time.time()
+        players = sorted(cache, key=lambda k: cache[k]["time"], reverse=True)
+        for k in players[self.PLAYER_CACHE_SIZE :]:
+            cache.pop(k)
+        for k in list(cache):
+            if now >= cache[k]["time"] + self.PLAYER_CACHE_TTL:
+                cache.pop(k)
 
-        return decrypted_sig
+        self.db.store("cache", cache_info)
 
     def _handle_video(self):
         use3d = self.config.get("3d")
@@ -1508,7 +1553,7 @@ class JSInterpreter:
 
     def extract_function(self, function_name):
         func_m = re.search(
-            r"(?x)(?:function\s+{}|[{;,]\s*{}\s*=\s*function|var\s+{}\s*=\s*function)\s*\((?P<args>[^)]*)\)\s*{{(?P<code>[^}]+)}}".format(
+            r"(?x)(?:function\s+{}|[{{;,]\s*{}\s*=\s*function|var\s+{}\s*=\s*function)\s*\((?P<args>[^)]*)\)\s*{{(?P<code>[^}}]+)}}".format(
                 re.escape(function_name),
                 re.escape(function_name),
                 re.escape(function_name),
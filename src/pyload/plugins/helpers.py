@@ -17,6 +17,7 @@ import zlib
 from base64 import b85decode, b85encode
 from collections.abc import Sequence
 from datetime import timedelta
+from functools import lru_cache
 
 
 class Config:
@@ -116,7 +117,11 @@ class Periodical:
             return False
         else:
             self.cb = self.plugin.pyload.scheduler.add_job(
-                max(1, delay), self._task, [threaded], threaded=threaded
+                max(1, delay),
+                self._task,
+                [threaded],
+                threaded=threaded,
+                name=self.plugin.classname,
             )
             return True
 
@@ -557,7 +562,7 @@ def compute_checksum(filename, hashtype):
         last = 0
 
         with open(file, mode="rb") as fp:
-            for chunk in iter(lambda: fp.read(buf), ""):
+            for chunk in iter(lambda: fp.read(buf), b""):
                 last = hf(chunk, last)
 
         return "{:x}".format(last)
@@ -566,7 +571,7 @@ def compute_checksum(filename, hashtype):
         h = hashlib.new(hashtype)
 
         with open(file, mode="rb") as fp:
-            for chunk in iter(lambda: fp.read(buf * h.block_size), ""):
+            for chunk in iter(lambda: fp.read(buf * h.block_size), b""):
                 h.update(chunk)
 
         return h.hexdigest()
@@ -575,6 +580,150 @@ def compute_checksum(filename, hashtype):
         return None
 
 
+def _gf2_times(mat, vec):
+    s = 0
+    for row in mat:
+        if not vec:
+            break
+        if vec & 1:
+            s ^= row
+        vec >>= 1
+    return s
+
+
+@lru_cache(maxsize=8)
+def _crc32_shift(length):
+    """
+    returns the matrix appending length zero bytes to a crc32, see zlib's
+    crc32_combine.
+    """
+    odd = [0xEDB88320] + [1 << n for n in range(31)]  #: operator for one zero bit
+    shift = [1 << n for n in range(32)]
+    length *= 8
+    while length:
+        if length & 1:
+            shift = [_gf2_times(odd, row) for row in shift]
+        length >>= 1
+        odd = [_gf2_times(odd, row) for row in odd]
+    return shift
+
+
+def _adler32_combine(adler1, adler2, length):
+    base = 65521
+    rem = length % base
+    sum1 = adler1 & 0xFFFF
+    sum2 = rem * sum1 % base
+    sum1 = (sum1 + (adler2 & 0xFFFF) + base - 1) % base
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + base - rem) % base
+    return sum1 | (sum2 << 16)
+
+
+class StreamHasher:
+    """
+    Hashes a file while it is downloaded by any number of streams (see
+    `HTTPDownload.transform`), so checking it needs to read only what no stream
+    saw.
+
+    crc32 and adler32 are computed per block and combined, other algorithms only
+    by the stream starting at the beginning of the file.
+    """
+
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self, algorithms):
+        self.sums = [a for a in algorithms if a in ("crc32", "adler32")]
+        self.hashes = [
+            a
+            for a in algorithms
+            if a not in self.sums and a in hashlib.algorithms_available
+        ]
+        self.blocks = {}  #: (algorithm, block index) -> checksum of the block
+        self.head = None  #: stream hashing from the beginning of the file
+
+    def __contains__(self, algorithm):
+        return algorithm in self.sums or (
+            algorithm in self.hashes and self.head is not None
+        )
+
+    def stream(self, offset):
+        stream = StreamHasher.Stream(self, offset)
+        if not offset and self.hashes:
+            self.head = stream
+        return stream
+
+    def hexdigest(self, algorithm, filename):
+        """
+        returns the checksum of the downloaded file like the checksum addon does.
+        """
+        with open(filename, mode="rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if algorithm in self.sums:
+                return self._sum(algorithm, fp, size)
+
+            if self.head is not None and self.head.offset <= size:
+                h = self.head.hashes[algorithm].copy()
+                fp.seek(self.head.offset)
+            else:
+                h = hashlib.new(algorithm)
+
+            for chunk in iter(lambda: fp.read(128 * h.block_size), b""):
+                h.update(chunk)
+
+        return h.hexdigest()
+
+    def _sum(self, algorithm, fp, size):
+        hf = getattr(zlib, algorithm)
+        value = hf(b"")
+
+        for index in range(-(-size // self.BLOCK_SIZE)):
+            block_size = min(self.BLOCK_SIZE, size - index * self.BLOCK_SIZE)
+            block = self.blocks.get((algorithm, index))
+            if block is None or block_size < self.BLOCK_SIZE:
+                fp.seek(index * self.BLOCK_SIZE)
+                block = hf(fp.read(block_size))
+
+            if algorithm == "adler32":
+                value = _adler32_combine(value, block, block_size)
+            else:
+                value = _gf2_times(_crc32_shift(block_size), value) ^ block
+
+        return "{:08x}".format(value)
+
+    class Stream:
+        def __init__(self, hasher, offset):
+            self.hasher = hasher
+            self.offset = offset
+            self.hashes = (
+                {a: hashlib.new(a) for a in hasher.hashes} if not offset else {}
+            )
+            self.sums = {}  #: running checksums of the current block
+            if not offset % hasher.BLOCK_SIZE:  #: else skip the first block
+                self.sums = {a: getattr(zlib, a)(b"") for a in hasher.sums}
+
+        def __call__(self, buf):
+            for h in self.hashes.values():
+                h.update(buf)
+
+            block_size = self.hasher.BLOCK_SIZE
+            pos = 0
+            while pos < len(buf):
+                offset = self.offset + pos
+                size = min(block_size - offset % block_size, len(buf) - pos)
+                data = buf[pos : pos + size]
+                for algorithm, value in self.sums.items():
+                    self.sums[algorithm] = getattr(zlib, algorithm)(data, value)
+                pos += size
+
+                if not (offset + size) % block_size:
+                    index = (offset + size) // block_size - 1
+                    for algorithm, value in self.sums.items():
+                        self.hasher.blocks[(algorithm, index)] = value
+                    self.sums = {a: getattr(zlib, a)(b"") for a in self.hasher.sums}
+
+            self.offset += len(buf)
+            return buf
+
+
 def copy_tree(src, dst, overwrite=False, preserve_metadata=False):
     pmode = preserve_metadata or overwrite is None
     mtime = os.path.getmtime
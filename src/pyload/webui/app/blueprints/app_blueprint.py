@@ -221,6 +221,7 @@ def settings():
                 "type": data.type,
                 "login": data.login,
                 "valid": data.valid,
+                "pending": data.pending,
                 "premium": data.premium,
                 "trafficleft": trafficleft,
                 "validuntil": validuntil,
@@ -355,54 +356,41 @@ def logs(page=-1):
 
         # s.modified = True
 
-    log = api.get_log()
-    if not perpage:
-        page = 0
-
-    if page < 1 or not isinstance(page, int):
-        page = (
-            1 if len(log) - perpage + 1 < 1 or perpage == 0 else len(log) - perpage + 1
-        )
-
     if isinstance(fro, datetime.datetime):  #: we will search for datetime.datetime
-        page = -1
+        since = time.mktime(fro.timetuple())
+        offset = 0
+    else:
+        since = None
+        offset = page - 1 if page >= 1 and perpage else -perpage
 
+    #: only the shown lines are read, all of them page by page
     data = []
-    counter = 0
-    perpagecheck = 0
-    for l in log:
-        counter += 1
+    cursor = None
+    while True:
+        log = api.get_log_page(
+            offset, perpage or api.MAX_PAGE_SIZE, cursor, since=since
+        )
+        for entry in log.items:
+            data.append(
+                {
+                    "line": entry.line + 1,
+                    "date": entry.date or "?",
+                    "level": entry.level or "?",
+                    "message": entry.message,
+                }
+            )
+        cursor = log.cursor
+        if perpage or cursor is None:
+            break
 
-        if counter >= page:
+    page = data[0]["line"] if data else 1
+    if fro is None:  #: if fro not set set it to first showed line
+        for entry in data:
             try:
-                date, time, level, message = l.split(" ", 3)
-                dtime = datetime.datetime.strptime(
-                    date + " " + time, "%Y-%m-%d %H:%M:%S"
-                )
-            except Exception:
-                dtime = None
-                date = "?"
-                time = " "
-                level = "?"
-                message = l
-            if page == -1 and dtime is not None and fro <= dtime:
-                page = counter  #: found our datetime.datetime
-            if page >= 0:
-                data.append(
-                    {
-                        "line": counter,
-                        "date": date + " " + time,
-                        "level": level,
-                        "message": message,
-                    }
-                )
-                perpagecheck += 1
-                if (
-                    fro is None and dtime is not None
-                ):  #: if fro not set set it to first showed line
-                    fro = dtime
-            if perpagecheck >= perpage > 0:
+                fro = datetime.datetime.strptime(entry["date"], "%Y-%m-%d %H:%M:%S")
                 break
+            except ValueError:
+                pass
 
     if fro is None:  #: still not set, empty log?
         fro = datetime.datetime.now()
@@ -418,7 +406,7 @@ def logs(page=-1):
         "perpage": perpage,
         "perpage_p": sorted(perpage_p),
         "iprev": 1 if page - perpage < 1 else page - perpage,
-        "inext": (page + perpage) if page + perpage < len(log) else page,
+        "inext": (page + perpage) if page + perpage <= log.total else page,
     }
     return render_template("logs.html", **context)
 
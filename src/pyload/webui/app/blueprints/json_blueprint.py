@@ -1,17 +1,25 @@
 # -*- coding: utf-8 -*-
 # AUTHOR: vuolter
 
+import json
 import os
+import time
 
 import flask
 from flask.json import jsonify
 
+from pyload.core.datatypes.enums import Destination
 from pyload.core.utils import format
 
 from ..helpers import login_required, render_template
 
 bp = flask.Blueprint("json", __name__, url_prefix="/json")
 
+#: seconds an event stream stays open before the browser has to reconnect
+EVENTS_DURATION = 300
+#: seconds between keep-alive comments on an idle event stream
+EVENTS_KEEPALIVE = 20
+
 
 def format_time(seconds):
     seconds = int(seconds)
@@ -29,12 +37,92 @@ def status():
     return jsonify(data)
 
 
+@bp.route("/events", endpoint="events")
+# @apiver_check
+@login_required("STATUS")
+def events():
+    """
+    server-sent events, resuming after the Last-Event-ID header or 'seq' argument.
+    """
+    api = flask.current_app.config["PYLOAD_API"]
+    seq = flask.request.headers.get("Last-Event-ID", type=int)
+    if seq is None:
+        seq = flask.request.args.get("seq", type=int)
+
+    def stream(seq):
+        #: streams hold a server thread, so end them now and then
+        end = time.time() + EVENTS_DURATION
+        batch = api.get_events_since(seq)
+        while True:
+            if batch["seq"] != seq or batch["events"]:
+                seq = batch["seq"]
+                data = json.dumps([dict(e) for e in batch["events"]])
+                yield f"id: {seq}\ndata: {data}\n\n"
+            else:
+                yield ": keepalive\n\n"
+
+            timeout = min(EVENTS_KEEPALIVE, end - time.time())
+            if timeout <= 0:
+                break
+            batch = api.get_events_since(seq, timeout)
+
+    return flask.Response(
+        stream(seq),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def page_args():
+    """
+    paging and sorting arguments of a paged request.
+    """
+    args = flask.request.values
+    return {
+        "offset": args.get("offset", 0, type=int),
+        "limit": args.get("limit", 50, type=int),
+        "cursor": args.get("cursor") or None,
+        "sort": args.get("sort", "order"),
+        "desc": args.get("desc", "false").lower() in ("1", "true"),
+        "name": args.get("name") or None,
+    }
+
+
+def page_dest():
+    """
+    destination of a paged request, queue if not given.
+    """
+    args = flask.request.values
+    return Destination(args.get("dest", Destination.QUEUE.value, type=int))
+
+
+def page_links(api):
+    args = flask.request.values
+    page = api.get_files_page(
+        page_dest(),
+        status=args.getlist("status", type=int),
+        plugin=args.getlist("plugin"),
+        pid=args.get("pid", type=int),
+        **page_args(),
+    )
+    return jsonify(
+        links=page["items"],
+        ids=[link["fid"] for link in page["items"]],
+        total=page["total"],
+        cursor=page["cursor"],
+    )
+
+
 @bp.route("/links", methods=["GET", "POST"], endpoint="links")
 # @apiver_check
 @login_required("LIST")
 def links():
     api = flask.current_app.config["PYLOAD_API"]
     try:
+        #: without a destination list the running downloads
+        if "dest" in flask.request.values:
+            return page_links(api)
+
         links = api.status_downloads()
         ids = []
         for link in links:
@@ -82,6 +170,25 @@ def packages():
     return jsonify(False)
 
 
+@bp.route("/packages_page", methods=["GET", "POST"], endpoint="packages_page")
+# @apiver_check
+@login_required("LIST")
+def packages_page():
+    api = flask.current_app.config["PYLOAD_API"]
+    try:
+        if page_dest() == Destination.COLLECTOR:
+            page = api.get_collector_page(**page_args())
+        else:
+            page = api.get_queue_page(**page_args())
+
+        return jsonify(page)
+
+    except Exception:
+        flask.abort(500)
+
+    return jsonify(False)
+
+
 @bp.route("/package?=<int:id>", endpoint="package")
 # @apiver_check
 @login_required("LIST")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from pyload.core.datatypes.enums import DownloadStatus
+from pyload.core.threads import info_thread
+from pyload.core.threads.info_thread import InfoCache
+
+ONLINE_TTL = InfoCache.TTL[DownloadStatus.ONLINE]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def time(self):
+        return self.now
+
+
+class Storage:
+    def __init__(self):
+        self.values = {}
+
+    def set_storage(self, identifier, key, value):
+        self.values[(identifier, key)] = value
+
+    def get_storage(self, identifier, key=None):
+        return self.values.get((identifier, key))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(info_thread, "time", clock)
+    return clock
+
+
+def info(n, status=DownloadStatus.ONLINE):
+    return (f"file{n}", 100, status, f"http://a/{n}")
+
+
+def fill(cache, *numbers, status=DownloadStatus.ONLINE):
+    for n in numbers:
+        cache[f"http://a/{n}"] = info(n, status)
+
+
+def test_hits_and_misses(clock):
+    cache = InfoCache()
+    fill(cache, 1)
+
+    assert cache.get("http://a/1") == info(1)
+    assert cache.get("http://a/2") is None
+    assert cache.stats() == {"cached": 1, "cache_hits": 1, "cache_misses": 1}
+
+    #: peek neither counts nor refreshes
+    assert cache.peek("http://a/1") == info(1)
+    assert cache.peek("http://a/2") is None
+    assert cache.stats() == {"cached": 1, "cache_hits": 1, "cache_misses": 1}
+
+
+def test_least_recently_used_dropped(clock):
+    cache = InfoCache(size=3)
+    fill(cache, 0, 1, 2)
+
+    cache.get("http://a/0")
+    cache.peek("http://a/1")
+    fill(cache, 3)
+
+    assert len(cache) == 3
+    assert list(cache.entries) == ["http://a/2", "http://a/0", "http://a/3"]
+
+
+@pytest.mark.parametrize(
+    "status, ttl",
+    [
+        (DownloadStatus.ONLINE, 6 * 3600),
+        (DownloadStatus.OFFLINE, 24 * 3600),
+        (DownloadStatus.TEMPOFFLINE, 600),
+        (DownloadStatus.QUEUED, InfoCache.DEFAULT_TTL),
+    ],
+)
+def test_ttl_by_status(clock, status, ttl):
+    cache = InfoCache()
+    fill(cache, 1, status=status)
+
+    clock.now += ttl - 1
+    assert cache.get("http://a/1") == info(1, status)
+    clock.now += 2
+    assert cache.peek("http://a/1") is None
+    assert cache.get("http://a/1") is None
+    assert not cache.entries
+
+
+def test_purge(clock):
+    cache = InfoCache()
+    fill(cache, 0, 1)
+    fill(cache, 2, status=DownloadStatus.OFFLINE)
+
+    clock.now += ONLINE_TTL + 1
+    assert cache.purge() == 2
+    assert list(cache.entries) == ["http://a/2"]
+    assert cache.purge() == 0
+
+
+def test_save_and_load(clock):
+    db = Storage()
+    cache = InfoCache()
+    fill(cache, 0)
+    clock.now += ONLINE_TTL / 2
+    fill(cache, 1, 2)
+
+    cache.save(db)
+    assert not cache.dirty
+    saved = dict(db.values)
+    cache.save(db)  #: unchanged, not written again
+    assert db.values == saved
+
+    #: infos expired since saved are not loaded, and infos checked since start
+    #: are newer than the saved ones
+    clock.now += ONLINE_TTL / 2 + 1
+    other = InfoCache()
+    fill(other, 2, status=DownloadStatus.OFFLINE)
+    assert other.load(db) == 2
+    assert other.get("http://a/0") is None
+    assert other.get("http://a/1") == info(1)
+    assert other.get("http://a/2") == info(2, DownloadStatus.OFFLINE)
+
+    db.set_storage(InfoCache.STORAGE, "entries", "not json")
+    assert InfoCache().load(db) == 0
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from pyload.core.threads.info_thread import InfoCache, InfoJob, InfoPool
+
+
+class Hoster:
+    # a slow get_info, recording the batches it was asked for
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.fail = False
+        self.lock = threading.Lock()
+        self.running = self.max_running = 0
+        self.batches = []
+
+    def get_info(self, urls):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self.batches.append(urls)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("check failed")
+            for url in urls:
+                yield (url.rsplit("/", 1)[-1], 100, 2, url)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class Job(InfoJob):
+    def __init__(self, manager, data):
+        super().__init__(manager, data)
+        self.results = []
+        self.done = threading.Event()
+
+    def update(self, plugin, result):
+        self.results.extend(result)
+
+    def finish(self):
+        self.done.set()
+
+    def urls_done(self):
+        assert self.done.wait(10)
+        return sorted(url for name, size, status, url in self.results)
+
+
+@pytest.fixture
+def hosters():
+    return {"A": Hoster(), "B": Hoster(), "NoInfo": object()}
+
+
+@pytest.fixture
+def manager(hosters):
+    plugin_manager = SimpleNamespace(
+        container_plugins={}, get_plugin=lambda name, original=False: hosters[name]
+    )
+    return SimpleNamespace(
+        pyload=SimpleNamespace(
+            log=logging.getLogger(__name__), debug=0, plugin_manager=plugin_manager
+        ),
+        info_cache=InfoCache(),
+        timestamp=0,
+        _=lambda s: s,
+    )
+
+
+@pytest.fixture
+def pool(manager):
+    return InfoPool(manager)
+
+
+def test_batches_and_plugin_limit(manager, hosters, pool):
+    urls = [f"http://a/{i}" for i in range(4 * pool.BATCH_SIZE + 1)]
+
+    job = Job(manager, [(url, "A") for url in urls])
+    pool.add_job(job)
+    assert job.urls_done() == sorted(urls)
+
+    batches = hosters["A"].batches
+    assert sorted(len(batch) for batch in batches) == [1] + [pool.BATCH_SIZE] * 4
+    assert sorted(url for batch in batches for url in batch) == sorted(urls)
+    assert hosters["A"].max_running <= pool.PLUGIN_LIMIT
+
+    stats = pool.stats()
+    assert stats["checked"] == len(urls)
+    assert stats["queued"] == stats["running"] == stats["waiting"] == 0
+
+
+def test_shared_urls_checked_once(manager, hosters, pool):
+    jobs = [
+        Job(manager, [(f"http://a/{i % 3}", "A"), (f"http://b/{i}", "B")])
+        for i in range(6)
+    ]
+    for job in jobs:
+        pool.add_job(job)
+
+    for i, job in enumerate(jobs):
+        assert job.urls_done() == [f"http://a/{i % 3}", f"http://b/{i}"]
+
+    checked = Counter(url for batch in hosters["A"].batches for url in batch)
+    assert sorted(checked) == ["http://a/0", "http://a/1", "http://a/2"]
+    assert set(checked.values()) == {1}
+
+
+def test_cached_urls_not_checked(manager, hosters, pool):
+    manager.info_cache["http://a/1"] = ("cached", 1, 1, "http://a/1")
+
+    job = Job(manager, [("http://a/1", "A"), ("http://a/2", "A")])
+    pool.add_job(job)
+    assert job.urls_done() == ["http://a/1", "http://a/2"]
+    assert ("cached", 1, 1, "http://a/1") in job.results
+    assert hosters["A"].batches == [["http://a/2"]]
+
+    #: checked infos are cached, a job of cached urls only is finished at once
+    job = Job(manager, [("http://a/2", "A")])
+    pool.add_job(job)
+    assert job.done.is_set()
+    assert len(hosters["A"].batches) == 1
+
+
+def test_failed_checks(manager, hosters, pool):
+    hosters["A"].fail = True
+
+    job = Job(manager, [("http://a/1", "A"), ("http://n/1", "NoInfo")])
+    pool.add_job(job)
+    assert job.urls_done() == ["http://a/1", "http://n/1"]
+    assert {status for name, size, status, url in job.results} == {3}
+
+    #: jobs not reporting defaults just finish
+    job = Job(manager, [("http://a/2", "A")])
+    job.defaults = False
+    pool.add_job(job)
+    assert job.urls_done() == []
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+from pyload.core.log_reader import LogReader
+
+START = time.mktime((2024, 1, 1, 12, 0, 0, 0, 0, -1))
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+
+def make_log(entries, first=0):
+    lines = []
+    for i in range(first, first + entries):
+        date = time.strftime(LogReader.DATEFORMAT, time.localtime(START + i * 7))
+        level = LEVELS[i * i % 7 % 4]
+        lines.append(f"[{date}]  {level:<8} message {i} {'x' * (i % 40)}\n")
+        if not i % 9:
+            lines.extend(f"  traceback line {j}\n" for j in range(2))
+    return lines
+
+
+LINES = make_log(6000)
+
+
+@pytest.fixture
+def logfile(tmp_path):
+    filename = tmp_path / "log.txt"
+    filename.write_text("".join(LINES), encoding="utf-8")
+    return filename
+
+
+@pytest.fixture
+def reader(logfile):
+    return LogReader(str(logfile))
+
+
+def test_lines(reader):
+    assert reader.update() == len(LINES)
+    assert len(reader.offsets) > 4  #: the log spans several blocks
+
+    for start in (0, 1, 2500, len(LINES) - 1, len(LINES), len(LINES) + 5):
+        assert [text for number, text in reader.lines(start)] == LINES[start:]
+    assert [number for number, text in reader.lines(-2)] == [
+        len(LINES) - 2,
+        len(LINES) - 1,
+    ]
+
+
+def test_read_by_level(reader):
+    # continuation lines belong to the entry above them
+    expected = []
+    level = None
+    for number, text in enumerate(LINES):
+        date, line_level, message = reader.parse(text)
+        level = line_level or level
+        if level in ("WARNING", "ERROR"):
+            expected.append((number, date, line_level, message))
+
+    assert list(reader.read(level="WARNING")) == expected
+    assert list(reader.read(3000, 10, "WARNING")) == [
+        entry for entry in expected if entry[0] >= 3000
+    ][:10]
+
+    with pytest.raises(ValueError):
+        next(reader.read(level="NOSUCHLEVEL"))
+
+
+@pytest.mark.parametrize("since, entry", [(0, 0), (START, 0), (START + 1, 1)])
+def test_find(reader, since, entry):
+    entries = [number for number, text in enumerate(LINES) if text.startswith("[")]
+    assert reader.find(since) == entries[entry]
+    assert reader.find(START + 7 * 4321) == entries[4321]
+    assert reader.find(START + 10**6) == len(LINES)
+
+    assert next(reader.read(since=since))[0] == entries[entry]
+
+
+def test_appended_and_rotated(reader, logfile):
+    reader.update()
+
+    #: a line is indexed once it is complete
+    more = make_log(20, 6000)
+    with open(logfile, "a", encoding="utf-8") as fp:
+        fp.write("".join(more) + "[2024-01-01")
+    assert reader.update() == len(LINES) + len(more)
+    assert [text for number, text in reader.lines(len(LINES) - 1)] == (
+        LINES[-1:] + more
+    )
+
+    #: a rotated log is indexed again
+    os.remove(logfile)
+    assert reader.update() == 0
+    assert list(reader.lines()) == []
+
+    rotated = make_log(30, 7000)
+    logfile.write_text("".join(rotated), encoding="utf-8")
+    assert [text for number, text in reader.lines()] == rotated
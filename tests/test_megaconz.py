@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import struct
+
+from Cryptodome.Cipher import AES
+
+from pyload.plugins.downloaders.MegaCoNz import MegaCrypto
+
+
+def _encrypt(plain):
+    """
+    returns the node key and the encrypted data of plain, as mega stores them.
+    """
+    rnd = random.Random(len(plain))
+    k = tuple(rnd.getrandbits(32) for _ in range(4))
+    iv = tuple(rnd.getrandbits(32) for _ in range(2))
+    key = MegaCrypto.a32_to_str(k)
+
+    file_mac = b"\0" * 16
+    for chunk_start, chunk_size in MegaCrypto.get_chunks(len(plain)):
+        chunk = plain[chunk_start : chunk_start + chunk_size]
+        chunk += b"\0" * (-len(chunk) % 16)
+        cbc = AES.new(key, AES.MODE_CBC, iv=MegaCrypto.a32_to_str(iv * 2))
+        chunk_mac = cbc.encrypt(chunk)[-16:]
+        file_mac = AES.new(key, AES.MODE_CBC, iv=file_mac).encrypt(chunk_mac)
+    d = struct.unpack(">4I", file_mac)
+    meta_mac = (d[0] ^ d[1], d[2] ^ d[3])
+
+    node_key = (
+        k[0] ^ iv[0],
+        k[1] ^ iv[1],
+        k[2] ^ meta_mac[0],
+        k[3] ^ meta_mac[1],
+    ) + iv + meta_mac
+    ctr = AES.new(key, AES.MODE_CTR, nonce=MegaCrypto.a32_to_str(iv), initial_value=0)
+    return node_key, ctr.encrypt(plain)
+
+
+def _download(tmp_path, plain, bounds):
+    """
+    decrypts the encrypted plain by one stream per range between bounds.
+    """
+    node_key, data = _encrypt(plain)
+    d = MegaCrypto.Decrypter(node_key)
+
+    filename = tmp_path / "file"
+    with open(filename, "wb") as f:
+        f.truncate(len(plain))
+        for start, end in zip(bounds, bounds[1:]):
+            stream = d.stream(start)
+            f.seek(start)
+            for pos in range(start, end, 10000):
+                f.write(stream(data[pos : min(pos + 10000, end)]))
+
+    assert filename.read_bytes() == plain
+    return d, filename
+
+
+def test_digest_empty_file(tmp_path):
+    d, filename = _download(tmp_path, b"", [0])
+    assert d.meta_mac == (0, 0)
+    assert d.digest(filename) == d.meta_mac
+
+
+def test_digest_streams(tmp_path):
+    size = 3 * 2**20 + 12345
+    plain = os.urandom(size)
+    bounds = [0, 777, 2**20, 2**20 + 5 * 16 + 3, 3 * 2**20, size]
+
+    d, filename = _download(tmp_path, plain, bounds)
+    assert d.macs  #: chunks passed as a whole aren't read again
+    assert d.digest(filename) == d.meta_mac
+
+
+def test_digest_detects_corruption(tmp_path):
+    plain = os.urandom(300000)
+    d, filename = _download(tmp_path, plain, [0, len(plain)])
+
+    with open(filename, "r+b") as f:
+        f.seek(200000)
+        f.write(b"x")
+    d.macs.clear()
+    assert d.digest(filename) != d.meta_mac
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import re
+from itertools import chain
+
+import pyload
+from pyload.core.managers.plugin_manager import PluginManager, UrlIndex
+
+URLS = [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "http://youtu.be/dQw4w9WgXcQ",
+    "https://mega.nz/file/abcdefgh#0123456789abcdefghijklmnopqrstuvwxyzABCDEFG",
+    "https://MEGA.NZ/#!abcdefgh!0123456789abcdefghijklmnopqrstuvwxyzABCDEFG",
+    "https://uploaded.net/file/abcdefgh",
+    "https://rapidgator.net/file/0123456789abcdef0123456789abcdef/name.zip.html",
+    "https://www.mediafire.com/file/abcdef12345/name.zip/file",
+    "https://www.dropbox.com/s/abcdef12345/name.zip?dl=0",
+    "ftp://ftp.example.com/pub/file.iso",
+    "http://example.com/file.zip",
+    "/home/user/links.dlc",
+    "links.txt",
+    "xdcc://irc.example.net/#channel/bot/#1",
+    "not an url",
+    "",
+]
+
+
+class Core:
+    log = logging.getLogger(__name__)
+
+    def _(self, s):
+        return s
+
+
+def _plugins(folder):
+    """
+    name -> {"re": pattern} of the plugins shipped in folder.
+    """
+    path = os.path.join(os.path.dirname(pyload.__file__), "plugins", folder)
+    plugins = {}
+    for filename in sorted(os.listdir(path)):
+        name, ext = os.path.splitext(filename)
+        if ext != ".py" or name.startswith("_"):
+            continue
+        with open(os.path.join(path, filename), encoding="utf-8") as fp:
+            m = PluginManager._PATTERN.search(fp.read())
+        if m is not None:
+            try:
+                plugins[name] = {"re": re.compile(m.group(1))}
+            except re.error:
+                pass
+    return plugins
+
+
+def _manager(crypters, hosters, containers):
+    pm = object.__new__(PluginManager)
+    pm.pyload = Core()
+    pm._ = pm.pyload._
+    pm.url_index = None
+    pm.crypter_plugins = crypters
+    pm.hoster_plugins = hosters
+    pm.container_plugins = containers
+    return pm
+
+
+def _linear(pm, url):
+    for name, value in chain(
+        pm.crypter_plugins.items(),
+        pm.hoster_plugins.items(),
+        pm.container_plugins.items(),
+    ):
+        if value["re"].match(url):
+            return name
+    return "DefaultPlugin"
+
+
+def test_parse_urls_matches_linear_search():
+    pm = _manager(
+        _plugins("decrypters"), _plugins("downloaders"), _plugins("containers")
+    )
+    assert pm.hoster_plugins
+
+    urls = list(URLS)
+    #: an url built from each plain host pattern
+    host = re.compile(r"\^?https?\?://(?:\(\?:www\\\.\)\?)?([\w-]+)\\\.(\w+)/")
+    for name, value in chain(pm.crypter_plugins.items(), pm.hoster_plugins.items()):
+        m = host.match(value["re"].pattern)
+        if m is not None:
+            urls.append(f"https://{m.group(1)}.{m.group(2)}/file/abc123")
+            urls.append(f"http://www.{m.group(1)}.{m.group(2)}/f/abc123/name")
+
+    assert pm.parse_urls(urls) == [(url, _linear(pm, url)) for url in urls]
+
+
+def test_parse_urls_plugin_order():
+    generic = {"re": re.compile(r"https?://.+")}
+    host = {"re": re.compile(r"https?://(?:www\.)?example\.com/\w+")}
+    sub = {"re": re.compile(r"https?://[\w.]+\.example\.org/")}
+    pm = _manager({"Sub": sub}, {"Generic": generic, "Host": host}, {})
+
+    urls = [
+        "https://example.com/abc",
+        "https://cdn.example.org/abc",
+        "ftp://example.com/abc",
+        b"https://example.com/abc",
+    ]
+    assert pm.parse_urls(urls) == [
+        ("https://example.com/abc", "Generic"),
+        ("https://cdn.example.org/abc", "Sub"),
+        ("ftp://example.com/abc", "DefaultPlugin"),
+    ]
+
+    #: index is rebuilt when a pattern changes
+    index = pm.get_url_index()
+    del pm.hoster_plugins["Generic"]
+    assert pm.get_url_index() is not index
+    assert pm.parse_urls(urls[:1]) == [("https://example.com/abc", "Host")]
+
+
+def test_url_index_keys():
+    plugins = (
+        ("Host", re.compile(r"https?://(?:www\.)?example\.com/")),
+        ("Suffix", re.compile(r"https?://(?:[\w-]+\.)+example\.net/")),
+        ("Prefix", re.compile(r"^unmatchable$")),
+        ("Generic", re.compile(r".+\.dlc$")),
+    )
+    index = UrlIndex(plugins)
+
+    assert set(index.keys["host"]) == {"example.com", "www.example.com"}
+    assert index.generic == [3]
+    assert index.match("https://www.example.com/x") == "Host"
+    assert index.match("https://WWW.example.com/x") is None  #: case sensitive
+    assert index.match("https://a.b.example.net/x") == "Suffix"
+    assert index.match("https://example.net/x") is None
+    assert index.match("unmatchable") == "Prefix"
+    assert index.match("/tmp/links.dlc") == "Generic"
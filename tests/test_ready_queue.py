@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import random
+
+import pytest
+
+from pyload.core.managers.file_manager import ReadyQueue
+
+QUEUE = 1
+COLLECTOR = 0
+
+
+def queued(queue, plugin):
+    return queue == QUEUE
+
+
+def collected(queue, plugin):
+    return queue == COLLECTOR
+
+
+def drain(rq, accept=lambda queue, plugin: True):
+    return list(iter(lambda: rq.pop(accept), None))
+
+
+def download_order(rq, accept):
+    # what the heaps should hand out, sorted from the state itself
+    entries = sorted(
+        (rq.packages[pid][1], order, fid)
+        for fid, (plugin, pid, order, generation) in rq.links.items()
+        if fid not in rq.taken and accept(rq.packages[pid][0], plugin)
+    )
+    return [fid for porder, order, fid in entries]
+
+
+def assert_consistent(rq):
+    for accept in (queued, collected):
+        other = ReadyQueue()
+        for attr in ("packages", "children", "links", "heaps", "taken"):
+            setattr(other, attr, copy.deepcopy(getattr(rq, attr)))
+        other.loaded = rq.loaded
+        other.generation = rq.generation
+        other.size = rq.size
+        assert drain(other, accept) == download_order(rq, accept)
+
+
+@pytest.fixture
+def rq():
+    rq = ReadyQueue()
+    rq.load(
+        lambda: (
+            [(1, QUEUE, 1), (2, QUEUE, 0), (3, COLLECTOR, 0)],
+            [
+                (10, "A", 1, 0),
+                (11, "B", 1, 1),
+                (20, "B", 2, 1),
+                (21, "A", 2, 0),
+                (30, "A", 3, 0),
+                (40, "A", 4, 0),  #: package does not exist
+            ],
+        )
+    )
+    return rq
+
+
+def test_pop_order(rq):
+    assert drain(rq, queued) == [21, 20, 10, 11]
+    assert drain(rq) == [30]
+    assert rq.pop(queued) is None
+
+
+def test_accept_and_release(rq):
+    assert drain(rq, lambda queue, plugin: plugin == "B") == [20, 11]
+
+    #: a handed out link is not handed out again until released
+    assert drain(rq, queued) == [21, 10]
+    assert drain(rq) == [30]
+    rq.release(11)
+    rq.release(11)
+    assert drain(rq) == [11]
+
+
+def test_update(rq):
+    rq.update(21, "A", 2, 0, 0)  #: finished
+    rq.update(10, "B", 1, 0, 3)  #: plugin changed
+    rq.update(12, "A", 1, 2, 2)  #: new link
+    rq.update(41, "A", 4, 0, 3)  #: package does not exist
+
+    assert drain(rq, lambda queue, plugin: plugin == "A") == [30, 12]
+    assert drain(rq) == [20, 10, 11]
+
+    #: a link updated while handed out comes back on release only
+    rq.update(12, "A", 1, 2, 3)
+    assert drain(rq) == []
+    rq.release(12)
+    assert drain(rq) == [12]
+    rq.update(12, "A", 1, 2, 4)  #: skipped
+    rq.release(12)
+    assert drain(rq) == []
+
+
+def test_move_and_remove(rq):
+    rq.relocate_package(3, QUEUE)
+    rq.move_package(3, 0)
+    assert download_order(rq, queued) == [30, 21, 20, 10, 11]
+    assert_consistent(rq)
+
+    rq.move_link(11, 1, 1, 0)
+    assert download_order(rq, queued) == [30, 21, 20, 11, 10]
+    assert_consistent(rq)
+
+    rq.remove_link(11, 1, 0)
+    assert rq.links[10][2] == 0
+    assert_consistent(rq)
+
+    rq.relocate_package(2, COLLECTOR)
+    rq.remove_package(1)
+    assert rq.packages == {2: [COLLECTOR, 0], 3: [QUEUE, 0]}
+    assert drain(rq, queued) == [30]
+    assert drain(rq) == [21, 20]
+
+
+def test_random_operations():
+    rnd = random.Random(42)
+    packages = [(pid, rnd.choice((QUEUE, COLLECTOR)), pid) for pid in range(20)]
+    links = []
+    for fid in range(500):
+        pid = rnd.randrange(20)
+        order = sum(1 for link in links if link[2] == pid)
+        links.append((fid, rnd.choice("ABC"), pid, order))
+    rq = ReadyQueue()
+    rq.load(lambda: (packages, links))
+
+    for i in range(2000):
+        op = rnd.randrange(6)
+        pids = list(rq.packages)
+        if op == 0 and rq.links:
+            fid = rnd.choice(list(rq.links))
+            plugin, pid, order, generation = rq.links[fid]
+            rq.update(fid, rnd.choice("ABC"), pid, order, rnd.choice((0, 2, 3)))
+        elif op == 1 and pids:
+            pid = rnd.choice(pids)
+            queue = rq.packages[pid][0]
+            size = sum(1 for q, o in rq.packages.values() if q == queue)
+            rq.move_package(pid, rnd.randrange(size))
+        elif op == 2 and pids:
+            pid = rnd.choice(pids)
+            children = sorted(rq.children[pid], key=lambda fid: rq.links[fid][2])
+            if children:
+                fid = rnd.choice(children)
+                rq.move_link(fid, pid, rq.links[fid][2], rnd.randrange(len(children)))
+        elif op == 3:
+            wanted = rnd.choice("ABC")
+            fid = rq.pop(lambda queue, plugin: plugin == wanted)
+            if fid is not None and rnd.random() < 0.7:
+                rq.release(fid)
+        elif op == 4 and pids:
+            rq.relocate_package(rnd.choice(pids), rnd.choice((QUEUE, COLLECTOR)))
+        elif op == 5 and rq.links:
+            fid = rnd.choice(list(rq.links))
+            plugin, pid, order, generation = rq.links[fid]
+            rq.remove_link(fid, pid, order)
+
+        #: rebuilds hide broken heaps, so check often
+        if i % 25 == 0:
+            assert_consistent(rq)
+
+    assert_consistent(rq)
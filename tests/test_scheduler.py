@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+import pytest
+
+from pyload.core.scheduler import AlreadyCalled, Deferred, Scheduler
+
+
+class Core:
+    log = logging.getLogger(__name__)
+    debug = 0
+
+    def _(self, s):
+        return s
+
+
+class Results:
+    # collects the results of deferreds, must be made before their jobs can run
+    def __init__(self, deferreds):
+        self.results = [None] * len(deferreds)
+        self.left = len(deferreds)
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        for i, d in enumerate(deferreds):
+            d.add_callback(self.called, i)
+
+    def called(self, result, i):
+        with self.lock:
+            self.results[i] = result
+            self.left -= 1
+            if not self.left:
+                self.done.set()
+
+    def wait(self, timeout=5):
+        assert self.done.wait(timeout)
+        return self.results
+
+
+@pytest.fixture
+def scheduler():
+    s = Scheduler(Core())
+    yield s
+    s.shutdown()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_jobs_run_in_time_order(scheduler):
+    order = []
+    deferreds = [
+        scheduler.add_job(t, order.append, [i], threaded=False)
+        for i, t in enumerate((0.3, 0.1, 0.2, 0))
+    ]
+    results = Results(deferreds)
+    scheduler.start()
+    results.wait()
+    assert order == [3, 1, 2, 0]
+
+
+def test_earlier_job_wakes_scheduler(scheduler):
+    scheduler.start()
+    scheduler.add_job(60, lambda: None)
+
+    done = threading.Event()
+    start = time.time()
+    scheduler.add_job(0, done.set)
+    assert done.wait(5)
+    assert time.time() - start < 1
+
+
+def test_remove_job(scheduler):
+    ran = []
+    kept = scheduler.add_job(0.1, ran.append, ["kept"])
+    removed = scheduler.add_job(0, ran.append, ["removed"])
+
+    assert scheduler.remove_job(removed)
+    assert not scheduler.remove_job(removed)
+    assert not scheduler.remove_job(Deferred())
+
+    results = Results([kept])
+    scheduler.start()
+    results.wait()
+    assert ran == ["kept"]
+    assert not scheduler.remove_job(kept)  #: already run
+
+
+def test_removed_jobs_are_compacted(scheduler):
+    deferreds = [scheduler.add_job(60 + i, lambda: None) for i in range(100)]
+    for d in deferreds[:80]:
+        scheduler.remove_job(d)
+
+    #: removed entries are dropped once they are the majority
+    assert len(scheduler.jobs) == 20
+    assert len(scheduler.queue) < 60
+    assert scheduler.removed == len(scheduler.queue) - len(scheduler.jobs)
+    first = min(x for x in scheduler.queue if not x[2].removed)
+    assert first[2] is scheduler.jobs[deferreds[80]]
+
+
+def test_remaining_jobs_keep_their_order(scheduler):
+    order = []
+    deferreds = [
+        scheduler.add_job((i * 37 % 100) / 400, order.append, [i], threaded=False)
+        for i in range(100)
+    ]
+    for i, d in enumerate(deferreds):
+        if i % 3:
+            assert scheduler.remove_job(d)
+
+    kept = deferreds[::3]
+    times = {i: scheduler.jobs[d].time for i, d in enumerate(deferreds) if not i % 3}
+    results = Results(kept)
+    scheduler.start()
+    results.wait()
+    assert order == sorted(times, key=times.get)
+    assert not scheduler.queue and not scheduler.removed
+
+
+def test_threaded_jobs_and_stats(scheduler):
+    running = threading.Barrier(3, timeout=5)
+
+    def job():
+        running.wait()  #: only returns if the jobs run at once
+
+    def fail():
+        raise RuntimeError("job failed")
+
+    deferreds = [scheduler.add_job(0, job, name="job") for i in range(3)]
+    scheduler.add_job(0, fail, threaded=False, name="fail")
+    results = Results(deferreds)
+    scheduler.start()
+    results.wait()
+
+    wait_until(lambda: "fail" in scheduler.get_stats()["jobs"])
+    wait_until(lambda: scheduler.get_stats()["jobs"]["job"]["runs"] == 3)
+    stats = scheduler.get_stats()
+    assert stats["pending"] == 0
+    assert stats["workers"] == Scheduler.WORKERS
+    assert stats["jobs"]["fail"]["runs"] == stats["jobs"]["fail"]["errors"] == 1
+    assert stats["jobs"]["job"]["errors"] == 0
+
+
+def test_stop_keeps_jobs(scheduler):
+    scheduler.start()
+    scheduler.stop()
+    scheduler.thread.join(5)
+    assert not scheduler.thread.is_alive()
+
+    d = scheduler.add_job(0, lambda: "result")
+    time.sleep(0.1)
+    assert scheduler.get_stats()["pending"] == 1
+
+    results = Results([d])
+    scheduler.start()
+    assert results.wait() == ["result"]
+
+
+def test_deferred_called_once():
+    d = Deferred()
+    results = []
+    d.add_callback(lambda *args, **kwargs: results.append((args, kwargs)), 2, x=3)
+    d.callback(1)
+
+    assert results == [((1, 2), {"x": 3})]
+    with pytest.raises(AlreadyCalled):
+        d.callback(1)
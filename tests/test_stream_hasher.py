@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import zlib
+
+import pytest
+
+from pyload.plugins.helpers import StreamHasher
+
+BLOCK = StreamHasher.BLOCK_SIZE
+ALGORITHMS = ["crc32", "adler32", "md5", "sha1"]
+
+
+def checksum(algorithm, data):
+    if algorithm in ("crc32", "adler32"):
+        return "{:08x}".format(getattr(zlib, algorithm)(data))
+    return hashlib.new(algorithm, data).hexdigest()
+
+
+@pytest.fixture
+def download(tmp_path):
+    filename = tmp_path / "file"
+
+    def download(data, bounds, buffer_size=16 << 10):
+        # one stream per chunk, as HTTPDownload runs them
+        hasher = StreamHasher(ALGORITHMS)
+        with open(filename, "wb") as fp:
+            fp.truncate(len(data))
+            for start, end in zip(bounds, bounds[1:]):
+                stream = hasher.stream(start)
+                fp.seek(start)
+                for pos in range(start, end, buffer_size):
+                    fp.write(stream(data[pos : min(pos + buffer_size, end)]))
+        return hasher
+
+    download.filename = filename
+    return download
+
+
+@pytest.mark.parametrize(
+    "size, chunks, buffer_size",
+    [
+        (0, 1, 1024),
+        (1, 1, 1024),
+        (BLOCK, 1, 1000),
+        (BLOCK + 1, 2, 4096),
+        (3 * BLOCK + 12345, 4, 7777),
+        (3 * BLOCK + 12345, 3, 1 << 20),
+    ],
+)
+def test_hexdigest(download, size, chunks, buffer_size):
+    data = os.urandom(size)
+    bounds = [size * i // chunks for i in range(chunks + 1)]
+    hasher = download(data, bounds, buffer_size)
+
+    for algorithm in ALGORITHMS:
+        assert algorithm in hasher
+        assert hasher.hexdigest(algorithm, download.filename) == checksum(
+            algorithm, data
+        )
+
+
+def test_seen_blocks_are_not_read(download):
+    data = os.urandom(4 * BLOCK)
+    hasher = download(data, [0, BLOCK + 100, len(data)])
+
+    #: the second stream starts inside block 1, which is read back
+    assert sorted(i for a, i in hasher.blocks if a == "crc32") == [0, 2, 3]
+
+    with open(download.filename, "r+b") as fp:
+        fp.seek(2 * BLOCK + 5)
+        fp.write(b"\0")
+    assert hasher.hexdigest("crc32", download.filename) == checksum("crc32", data)
+
+    hasher.blocks.clear()
+    assert hasher.hexdigest("crc32", download.filename) != checksum("crc32", data)
+
+
+def test_resumed_download(download):
+    # no stream from the start, so md5 needs the whole file
+    data = os.urandom(BLOCK + 5000)
+    hasher = download(data, [BLOCK // 2, len(data)])
+    download.filename.write_bytes(data)
+
+    assert "crc32" in hasher and "md5" not in hasher
+    for algorithm in ALGORITHMS:
+        assert hasher.hexdigest(algorithm, download.filename) == checksum(
+            algorithm, data
+        )
+
+
+def test_truncated_file(download):
+    data = os.urandom(2 * BLOCK)
+    hasher = download(data, [0, len(data)])
+    download.filename.write_bytes(data[: BLOCK + 10])
+
+    for algorithm in ALGORITHMS:
+        assert hasher.hexdigest(algorithm, download.filename) == checksum(
+            algorithm, data[: BLOCK + 10]
+        )
+
+
+def test_unknown_algorithm():
+    hasher = StreamHasher(["crc32", "nosuchhash"])
+    assert hasher.hashes == []
+    assert "nosuchhash" not in hasher